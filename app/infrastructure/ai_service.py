@@ -1,6 +1,18 @@
-from openai import OpenAI
+import time
+from openai import OpenAI, AsyncOpenAI
 from app.config.config import settings
-from typing import List, Dict, Any, Optional
+from app.infrastructure.prompts import prompt_registry, TUTOR_SYSTEM_PROMPT
+from app.infrastructure.level_classifier import level_classifier
+from app.infrastructure.tracing import tracer
+from app.infrastructure.model_router import (
+    ModelRouter,
+    ModelTier,
+    ChatCompletionResult,
+    CANNED_RESPONSES,
+    DEFAULT_CANNED_RESPONSE,
+    load_tiers
+)
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable
 from enum import Enum
 
 class OnboardingStep(str, Enum):
@@ -12,36 +24,21 @@ class OnboardingStep(str, Enum):
 class AIService:
     def __init__(self):
         self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = "gpt-4o-mini"
-        self.system_prompt = """
-        You are Japi, an AI English tutor. Your role is to help users improve their English skills through conversation.
-        - Be friendly, patient, and encouraging
-        - Correct mistakes in a constructive way
-        - Adapt your language to the user's level (Beginner/Intermediate/Advanced)
-        - Focus on practical, conversational English
-        - Keep responses concise and natural
-        - If the user makes a mistake, first repeat their sentence correctly, then explain the correction
-        - Ask follow-up questions to keep the conversation going
-        - For beginners: Use simple vocabulary and short sentences
-        - For intermediate: Use a wider range of vocabulary and more complex structures
-        - For advanced: Use natural, idiomatic English with more complex structures
-        """
+        self.async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.router = ModelRouter(load_tiers(settings.MODEL_TIERS))
 
-    def _get_system_message(self, user_level: Optional[str] = None) -> Dict[str, str]:
-        """Get the system message with level-specific instructions"""
-        level_instruction = ""
-        if user_level:
-            level_instruction = f"\nThe user has indicated they are at the {user_level} level. "
-            if user_level.lower() == 'beginner':
-                level_instruction += "Use simple vocabulary and short sentences. Focus on basic grammar and common phrases."
-            elif user_level.lower() == 'intermediate':
-                level_instruction += "Use a wider range of vocabulary and slightly more complex sentences. Gently correct mistakes and explain when needed."
-            else:  # advanced
-                level_instruction += "Use natural, idiomatic English. Focus on fluency, nuance, and more complex language structures."
-        
+    def _get_system_message(
+        self,
+        user_level: Optional[str] = None,
+        user_id: Optional[int] = None
+    ) -> Dict[str, str]:
+        """Get the pre-compiled system message with level-specific instructions"""
+        template = prompt_registry.resolve(TUTOR_SYSTEM_PROMPT, subject_id=user_id)
+        level = getattr(user_level, "value", user_level)
+        prompt = template.render(level)
         return {
             "role": "system",
-            "content": self.system_prompt + level_instruction
+            "content": prompt.content
         }
 
     def _is_valid_goal_response(self, message: str) -> bool:
@@ -59,9 +56,8 @@ class AIService:
         return not any(inv in message for inv in invalid_responses)
 
     def _is_valid_level_response(self, message: str) -> bool:
-        """Check if the user's response contains a valid English level."""
-        message = message.lower()
-        return any(level in message for level in ["beginner", "intermediate", "advanced"])
+        """Check if the user's response states a level or is long enough to estimate one."""
+        return level_classifier.estimate(message).level is not None
 
     def _detect_onboarding_step(self, conversation_history: List[Dict[str, str]]) -> OnboardingStep:
         """Detect the current step of the onboarding process."""
@@ -118,10 +114,11 @@ class AIService:
                 return f"Hi {user_name}! To help you better, could you tell me what you'd like to achieve with your English? For example: 'I want to improve my speaking skills'"
         
         elif onboarding_step == OnboardingStep.ASK_LEVEL:
-            last_message = conversation_history[-1]["content"].lower()
-            if any(level in last_message for level in ["beginner", "intermediate", "advanced"]):
-                detected_level = next((level for level in ["beginner", "intermediate", "advanced"] if level in last_message), "intermediate")
+            estimate = level_classifier.estimate(conversation_history[-1]["content"])
+            if estimate.source == "stated":
                 return f"Got it! Let's begin with a practice conversation."
+            elif estimate.level:
+                return f"Thanks! From how you write, I'd place you at the {estimate.level} level. Let's begin with a practice conversation."
             else:
                 return "I'm not sure I understand. Could you please tell me your current English level? (Beginner/Intermediate/Advanced)"
         
@@ -132,31 +129,140 @@ class AIService:
         self, 
         conversation_history: List[Dict[str, str]],
         user_name: str,
-        user_level: Optional[str] = None
+        user_level: Optional[str] = None,
+        user_id: Optional[int] = None
     ) -> str:
         """Generate a response for regular chat after onboarding is complete."""
+        return self.complete_chat(conversation_history, user_name, user_level, user_id).content
+
+    def complete_chat(
+        self,
+        conversation_history: List[Dict[str, str]],
+        user_name: str,
+        user_level: Optional[str] = None,
+        user_id: Optional[int] = None,
+        memories: Optional[List[str]] = None
+    ) -> ChatCompletionResult:
+        """Generate a chat reply through the model router, with routing and timing details."""
+        messages = self._build_chat_messages(conversation_history, user_level, user_id, memories)
+
+        def call(tier: ModelTier, timeout: float):
+            return self.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                model=tier.model,
+                messages=messages,
+                temperature=tier.temperature,
+                max_tokens=tier.max_tokens
+            )
+
+        result = self.router.complete(
+            call,
+            user_id=user_id,
+            user_level=user_level,
+            message_chars=len(conversation_history[-1]["content"]) if conversation_history else 0
+        )
+        result.prompt_version = prompt_registry.resolve(TUTOR_SYSTEM_PROMPT, subject_id=user_id).version
+        if result.decision and result.decision.degraded:
+            print(f"AI response degraded to tier '{result.tier}' for user {user_id}")
+        return result
+
+    async def stream_chat_response(
+        self,
+        conversation_history: List[Dict[str, str]],
+        user_name: str,
+        user_level: Optional[str] = None,
+        user_id: Optional[int] = None,
+        on_complete: Optional[Callable[[ChatCompletionResult], None]] = None,
+        memories: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat response token by token (used by WebSocket sessions). `on_complete`
+        receives the usage/timing details once the stream has finished.
+        """
+        messages = self._build_chat_messages(conversation_history, user_level, user_id, memories)
+        tier = self.router.select(
+            user_level,
+            message_chars=len(conversation_history[-1]["content"]) if conversation_history else 0
+        )
+        level = (getattr(user_level, "value", user_level) or "").lower()
+        result = ChatCompletionResult(
+            content="",
+            tier=tier.name,
+            model=tier.model,
+            latency_ms=0.0,
+            retries=0,
+            prompt_version=prompt_registry.resolve(TUTOR_SYSTEM_PROMPT, subject_id=user_id).version
+        )
+        if tier.is_local:
+            yield CANNED_RESPONSES.get(level, DEFAULT_CANNED_RESPONSE)
+            if on_complete:
+                on_complete(result)
+            return
+
+        streamed_any = False
+        started = time.monotonic()
+        # Not made current: the generator is suspended between tokens
+        span = tracer.begin(
+            "llm.chat.stream",
+            kind="client",
+            attributes={"llm.tier": tier.name, "llm.model": tier.model}
+        )
         try:
-            # Prepare messages with system prompt
-            messages = [self._get_system_message(user_level)]
-            
-            # Add conversation history
-            for msg in conversation_history[-10:]:  # Keep last 10 messages for context
-                role = "assistant" if msg["role"] == "ai" else "user"
-                messages.append({"role": role, "content": msg["content"]})
-            
-            # Generate response
-            response = self.client.chat.completions.create(
-                model=self.model,
+            stream = await self.async_client.with_options(
+                timeout=min(tier.timeout_seconds, self.router.latency_budget),
+                max_retries=0
+            ).chat.completions.create(
+                model=tier.model,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=200
+                temperature=tier.temperature,
+                max_tokens=tier.max_tokens,
+                stream=True,
+                stream_options={"include_usage": True}
             )
-            
-            return response.choices[0].message.content
-            
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    result.usage = chunk.usage
+                    result.model = getattr(chunk, "model", None) or tier.model
+                if chunk.choices and chunk.choices[0].delta.content:
+                    streamed_any = True
+                    yield chunk.choices[0].delta.content
+            self.router.record_outcome(tier, time.monotonic() - started, ok=True)
         except Exception as e:
-            print(f"Error generating AI response: {e}")
-            return "I'm sorry, I'm having trouble generating a response. Could you please rephrase that or try again later?"
+            print(f"Error streaming AI response: {e}")
+            self.router.record_outcome(tier, time.monotonic() - started, ok=False)
+            if span is not None:
+                span.record_error(e)
+            if not streamed_any:
+                result.tier, result.model = "canned", None
+                yield CANNED_RESPONSES.get(level, DEFAULT_CANNED_RESPONSE)
+        finally:
+            if span is not None:
+                tracer.end(span)
+        result.latency_ms = (time.monotonic() - started) * 1000
+        if on_complete:
+            on_complete(result)
+
+    def _build_chat_messages(
+        self,
+        conversation_history: List[Dict[str, str]],
+        user_level: Optional[str] = None,
+        user_id: Optional[int] = None,
+        memories: Optional[List[str]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        System prompt, then any recalled older messages, then the recent conversation in
+        OpenAI's format. Memories come after the static prompt so its cached prefix holds.
+        """
+        messages = [self._get_system_message(user_level, user_id=user_id)]
+        if memories:
+            messages.append({
+                "role": "system",
+                "content": "Relevant excerpts from earlier conversations with this student:\n"
+                           + "\n".join(f"- {memory}" for memory in memories)
+            })
+        for msg in conversation_history[-10:]:  # Keep last 10 messages for context
+            role = "assistant" if msg["role"] == "ai" else "user"
+            messages.append({"role": role, "content": msg["content"]})
+        return messages
 
 # Create and export the AI service instance
 ai = AIService()
@@ -0,0 +1,105 @@
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from app.config.config import settings
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so a dot product is a cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: words and adjacent word pairs are hashed into signed
+    buckets. No network and no model download, so tests and benchmarks can use it;
+    it captures word overlap rather than meaning.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dimensions] += sign
+        return _normalize_rows(vectors)
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings, requested in batches and shortened to `dimensions`"""
+
+    def __init__(self, client, model: str = "text-embedding-3-small", dimensions: int = 256, batch_size: int = 128):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.name = f"{model}-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=texts[start:start + self.batch_size],
+                dimensions=self.dimensions
+            )
+            rows.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        if not rows:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return _normalize_rows(np.asarray(rows, dtype=np.float32))
+
+
+def build_embedder(client=None):
+    """
+    The embedder named by MEMORY_EMBEDDER ("openai" or "hashing"). OpenAI falls back to
+    hashing when there is no API key or the openai package is missing.
+    """
+    if settings.MEMORY_EMBEDDER == "openai":
+        if client is None:
+            try:
+                from openai import OpenAI
+            except ImportError:
+                print("openai is not installed; using the hashing embedder for memory")
+                return HashingEmbedder(dimensions=settings.MEMORY_DIMENSIONS)
+            if not settings.OPENAI_API_KEY:
+                print("OPENAI_API_KEY is not set; using the hashing embedder for memory")
+                return HashingEmbedder(dimensions=settings.MEMORY_DIMENSIONS)
+            # Recall embeds on the turn's critical path: fail fast instead of the client's
+            # 600s default timeout with retries (the embedding job retries on its own)
+            client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=settings.MEMORY_EMBEDDING_TIMEOUT_SECONDS,
+                max_retries=0
+            )
+        return OpenAIEmbedder(client, model=settings.MEMORY_EMBEDDING_MODEL, dimensions=settings.MEMORY_DIMENSIONS)
+    return HashingEmbedder(dimensions=settings.MEMORY_DIMENSIONS)
+
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def from_bytes(data: bytes, dimensions: Optional[int] = None) -> np.ndarray:
+    vector = np.frombuffer(data, dtype=np.float32)
+    if dimensions is not None and vector.shape[0] != dimensions:
+        raise ValueError(f"Expected a {dimensions}-dimensional vector, got {vector.shape[0]}")
+    return vector
+
+
+__all__ = ['HashingEmbedder', 'OpenAIEmbedder', 'build_embedder', 'to_bytes', 'from_bytes']
@@ -1,10 +1,33 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
 from app.infrastructure.database import Base, engine
+from app.infrastructure import jobs  # noqa: F401 - registers the jobs table
 
 def init_db():
     """Initialize the database by creating all tables."""
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
     print("Database tables created successfully!")
 
+def _add_missing_columns():
+    """create_all() skips tables that already exist, so add (nullable) columns introduced since"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+def _create_missing_indexes():
+    """create_all() skips tables that already exist, so add indexes introduced since"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,379 @@
+import asyncio
+import inspect
+import json
+import os
+import socket
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.infrastructure.database import Base, SessionLocal
+
+JobHandler = Callable[[Session, Dict[str, Any]], Optional[Dict[str, Any]]]
+
+# Id of the job whose handler is running in this context (see JobRunner.report_progress)
+_current_job_id: ContextVar[Optional[int]] = ContextVar("current_job_id", default=None)
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, index=True)
+    payload = Column(Text, nullable=False, default="{}")
+    status = Column(String(20), nullable=False, default=JobStatus.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Lease held by the worker running the job; renewed while it runs
+    worker_id = Column(String(100), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    def __repr__(self):
+        return f"<Job {self.id} - {self.name} - {self.status}>"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class JobRunner:
+    """
+    Asyncio worker pool over the durable ``jobs`` table.
+
+    Jobs are rows, so they survive restarts; workers claim them with a conditional
+    UPDATE that also takes a lease (worker id + locked_until). The lease is renewed while
+    the handler runs, and only a job whose lease has expired (its worker died) is claimed
+    again, so live workers on other processes or machines are never duplicated; one that
+    was on its last attempt is failed instead. Handlers
+    are plain sync functions taking a session and the decoded payload and run in a thread.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        concurrency: int = settings.JOB_CONCURRENCY,
+        poll_interval: float = settings.JOB_POLL_INTERVAL_SECONDS,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        lease_seconds: float = settings.JOB_LEASE_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    # Registration / enqueueing
+
+    def register(self, name: str) -> Callable[[JobHandler], JobHandler]:
+        """Decorator registering a handler for a job name"""
+        def decorator(handler: JobHandler) -> JobHandler:
+            self._handlers[name] = handler
+            return handler
+        return decorator
+
+    def enqueue(
+        self,
+        name: str,
+        payload: Optional[Dict[str, Any]] = None,
+        db: Optional[Session] = None,
+        delay_seconds: float = 0,
+        max_attempts: Optional[int] = None
+    ) -> int:
+        """Persist a job and wake a worker. Commits the given session, or a fresh one."""
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for job '{name}'")
+
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            job = Job(
+                name=name,
+                payload=json.dumps(payload or {}),
+                status=JobStatus.QUEUED,
+                max_attempts=max_attempts or self.max_attempts,
+                run_after=_utcnow() + timedelta(seconds=delay_seconds)
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        finally:
+            if own_session:
+                db.close()
+
+        self._notify()
+        return job_id
+
+    def _notify(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    # Execution
+
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            try:
+                job_id = await asyncio.to_thread(self._claim_next)
+            except Exception as e:
+                print(f"Job worker {index} failed to poll the queue: {e}")
+                job_id = None
+
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job_id)
+
+    def _lease_expired(self, now: datetime):
+        """Running jobs whose worker stopped renewing the lease (rows from before leases use started_at)"""
+        return and_(
+            Job.status == JobStatus.RUNNING,
+            or_(
+                Job.locked_until < now,
+                and_(Job.locked_until.is_(None), Job.started_at < now - timedelta(seconds=self.lease_seconds))
+            )
+        )
+
+    def _fail_exhausted(self, db: Session, now: datetime) -> None:
+        """Fail jobs whose lease expired on their last attempt (the worker died mid-run)"""
+        exhausted = and_(self._lease_expired(now), Job.attempts >= Job.max_attempts)
+        # Read first so an idle poll doesn't take the write lock
+        if db.query(Job.id).filter(exhausted).first() is None:
+            return
+        failed = db.execute(
+            update(Job)
+            .where(exhausted)
+            .values(
+                status=JobStatus.FAILED,
+                finished_at=now,
+                worker_id=None,
+                locked_until=None,
+                last_error="Lease expired on the last attempt"
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if failed.rowcount:
+            print(f"Failed {failed.rowcount} job(s) whose lease expired on their last attempt")
+
+    def _claim_next(self) -> Optional[int]:
+        db = self.session_factory()
+        try:
+            now = _utcnow()
+            self._fail_exhausted(db, now)
+            claimable = or_(
+                and_(Job.status == JobStatus.QUEUED, Job.run_after <= now),
+                # A job whose worker died is retried only while it has attempts left
+                and_(self._lease_expired(now), Job.attempts < Job.max_attempts)
+            )
+            candidates = (
+                db.query(Job.id)
+                .filter(claimable)
+                .order_by(Job.run_after.asc(), Job.id.asc())
+                .limit(self.concurrency)
+                .all()
+            )
+            for (job_id,) in candidates:
+                claimed = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, claimable)
+                    .values(
+                        status=JobStatus.RUNNING,
+                        started_at=now,
+                        attempts=Job.attempts + 1,
+                        worker_id=self.worker_id,
+                        locked_until=now + timedelta(seconds=self.lease_seconds)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+            return None
+        finally:
+            db.close()
+
+    def _update_own(self, job_id: int, **values: Any) -> bool:
+        """Update a job only while this worker still holds its lease"""
+        db = self.session_factory()
+        try:
+            updated = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.worker_id == self.worker_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return updated.rowcount == 1
+        finally:
+            db.close()
+
+    async def _renew_lease(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(
+                    self._update_own, job_id, locked_until=_utcnow() + timedelta(seconds=self.lease_seconds)
+                )
+                if not renewed:
+                    print(f"Job {job_id} lease was lost")
+                    return
+            except Exception as e:
+                print(f"Failed to renew the lease of job {job_id}: {e}")
+
+    async def _run(self, job_id: int) -> None:
+        renewal = asyncio.create_task(self._renew_lease(job_id))
+        db = self.session_factory()
+        try:
+            job = db.get(Job, job_id)
+            name, attempts, max_attempts = job.name, job.attempts, job.max_attempts
+            handler = self._handlers.get(name)
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for job '{name}'")
+                payload = json.loads(job.payload or "{}")
+                token = _current_job_id.set(job_id)
+                try:
+                    if inspect.iscoroutinefunction(handler):
+                        result = await handler(db, payload)
+                    else:
+                        result = await asyncio.to_thread(handler, db, payload)
+                finally:
+                    _current_job_id.reset(token)
+            except Exception as e:
+                db.rollback()
+                values = {"last_error": f"{type(e).__name__}: {e}", "worker_id": None, "locked_until": None}
+                if attempts < max_attempts:
+                    values.update(status=JobStatus.QUEUED, run_after=_utcnow() + timedelta(seconds=2 ** attempts))
+                else:
+                    values.update(status=JobStatus.FAILED, finished_at=_utcnow())
+                    print(f"Job {job_id} ({name}) failed permanently: {e}")
+                if not await asyncio.to_thread(self._update_own, job_id, **values):
+                    print(f"Job {job_id} ({name}) failed after its lease was lost; not recording it")
+                return
+
+            # Handlers may leave their own writes for the runner to commit
+            db.commit()
+            values = {
+                "status": JobStatus.SUCCEEDED,
+                "finished_at": _utcnow(),
+                "worker_id": None,
+                "locked_until": None
+            }
+            if result is not None:
+                values["result"] = json.dumps(result)
+            if not await asyncio.to_thread(self._update_own, job_id, **values):
+                print(f"Job {job_id} ({name}) finished after its lease was lost; not recording it")
+        finally:
+            renewal.cancel()
+            db.close()
+
+    def report_progress(self, progress: Dict[str, Any]) -> None:
+        """
+        Store intermediate progress as the running job's result. Called from inside a
+        handler; written through its own session so it is visible immediately.
+        """
+        job_id = _current_job_id.get()
+        if job_id is None:
+            return
+        db = self.session_factory()
+        try:
+            db.execute(update(Job).where(Job.id == job_id).values(result=json.dumps(progress)))
+            db.commit()
+        finally:
+            db.close()
+
+    # Introspection
+
+    def get_job(self, db: Session, job_id: int) -> Optional[Job]:
+        return db.get(Job, job_id)
+
+    def queue_lag(self, db: Session) -> float:
+        """Seconds the oldest runnable job has been waiting (0 when the queue is drained)"""
+        oldest = (
+            db.query(func.min(Job.run_after))
+            .filter(Job.status == JobStatus.QUEUED, Job.run_after <= _utcnow())
+            .scalar()
+        )
+        if oldest is None:
+            return 0.0
+        return max(0.0, (_utcnow() - _as_utc(oldest)).total_seconds())
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        counts = dict(
+            db.query(Job.status, func.count(Job.id))
+            .group_by(Job.status)
+            .all()
+        )
+        return {
+            "workers": len(self._workers),
+            "queued": counts.get(JobStatus.QUEUED, 0),
+            "running": counts.get(JobStatus.RUNNING, 0),
+            "succeeded": counts.get(JobStatus.SUCCEEDED, 0),
+            "failed": counts.get(JobStatus.FAILED, 0),
+            "queue_lag_seconds": self.queue_lag(db),
+        }
+
+
+job_runner = JobRunner()
+
+__all__ = ['Job', 'JobStatus', 'JobRunner', 'job_runner']
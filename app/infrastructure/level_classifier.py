@@ -0,0 +1,296 @@
+"""
+Offline English level estimation for onboarding and backfills.
+
+A level is taken from what the user says about themselves when they name it ("B2",
+"pretty fluent", "just started", or a short "not bad"). The first level they claim
+wins; negated or hoped-for ones ("not fluent", "I want to become fluent") are not
+claims. Otherwise it is estimated from how they write. Each text becomes a small
+feature vector: the share of words from CEFR-graded vocabulary bands, rare long words,
+word and sentence length, clause connectors and typical learner errors. A fixed linear
+model scores that vector to a 0-1 proficiency. Scoring is vectorised with NumPy, so
+whole tables of users can be scored in one call.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LEVELS = ("beginner", "intermediate", "advanced")
+
+# Proficiency score boundaries between the three levels
+_BEGINNER_MAX = 0.25
+_INTERMEDIATE_MAX = 0.85
+
+# Below this many words, or this confidence, a text says too little about its writer
+MIN_WORDS_FOR_ESTIMATE = 6
+MIN_CONFIDENCE = 0.15
+
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_SENTENCE_RE = re.compile(r"[^.!?\n]+")
+
+# Self-descriptions, checked longest first so "upper intermediate" beats "intermediate"
+_STATED_LEVELS: Dict[str, str] = {
+    "complete beginner": "beginner", "total beginner": "beginner", "beginner": "beginner",
+    "beginners": "beginner", "elementary": "beginner", "a1": "beginner", "a2": "beginner",
+    "just started": "beginner", "just starting": "beginner", "low level": "beginner",
+    "pre intermediate": "beginner", "pre-intermediate": "beginner",
+    "intermediate": "intermediate", "b1": "intermediate", "b2": "intermediate",
+    "upper intermediate": "intermediate", "upper-intermediate": "intermediate",
+    "advanced": "advanced", "c1": "advanced", "c2": "advanced", "fluent": "advanced",
+    "native level": "advanced", "near native": "advanced", "near-native": "advanced",
+    "proficient": "advanced", "bilingual": "advanced", "high level": "advanced",
+}
+# Vague self-descriptions: only taken as a level in a short answer ("pretty good"),
+# not when they turn up in a longer text ("my grammar is not good but...")
+_SHORT_ANSWER_WORDS = 6
+_VAGUE_LEVELS: Dict[str, str] = {
+    "basic": "beginner", "not very good": "beginner", "not good": "beginner", "very bad": "beginner",
+    "bad": "beginner", "a little": "beginner", "poor": "beginner",
+    "middle": "intermediate", "medium": "intermediate", "so so": "intermediate", "so-so": "intermediate",
+    "okay": "intermediate", "ok": "intermediate", "decent": "intermediate", "not bad": "intermediate",
+    "average": "intermediate", "conversational": "intermediate", "good": "intermediate",
+    "very good": "advanced", "excellent": "advanced", "native": "advanced",
+}
+
+
+def _phrase_re(phrases) -> re.Pattern:
+    return re.compile(r"\b(" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r")\b")
+
+
+_STATED_RE = _phrase_re(_STATED_LEVELS)
+_VAGUE_RE = _phrase_re(_VAGUE_LEVELS)
+# Answers that name no level; estimating from them would be guesswork
+_UNSURE_RE = re.compile(r"\b(i don'?t know|not sure|no idea|idk|dunno)\b")
+# A bare acknowledgement ("ok", "yes") answers nothing about the level
+_ACKNOWLEDGEMENTS = frozenset("ok okay okey k yes yeah yep sure alright fine thanks thank you".split())
+
+# Words just before a level (same clause) that make it something other than a claim
+_CLAIM_WINDOW = 4
+_CLAUSE_BREAK_RE = re.compile(r"[.,;:!?\n]|\b(?:but|and|so)\b")
+_NEGATIONS = frozenset("not never no nor hardly".split())
+_ASPIRATIONS = frozenset("""
+want wants wanted wanna hope hoping become becoming reach reaching goal dream aim aiming
+would someday eventually
+""".split())
+# Nouns a level word can describe instead of the user ("native speakers", "advanced grammar")
+_DESCRIBED_NOUNS = frozenset("""
+speaker speakers course courses class classes book books student students grammar
+vocabulary words texts
+""".split())
+
+# CEFR-graded vocabulary (representative, not exhaustive)
+_BASIC_WORDS = frozenset("""
+a about after again all also am an and any are at away back bad be because bed big book
+boy brother but buy by can car cat cold come day do dog don't drink eat every family
+father food for friend from get girl give go good goes had has have he hello help her
+here him his home hot house how i in is it job know like little live look love make
+man many me mother much my name new nice night no not now of old on one open or our
+people play please read red run say school see she shop sister sleep small so some
+speak start stop sun take talk teacher tell thank that the their them then there they
+thing this time to today too tv up very walk want was water we week well went what
+when where who why with woman work write year yes yesterday you your
+""".split())
+
+_INTERMEDIATE_WORDS = frozenset("""
+ability able abroad accept achieve actually advice afford against although amazing
+appear apply argue arrange attend attitude available avoid aware believe benefit
+besides borrow career challenge chance compare complain confident consider contact
+continue conversation convince culture decide degree describe develop difference
+difficult discover discuss either environment especially event experience explain
+express fluently however improve include increase instead interview journey knowledge
+manage meeting mention mistake nervous opinion opportunity organise organize
+otherwise patient perhaps pronunciation prefer prepare probably progress promise
+realise realize reason recently recommend reduce relationship remind require
+responsible skill situation solve suggest therefore though travel unless whether
+while worried
+""".split())
+
+_ADVANCED_WORDS = frozenset("""
+abstract accommodate acknowledge acquire adequate advocate allegedly ambiguous
+analogous anticipate arbitrary articulate assess assumption comprehensive
+consequently considerable constitute contemporary contend convey crucial
+deteriorate discrepancy distinguish elaborate eloquent emphasise emphasize
+encompass endeavour endeavor enhance entail evaluate explicit facilitate feasible
+fluency furthermore hence hypothetical idiomatic implication implicit inevitably
+inherent insight integrate intricate leverage meticulous moreover nevertheless
+nonetheless notion nuance nuanced occasionally paradigm perceive persuasive
+predominantly presumably profound prominent pursue rationale register reluctant
+rigorous scrutiny simultaneously sophisticated subsequently substantial subtle
+thereby thorough ubiquitous undermine whereas whereby
+""".split())
+
+# Vocabulary band of each graded word: 1 basic, 2 intermediate, 3 advanced (0 for others)
+_BANDS: Dict[str, int] = {
+    **{w: 3 for w in _ADVANCED_WORDS},
+    **{w: 2 for w in _INTERMEDIATE_WORDS},
+    **{w: 1 for w in _BASIC_WORDS},
+}
+
+_CONNECTORS = frozenset("""
+although because since unless whereas while which who whom whose that though
+however therefore moreover nevertheless furthermore consequently whereby if when
+""".split())
+
+# Typical learner errors, as word pairs and single words
+_ERROR_BIGRAMS = frozenset(
+    [(s, v) for s in ("i", "you", "we", "they") for v in ("is", "has", "goes", "wants", "likes")]
+    + [(s, v) for s in ("he", "she", "it") for v in ("have", "go", "do", "want", "like", "are")]
+    + [("more", w) for w in ("better", "easier", "bigger")]
+    + [(n, v) for n in ("didn't", "don't", "doesn't", "didnt", "dont", "doesnt") for v in ("went", "goes", "did", "wanted")]
+    + [(v, w) for v in ("want", "like", "need") for w in ("learn", "speak", "improve", "play", "go")]
+)
+_ERROR_WORDS = frozenset("goed eated buyed thinked runned comed maked writed speaked teached".split())
+
+FEATURES = (
+    "basic_share", "intermediate_share", "advanced_share", "rare_long_share",
+    "mean_word_length", "mean_sentence_length", "connectors_per_sentence", "errors_per_word",
+)
+
+# Centre/scale per feature, then weights of the linear model over the standardised values
+_CENTER = np.array([0.55, 0.06, 0.01, 0.06, 4.6, 15.0, 0.5, 0.01], dtype=np.float64)
+_SCALE = np.array([0.15, 0.05, 0.03, 0.06, 0.6, 6.0, 0.6, 0.03], dtype=np.float64)
+_WEIGHTS = np.array([-0.5, 0.3, 0.9, 0.6, 0.8, 0.25, 0.2, -0.8], dtype=np.float64)
+_BIAS = 0.0
+
+
+@dataclass(frozen=True)
+class LevelEstimate:
+    level: Optional[str]
+    # "stated" when the user named a level, "text" when estimated from their writing
+    source: Optional[str]
+    score: Optional[float] = None
+    confidence: float = 0.0
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def level_for_score(score: float) -> str:
+    if score < _BEGINNER_MAX:
+        return "beginner"
+    if score < _INTERMEDIATE_MAX:
+        return "intermediate"
+    return "advanced"
+
+
+class LevelClassifier:
+    def stated_level(self, text: str) -> Optional[str]:
+        """The level the user claims for themselves, if any (the first claim wins)"""
+        lowered = text.lower()
+        words = _WORD_RE.findall(lowered)
+        if words and all(w in _ACKNOWLEDGEMENTS for w in words):
+            return None
+        level = self._first_claim(lowered, _STATED_RE, _STATED_LEVELS)
+        if level is None and len(words) <= _SHORT_ANSWER_WORDS:
+            level = self._first_claim(lowered, _VAGUE_RE, _VAGUE_LEVELS)
+        return level
+
+    @staticmethod
+    def _first_claim(lowered: str, pattern: re.Pattern, levels: Dict[str, str]) -> Optional[str]:
+        for match in pattern.finditer(lowered):
+            clause = _CLAUSE_BREAK_RE.split(lowered[:match.start()])[-1]
+            before = _WORD_RE.findall(clause)[-_CLAIM_WINDOW:]
+            negated = any(w in _NEGATIONS or w.endswith("n't") for w in before)
+            hoped_for = any(w in _ASPIRATIONS for w in before) or "to be" in " ".join(before)
+            after = _WORD_RE.findall(lowered[match.end():match.end() + 20])[:1]
+            describes_other = bool(after) and after[0] in _DESCRIBED_NOUNS
+            if not negated and not hoped_for and not describes_other:
+                return levels[match.group(1)]
+        return None
+
+    def featurize(self, texts: Sequence[str]) -> np.ndarray:
+        """One row of FEATURES per text"""
+        return self._features(texts)[0]
+
+    def _features(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature rows and word counts per text"""
+        size = len(texts)
+        owners, bands, lengths, connectors = [], [], [], []
+        sentences = np.ones(size, dtype=np.float64)
+        errors = np.zeros(size, dtype=np.float64)
+        for i, text in enumerate(texts):
+            lowered = text.lower()
+            words = _WORD_RE.findall(lowered)
+            if not words:
+                continue
+            owners.append(np.full(len(words), i, dtype=np.int64))
+            bands.extend(_BANDS.get(w, 0) for w in words)
+            lengths.extend(map(len, words))
+            connectors.extend(w in _CONNECTORS for w in words)
+            sentences[i] = max(1, sum(1 for s in _SENTENCE_RE.findall(lowered) if _WORD_RE.search(s)))
+            errors[i] = (
+                sum(pair in _ERROR_BIGRAMS for pair in zip(words, words[1:]))
+                + sum(w in _ERROR_WORDS for w in words)
+            )
+        if not owners:
+            return np.zeros((size, len(FEATURES)), dtype=np.float64), np.zeros(size)
+
+        # Per-word arrays for the whole batch, summed per text with bincount
+        owner = np.concatenate(owners)
+        band = np.asarray(bands, dtype=np.int64)
+        length = np.asarray(lengths, dtype=np.float64)
+        per_text = lambda weights=None: np.bincount(owner, weights=weights, minlength=size)
+        words = per_text()
+        safe_words = np.maximum(words, 1)
+        rows = np.column_stack((
+            per_text(band == 1) / safe_words,
+            per_text(band == 2) / safe_words,
+            per_text(band == 3) / safe_words,
+            per_text((band == 0) & (length >= 9)) / safe_words,
+            per_text(length) / safe_words,
+            words / sentences,
+            per_text(np.asarray(connectors, dtype=np.float64)) / sentences,
+            errors / safe_words,
+        ))
+        rows[words == 0] = 0.0
+        return rows, words
+
+    @staticmethod
+    def _score_rows(rows: np.ndarray) -> np.ndarray:
+        return _sigmoid(((rows - _CENTER) / _SCALE) @ _WEIGHTS + _BIAS)
+
+    def score(self, texts: Sequence[str]) -> np.ndarray:
+        """Proficiency in [0, 1] for each text (vectorised over the batch)"""
+        if not texts:
+            return np.zeros(0)
+        return self._score_rows(self.featurize(texts))
+
+    def estimate_batch(self, texts: Sequence[str]) -> List[LevelEstimate]:
+        """Estimate each text's writer's level from the writing alone"""
+        if not texts:
+            return []
+        rows, word_counts = self._features(texts)
+        scores = self._score_rows(rows)
+        # Far from a boundary and backed by more text means more confidence
+        margins = np.minimum(np.abs(scores - _BEGINNER_MAX), np.abs(scores - _INTERMEDIATE_MAX))
+        confidences = np.minimum(1.0, (0.5 + margins * 2) * np.minimum(1.0, word_counts / 40))
+        confident = (word_counts >= MIN_WORDS_FOR_ESTIMATE) & (confidences >= MIN_CONFIDENCE)
+
+        estimates = []
+        for score, confidence, ok in zip(scores.tolist(), confidences.tolist(), confident.tolist()):
+            if not ok:
+                estimates.append(LevelEstimate(level=None, source=None, score=score))
+                continue
+            estimates.append(LevelEstimate(
+                level=level_for_score(score),
+                source="text",
+                score=score,
+                confidence=round(confidence, 3)
+            ))
+        return estimates
+
+    def estimate(self, text: str) -> LevelEstimate:
+        """A stated level if the user names one, else an estimate from the text (or no level)"""
+        stated = self.stated_level(text)
+        if stated:
+            return LevelEstimate(level=stated, source="stated", confidence=1.0)
+        if _UNSURE_RE.search(text.lower()):
+            return LevelEstimate(level=None, source=None)
+        return self.estimate_batch([text])[0]
+
+
+level_classifier = LevelClassifier()
+
+__all__ = ['LEVELS', 'MIN_CONFIDENCE', 'LevelEstimate', 'LevelClassifier', 'level_classifier', 'level_for_score']
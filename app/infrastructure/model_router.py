@@ -0,0 +1,295 @@
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.config.config import settings
+from app.infrastructure.tracing import tracer
+
+CANNED_RESPONSES = {
+    "beginner": "Good try! Can you tell me a little more? Use short sentences.",
+    "intermediate": "That's interesting! Could you tell me more about it?",
+    "advanced": "Fascinating - could you elaborate a bit more on that?",
+}
+DEFAULT_CANNED_RESPONSE = "That's interesting! Could you tell me more about it?"
+
+
+@dataclass
+class ModelTier:
+    """One rung of the fallback ladder. A tier without a model answers locally with canned text."""
+    name: str
+    model: Optional[str] = None
+    max_tokens: int = 200
+    temperature: float = 0.7
+    timeout_seconds: float = 10.0
+    # Restrict the tier to these user levels (None = any level)
+    levels: Optional[List[str]] = None
+    # Skip the tier for user messages longer than this (None = no limit)
+    max_message_chars: Optional[int] = None
+
+    @property
+    def is_local(self) -> bool:
+        return self.model is None
+
+    def accepts(self, user_level: Optional[str], message_chars: int) -> bool:
+        if self.levels is not None and (user_level or "").lower() not in self.levels:
+            return False
+        if self.max_message_chars is not None and message_chars > self.max_message_chars:
+            return False
+        return True
+
+
+class TierHealth:
+    """Rolling latency and error rate for one tier"""
+
+    def __init__(self, window: int = 50, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.last_attempt = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.last_attempt = time.monotonic()
+        self.outcomes.append(ok)
+        if ok:
+            self.latency = latency if self.latency is None else (
+                self.alpha * latency + (1 - self.alpha) * self.latency
+            )
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "latency_ewma_seconds": self.latency,
+            "error_rate": round(self.error_rate, 3),
+            "samples": len(self.outcomes),
+        }
+
+
+@dataclass
+class RouteAttempt:
+    tier: str
+    model: Optional[str]
+    outcome: str  # "ok", "error", "timeout", "skipped_unhealthy", "skipped_budget"
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class RoutingDecision:
+    """Everything the router considered for one completion, kept for later analysis"""
+    at: str
+    user_id: Optional[int]
+    user_level: Optional[str]
+    message_chars: int
+    budget_seconds: float
+    tier: Optional[str] = None
+    model: Optional[str] = None
+    degraded: bool = False
+    attempts: List[RouteAttempt] = field(default_factory=list)
+
+
+@dataclass
+class ChatCompletionResult:
+    content: str
+    tier: str
+    model: Optional[str]
+    # Whole completion, every attempt included; per-attempt times are in decision.attempts
+    latency_ms: float
+    retries: int
+    usage: Any = None
+    decision: Optional[RoutingDecision] = None
+    prompt_version: Optional[str] = None
+
+
+def load_tiers(raw: List[Dict[str, Any]]) -> List[ModelTier]:
+    tiers = [ModelTier(**tier) for tier in raw]
+    if not tiers or not tiers[-1].is_local:
+        # Always end the ladder with a tier that cannot fail
+        tiers.append(ModelTier(name="canned"))
+    return tiers
+
+
+class ModelRouter:
+    """
+    Chooses a model tier per completion from the user's level, the message length and
+    each tier's recent latency/error rate. Tiers are tried in order; a tier that is
+    unhealthy, or that fails or exceeds what is left of the latency budget, hands over
+    to the next (cheaper/faster) one, ending with a local canned reply.
+    """
+
+    def __init__(
+        self,
+        tiers: List[ModelTier],
+        latency_budget: float = settings.MODEL_LATENCY_BUDGET_SECONDS,
+        max_error_rate: float = settings.MODEL_MAX_ERROR_RATE,
+        log_path: Optional[str] = settings.MODEL_ROUTING_LOG_PATH,
+        probe_interval: float = settings.MODEL_PROBE_INTERVAL_SECONDS,
+        history: int = 500
+    ):
+        self.tiers = tiers
+        self.latency_budget = latency_budget
+        self.max_error_rate = max_error_rate
+        self.log_path = log_path
+        self.probe_interval = probe_interval
+        self.health: Dict[str, TierHealth] = {tier.name: TierHealth() for tier in tiers}
+        self.decisions: Deque[RoutingDecision] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def candidates(self, user_level: Optional[str], message_chars: int) -> List[ModelTier]:
+        return [
+            tier for tier in self.tiers
+            if tier.is_local or tier.accepts(user_level, message_chars)
+        ]
+
+    def is_healthy(self, tier: ModelTier) -> bool:
+        with self._lock:
+            health = self.health[tier.name]
+            too_many_errors = health.error_rate > self.max_error_rate and len(health.outcomes) >= 5
+            too_slow = health.latency is not None and health.latency > min(tier.timeout_seconds, self.latency_budget)
+            if not (too_many_errors or too_slow):
+                return True
+            # Let one request through now and then so a recovered tier is noticed
+            if time.monotonic() - health.last_attempt >= self.probe_interval:
+                health.last_attempt = time.monotonic()
+                return True
+            return False
+
+    def complete(
+        self,
+        call: Callable[[ModelTier, float], Any],
+        user_id: Optional[int] = None,
+        user_level: Optional[str] = None,
+        message_chars: int = 0
+    ) -> ChatCompletionResult:
+        """
+        Run `call(tier, timeout)` down the ladder until one succeeds. `call` returns the
+        provider response; its first choice's content becomes the reply.
+        """
+        level = (getattr(user_level, "value", user_level) or "").lower() or None
+        decision = RoutingDecision(
+            at=datetime.now(timezone.utc).isoformat(),
+            user_id=user_id,
+            user_level=level,
+            message_chars=message_chars,
+            budget_seconds=self.latency_budget
+        )
+        started = time.monotonic()
+        candidates = self.candidates(level, message_chars)
+        result = None
+
+        for tier in candidates:
+            remaining = self.latency_budget - (time.monotonic() - started)
+            if tier.is_local:
+                result = ChatCompletionResult(
+                    content=CANNED_RESPONSES.get(level or "", DEFAULT_CANNED_RESPONSE),
+                    tier=tier.name,
+                    model=None,
+                    latency_ms=0.0,
+                    retries=sum(1 for a in decision.attempts if a.outcome in ("error", "timeout"))
+                )
+                decision.attempts.append(RouteAttempt(tier=tier.name, model=None, outcome="ok", latency_ms=0.0))
+                break
+            if remaining <= 0.1:
+                decision.attempts.append(RouteAttempt(tier=tier.name, model=tier.model, outcome="skipped_budget"))
+                continue
+            if not self.is_healthy(tier):
+                decision.attempts.append(RouteAttempt(tier=tier.name, model=tier.model, outcome="skipped_unhealthy"))
+                continue
+
+            timeout = min(tier.timeout_seconds, remaining)
+            call_started = time.monotonic()
+            try:
+                with tracer.start_span(
+                    "llm.chat",
+                    kind="client",
+                    attributes={"llm.tier": tier.name, "llm.model": tier.model, "llm.timeout_seconds": timeout}
+                ) as span:
+                    response = call(tier, timeout)
+                    content = response.choices[0].message.content
+                    if span is not None and getattr(response, "usage", None) is not None:
+                        span.set_attribute("llm.prompt_tokens", response.usage.prompt_tokens)
+                        span.set_attribute("llm.completion_tokens", response.usage.completion_tokens)
+            except Exception as e:
+                latency = time.monotonic() - call_started
+                self._record(tier, latency, ok=False)
+                outcome = "timeout" if "timeout" in type(e).__name__.lower() else "error"
+                decision.attempts.append(RouteAttempt(
+                    tier=tier.name, model=tier.model, outcome=outcome,
+                    latency_ms=latency * 1000, error=f"{type(e).__name__}: {e}"
+                ))
+                continue
+
+            latency = time.monotonic() - call_started
+            self._record(tier, latency, ok=True)
+            decision.attempts.append(RouteAttempt(tier=tier.name, model=tier.model, outcome="ok", latency_ms=latency * 1000))
+            result = ChatCompletionResult(
+                content=content,
+                tier=tier.name,
+                model=getattr(response, "model", None) or tier.model,
+                latency_ms=latency * 1000,
+                retries=sum(1 for a in decision.attempts if a.outcome in ("error", "timeout")),
+                usage=getattr(response, "usage", None)
+            )
+            break
+
+        result.latency_ms = (time.monotonic() - started) * 1000
+        decision.tier = result.tier
+        decision.model = result.model
+        decision.degraded = result.tier != candidates[0].name
+        result.decision = decision
+        self._log(decision)
+        return result
+
+    def select(self, user_level: Optional[str] = None, message_chars: int = 0) -> ModelTier:
+        """The first healthy tier for a request, without calling it (used for streaming)"""
+        level = (getattr(user_level, "value", user_level) or "").lower() or None
+        for tier in self.candidates(level, message_chars):
+            if tier.is_local or self.is_healthy(tier):
+                return tier
+        return self.tiers[-1]
+
+    def record_outcome(self, tier: ModelTier, latency: float, ok: bool) -> None:
+        if not tier.is_local:
+            self._record(tier, latency, ok)
+
+    def _record(self, tier: ModelTier, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.health[tier.name].record(latency, ok)
+
+    def _log(self, decision: RoutingDecision) -> None:
+        with self._lock:
+            self.decisions.append(decision)
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as log:
+                        log.write(json.dumps(asdict(decision)) + "\n")
+                except OSError as e:
+                    print(f"Could not write routing decision: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "latency_budget_seconds": self.latency_budget,
+                "tiers": [
+                    {"name": tier.name, "model": tier.model, **self.health[tier.name].snapshot()}
+                    for tier in self.tiers
+                ],
+                "recent_decisions": [asdict(d) for d in list(self.decisions)[-20:]],
+            }
+
+
+__all__ = [
+    'ModelTier',
+    'ModelRouter',
+    'RoutingDecision',
+    'ChatCompletionResult',
+    'load_tiers',
+]
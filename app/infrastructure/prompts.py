@@ -0,0 +1,181 @@
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from app.config.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to a character heuristic
+    tiktoken = None
+
+_WHITESPACE_RE = re.compile(r"[ \t]+")
+
+
+def normalize_whitespace(text: str) -> str:
+    """Strip indentation and collapse runs of spaces so rendered prompts are byte-stable"""
+    lines = [_WHITESPACE_RE.sub(" ", line).strip() for line in text.strip().splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return len(encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A fully rendered prompt together with its cached token count"""
+    name: str
+    version: str
+    content: str
+    token_count: int
+
+
+@dataclass
+class PromptTemplate:
+    """
+    A versioned prompt made of a long static prefix shared by every user and short
+    per-variant suffixes appended after it. Keeping the variable part at the end lets
+    the provider reuse its prompt cache for the common prefix.
+    """
+    name: str
+    version: str
+    prefix: str
+    variants: Dict[str, str] = field(default_factory=dict)
+    default_variant: Optional[str] = None
+    _compiled: Dict[Optional[str], CompiledPrompt] = field(default_factory=dict, init=False, repr=False)
+
+    def compile(self) -> "PromptTemplate":
+        """Normalize and pre-render every variant once"""
+        prefix = normalize_whitespace(self.prefix)
+        self._compiled = {None: self._build(prefix)}
+        for variant, suffix in self.variants.items():
+            self._compiled[variant] = self._build(prefix + "\n\n" + normalize_whitespace(suffix))
+        return self
+
+    def _build(self, content: str) -> CompiledPrompt:
+        return CompiledPrompt(
+            name=self.name,
+            version=self.version,
+            content=content,
+            token_count=count_tokens(content)
+        )
+
+    @property
+    def prefix_token_count(self) -> int:
+        return self._compiled[None].token_count
+
+    def render(self, variant: Optional[str] = None) -> CompiledPrompt:
+        """Return the pre-rendered prompt for a variant (or the bare prefix)"""
+        if not self._compiled:
+            self.compile()
+        if not variant:
+            return self._compiled[None]
+        variant = variant.lower()
+        if variant not in self._compiled:
+            variant = self.default_variant
+        return self._compiled[variant]
+
+
+class PromptRegistry:
+    """Holds compiled prompt templates keyed by name and version"""
+
+    def __init__(self):
+        self._templates: Dict[Tuple[str, str], PromptTemplate] = {}
+        self._active: Dict[str, str] = {}
+
+    def register(self, template: PromptTemplate, active: bool = False) -> PromptTemplate:
+        key = (template.name, template.version)
+        if key in self._templates:
+            raise ValueError(f"Prompt {template.name}@{template.version} is already registered")
+        self._templates[key] = template.compile()
+        if active or template.name not in self._active:
+            self._active[template.name] = template.version
+        return template
+
+    def activate(self, name: str, version: str) -> None:
+        if (name, version) not in self._templates:
+            raise KeyError(f"Unknown prompt {name}@{version}")
+        self._active[name] = version
+
+    def get(self, name: str, version: Optional[str] = None) -> PromptTemplate:
+        version = version or self._active.get(name)
+        try:
+            return self._templates[(name, version)]
+        except KeyError:
+            raise KeyError(f"Unknown prompt {name}@{version}")
+
+    def versions(self, name: str) -> Dict[str, PromptTemplate]:
+        return {v: t for (n, v), t in self._templates.items() if n == name}
+
+    def resolve(self, name: str, subject_id: Optional[int] = None) -> PromptTemplate:
+        """
+        Pick the template version for a subject. When an experiment version is configured,
+        a stable hash of the subject id assigns that share of subjects to it.
+        """
+        experiment = settings.PROMPT_EXPERIMENT_VERSION
+        percent = settings.PROMPT_EXPERIMENT_PERCENT
+        if subject_id is not None and experiment and percent > 0 and (name, experiment) in self._templates:
+            bucket = zlib.crc32(f"{name}:{subject_id}".encode()) % 100
+            if bucket < percent:
+                return self._templates[(name, experiment)]
+        return self.get(name)
+
+
+TUTOR_SYSTEM_PROMPT = "tutor_system"
+
+prompt_registry = PromptRegistry()
+
+prompt_registry.register(PromptTemplate(
+    name=TUTOR_SYSTEM_PROMPT,
+    version="v1",
+    prefix="""
+        You are Japi, an AI English tutor. Your role is to help users improve their English skills through conversation.
+        - Be friendly, patient, and encouraging
+        - Correct mistakes in a constructive way
+        - Adapt your language to the user's level (Beginner/Intermediate/Advanced)
+        - Focus on practical, conversational English
+        - Keep responses concise and natural
+        - If the user makes a mistake, first repeat their sentence correctly, then explain the correction
+        - Ask follow-up questions to keep the conversation going
+        - For beginners: Use simple vocabulary and short sentences
+        - For intermediate: Use a wider range of vocabulary and more complex structures
+        - For advanced: Use natural, idiomatic English with more complex structures
+    """,
+    variants={
+        "beginner": """
+            The user has indicated they are at the beginner level.
+            Use simple vocabulary and short sentences. Focus on basic grammar and common phrases.
+        """,
+        "intermediate": """
+            The user has indicated they are at the intermediate level.
+            Use a wider range of vocabulary and slightly more complex sentences. Gently correct mistakes and explain when needed.
+        """,
+        "advanced": """
+            The user has indicated they are at the advanced level.
+            Use natural, idiomatic English. Focus on fluency, nuance, and more complex language structures.
+        """,
+    },
+    default_variant="advanced"
+))
+
+if settings.PROMPT_VERSION:
+    prompt_registry.activate(TUTOR_SYSTEM_PROMPT, settings.PROMPT_VERSION)
+
+__all__ = [
+    'CompiledPrompt',
+    'PromptTemplate',
+    'PromptRegistry',
+    'prompt_registry',
+    'TUTOR_SYSTEM_PROMPT',
+    'normalize_whitespace',
+    'count_tokens',
+]
@@ -0,0 +1,217 @@
+"""
+Per-request SQL accounting on top of SQLAlchemy engine events.
+
+Every statement executed while a request is in flight is counted and timed against
+that request (QueryStatsMiddleware). Statements slower than SLOW_QUERY_MS are logged
+with the application line that issued them, and a statement repeated
+N_PLUS_ONE_THRESHOLD times within one request (same SQL, any parameters) is reported
+as a likely N+1. `assert_max_queries` gives tests a query budget per code path or
+endpoint.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config.config import settings
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_INFRASTRUCTURE = os.path.join(_APP_ROOT, "infrastructure")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class QueryStats:
+    """Statements seen in one request (or one `track_queries` block)"""
+    count: int = 0
+    total_ms: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    call_sites: Dict[str, str] = field(default_factory=dict)
+    slow: List[Tuple[float, str, str]] = field(default_factory=list)
+
+    def record(self, key: str, elapsed_ms: float, call_site: Optional[str]) -> None:
+        """Count a (normalized) statement; the call site is kept from its first sighting"""
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[key] += 1
+        if call_site and key not in self.call_sites:
+            self.call_sites[key] = call_site
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements executed at least `threshold` times, most frequent first"""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+    def summary(self) -> str:
+        lines = [f"{self.count} queries in {self.total_ms:.1f}ms"]
+        for sql, n in self.statements.most_common():
+            site = self.call_sites.get(sql)
+            lines.append(f"  {n}x {sql[:200]}" + (f"  [{site}]" if site else ""))
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Budgets from assert_max_queries; they count on every thread because TestClient runs
+# the app in a different thread (and context) from the test body
+_budgets: List[QueryStats] = []
+_budgets_lock = threading.Lock()
+
+
+def _normalize(statement: str) -> str:
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def _call_site() -> Optional[str]:
+    """The innermost application frame that issued the query, preferring code outside app/infrastructure"""
+    fallback = None
+    # Walk raw frames rather than traceback.extract_stack(), which also loads source lines
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_APP_ROOT):
+            site = f"{os.path.relpath(filename, os.path.dirname(_APP_ROOT))}:{frame.f_lineno} in {frame.f_code.co_name}"
+            if not filename.startswith(_INFRASTRUCTURE):
+                return site
+            fallback = fallback or site
+        frame = frame.f_back
+    return fallback
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries(label: str = "block", report: bool = True) -> Iterator[QueryStats]:
+    """Count statements issued in this context; reports repeated statements on exit"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if report:
+            report_repeated(label, stats)
+
+
+def report_repeated(label: str, stats: QueryStats) -> None:
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+    if threshold <= 0:
+        return
+    for sql, n in stats.repeated(threshold):
+        site = stats.call_sites.get(sql, "unknown call site")
+        print(f"Possible N+1 in {label}: {n}x {sql[:300]} ({site})")
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    Fail with the statement breakdown if the block issues more than `limit` queries:
+
+        with assert_max_queries(6):
+            client.post("/chats/", json={"content": "hi"}, headers=auth)
+    """
+    stats = QueryStats()
+    with _budgets_lock:
+        _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        with _budgets_lock:
+            _budgets.remove(stats)
+    if stats.count > limit:
+        raise AssertionError(f"Expected at most {limit} queries, got {stats.summary()}")
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement on `engine` and attribute it to the active request"""
+    from sqlalchemy import event
+
+    if not settings.QUERY_STATS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        stats = _current.get()
+        slow = elapsed_ms >= settings.SLOW_QUERY_MS
+        if stats is None and not slow and not _budgets:
+            return
+
+        key = _normalize(statement)
+        with _budgets_lock:
+            budgets = list(_budgets)
+        targets = ([stats] if stats is not None else []) + budgets
+        # Walking the stack is the expensive part: only slow statements and the first
+        # sighting of a statement in a request need a call site (repeats reuse it)
+        call_site = None
+        if slow or any(key not in target.call_sites for target in targets):
+            call_site = _call_site()
+        if stats is not None:
+            stats.record(key, elapsed_ms, call_site)
+        if budgets:
+            with _budgets_lock:
+                for budget in budgets:
+                    budget.record(key, elapsed_ms, call_site)
+        if slow:
+            if stats is not None:
+                stats.slow.append((elapsed_ms, key, call_site or ""))
+            print(f"Slow query ({elapsed_ms:.1f}ms) at {call_site or 'unknown call site'}: {key[:500]}")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware giving each HTTP request its own QueryStats. The totals are returned
+    in ``X-Query-Count`` and ``Server-Timing`` headers; repeated statements are logged
+    once the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        label = f"{scope.get('method', 'GET')} {scope.get('path', '')}"
+        with track_queries(label) as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers") or []) + [
+                        (b"x-query-count", str(stats.count).encode()),
+                        (b"server-timing", f"db;dur={stats.total_ms:.1f};desc=\"{stats.count} queries\"".encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+__all__ = [
+    'QueryStats',
+    'QueryStatsMiddleware',
+    'assert_max_queries',
+    'current_stats',
+    'instrument_engine',
+    'track_queries',
+]
@@ -0,0 +1,76 @@
+"""
+Embedded SQLite backend for single-node deployments.
+
+Every connection is switched to WAL (readers never block the writer or each other) with
+synchronous=NORMAL, foreign keys on (so ON DELETE CASCADE fires as on PostgreSQL) and a
+busy timeout. SQLite allows one writer at a time. Transactions are begun here rather
+than by the sqlite3 module: reads run without one, and the first write of a transaction
+issues BEGIN IMMEDIATE, which takes the write lock up front. Concurrent writers then
+wait in SQLite's busy handler for the lock instead of failing mid-transaction when a
+deferred read lock cannot be upgraded. The lock is SQLite's own, so COMMIT, ROLLBACK or
+a closed connection always releases it, and it also orders writers in other processes.
+"""
+import re
+import sqlite3
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+
+from app.config.config import settings
+
+_WRITE_RE = re.compile(
+    r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER|SAVEPOINT)\b"
+    # A CTE whose main statement writes: WITH x AS (...) INSERT/UPDATE/DELETE ...
+    r"|^\s*WITH\b.*\)\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def is_write(statement: str) -> bool:
+    return _WRITE_RE.match(statement) is not None
+
+
+def engine_options() -> dict:
+    """create_engine() arguments for SQLite (the QueuePool sizing for Postgres doesn't apply)"""
+    return {
+        # Sessions are handed between the threadpool and background workers
+        "connect_args": {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+    }
+
+
+def configure_engine(engine: Engine) -> None:
+    """Apply pragmas to every new connection and begin write transactions with BEGIN IMMEDIATE"""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # Stop the sqlite3 module from issuing its own (deferred) BEGIN before DML;
+        # commit() and rollback() are no-ops while no transaction is open
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_MB) * 1024}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_MB) * 1024 * 1024}")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def begin_immediate(conn, cursor, statement, parameters, context, executemany):
+        # Only inside a SQLAlchemy transaction (so a COMMIT or ROLLBACK is coming), not AUTOCOMMIT
+        if conn.in_transaction() and not cursor.connection.in_transaction and is_write(statement):
+            try:
+                cursor.connection.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error as e:
+                # Surface "database is locked" like any other statement's error
+                raise exc.DBAPIError.instance("BEGIN IMMEDIATE", (), e, sqlite3.Error) from e
+
+
+__all__ = ['configure_engine', 'engine_options', 'is_sqlite', 'is_write']
@@ -0,0 +1,428 @@
+"""
+Lightweight distributed tracing.
+
+Spans are created for HTTP requests (TracingMiddleware), decorated service methods
+(`traced`), every SQL statement (SQLAlchemy engine events) and every LLM call. Trace
+context is taken from an incoming W3C ``traceparent`` header and sampling is decided once
+at the root, so unsampled requests only pay for a context-variable lookup. Any client can
+set the header's sampled flag, so it is only followed with TRACE_TRUST_PARENT. Finished
+spans are batched on a background thread and written to a JSONL file or POSTed to an
+OTLP/HTTP collector (``/v1/traces``, JSON encoding).
+"""
+import atexit
+import functools
+import inspect
+import json
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.config.config import settings
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str = "internal"
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+@dataclass(frozen=True)
+class _TraceContext:
+    trace_id: str
+    span_id: Optional[str]
+    sampled: bool
+
+
+_current: ContextVar[Optional[_TraceContext]] = ContextVar("trace_context", default=None)
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[_TraceContext]:
+    """Parse a W3C traceparent header: version-traceid-parentid-flags"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return _TraceContext(trace_id=parts[1], span_id=parts[2], sampled=bool(flags & 1))
+
+
+def format_traceparent(trace_id: str, span_id: str, sampled: bool) -> str:
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+class OTLPHttpExporter:
+    """Minimal OTLP/HTTP JSON exporter (no protobuf or SDK dependency)"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        import httpx
+
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.client = httpx.Client(timeout=5.0)
+
+    @staticmethod
+    def _value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "japi.tracing"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": _OTLP_KINDS.get(span.kind, 1),
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                            "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+                            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+        self.client.post(self.url, json=payload).raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them from a daemon thread; drops spans when full"""
+
+    def __init__(self, exporter, max_queue: int = 10000, batch_size: int = 256, interval: float = 1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._flush_lock = threading.Lock()
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        # Spans still queued when the process exits would otherwise be lost
+        atexit.register(self.flush)
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        batch = self._drain()
+        while batch:
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                print(f"Failed to export {len(batch)} spans: {e}")
+            batch = self._drain()
+
+
+class Tracer:
+    def __init__(
+        self,
+        enabled: bool,
+        sample_rate: float,
+        processor: Optional[BatchSpanProcessor] = None,
+        trust_parent: bool = False
+    ):
+        self.enabled = enabled and processor is not None
+        self.sample_rate = sample_rate
+        self.processor = processor
+        self.trust_parent = trust_parent
+
+    def is_recording(self) -> bool:
+        ctx = _current.get()
+        return ctx is not None and ctx.sampled
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[_TraceContext] = None,
+        root: bool = False
+    ) -> Iterator[Optional[Span]]:
+        """
+        Open a span as a child of the current one. Outside a sampled trace this yields
+        None, unless `root` is set, in which case a new trace may be started (sampled at
+        `sample_rate`). A `parent` from a traceparent header keeps its trace id; its sampled
+        flag is followed only when `trust_parent` is set.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        if parent is not None and not self.trust_parent:
+            parent = _TraceContext(trace_id=parent.trace_id, span_id=parent.span_id,
+                                   sampled=random.random() < self.sample_rate)
+        ctx = parent or _current.get()
+        if ctx is None:
+            if not root:
+                yield None
+                return
+            ctx = _TraceContext(trace_id=_new_id(128), span_id=None, sampled=random.random() < self.sample_rate)
+
+        if not ctx.sampled:
+            token = _current.set(ctx)
+            try:
+                yield None
+            finally:
+                _current.reset(token)
+            return
+
+        span = Span(
+            trace_id=ctx.trace_id,
+            span_id=_new_id(64),
+            parent_id=ctx.span_id,
+            name=name,
+            kind=kind,
+            attributes=dict(attributes or {})
+        )
+        token = _current.set(_TraceContext(trace_id=span.trace_id, span_id=span.span_id, sampled=True))
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            self.end(span)
+
+    def end(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        self.processor.on_end(span)
+
+    def begin(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """Start a child span without making it current (for callback-style instrumentation)"""
+        if not self.enabled:
+            return None
+        ctx = _current.get()
+        if ctx is None or not ctx.sampled:
+            return None
+        return Span(
+            trace_id=ctx.trace_id,
+            span_id=_new_id(64),
+            parent_id=ctx.span_id,
+            name=name,
+            kind=kind,
+            attributes=dict(attributes or {})
+        )
+
+
+def _build_tracer() -> Tracer:
+    if not settings.TRACING_ENABLED:
+        return Tracer(enabled=False, sample_rate=0.0)
+    if settings.TRACE_EXPORTER == "otlp":
+        exporter = OTLPHttpExporter(settings.TRACE_OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME)
+    else:
+        exporter = FileExporter(settings.TRACE_FILE_PATH)
+    return Tracer(
+        enabled=True,
+        sample_rate=settings.TRACE_SAMPLE_RATE,
+        processor=BatchSpanProcessor(exporter),
+        trust_parent=settings.TRACE_TRUST_PARENT
+    )
+
+
+tracer = _build_tracer()
+
+
+def traced(name: Optional[str] = None, kind: str = "internal") -> Callable:
+    """Decorator wrapping sync, async and async-generator functions in a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.isasyncgenfunction(func):
+            # The span is not made current: the context var would stay set across each
+            # yield (leaking into the consumer) and could not be reset from another context
+            @functools.wraps(func)
+            async def asyncgen_wrapper(*args, **kwargs):
+                span = tracer.begin(span_name, kind=kind)
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                except Exception as e:
+                    if span is not None:
+                        span.record_error(e)
+                    raise
+                finally:
+                    if span is not None:
+                        tracer.end(span)
+            return asyncgen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_span(span_name, kind=kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_span(span_name, kind=kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root server span for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        method = scope.get("method", "GET")
+
+        with tracer.start_span(
+            f"{method} {scope.get('path', '')}",
+            kind="server",
+            attributes={"http.method": method, "http.target": scope.get("path", "")},
+            parent=parent,
+            root=True
+        ) as span:
+            async def send_wrapper(message):
+                if span is not None and message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"traceparent", format_traceparent(span.trace_id, span.span_id, True).encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+            if span is not None and scope.get("endpoint") is not None:
+                span.set_attribute("http.handler", scope["endpoint"].__name__)
+
+
+def instrument_engine(engine) -> None:
+    """Emit a client span for every SQL statement executed on `engine`"""
+    from sqlalchemy import event
+
+    if not tracer.enabled:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.begin(
+            "db.query",
+            kind="client",
+            attributes={
+                "db.system": engine.dialect.name,
+                "db.statement": statement[:1000],
+                "db.executemany": executemany,
+            }
+        )
+        if span is not None:
+            conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            span = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            tracer.end(span)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_error(exception_context.original_exception)
+            tracer.end(span)
+
+
+__all__ = ['tracer', 'traced', 'Span', 'TracingMiddleware', 'instrument_engine', 'parse_traceparent']
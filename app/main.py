@@ -1,13 +1,32 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.openapi.utils import get_openapi
 
 from app.modules.users.routes import router as users_router
 from app.modules.chats.routes import router as chat_router
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.infrastructure.database import get_db
 from app.infrastructure.init_db import init_db
+from app.infrastructure.jobs import job_runner
+from app.infrastructure.ai_service import ai
+from app.infrastructure.query_stats import QueryStatsMiddleware
+from app.infrastructure.tracing import TracingMiddleware
+from app.modules.users.models import User
+from app.shared.deps import get_current_active_admin
 
 init_db()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.JOBS_ENABLED:
+        await job_runner.start()
+    yield
+    await job_runner.stop()
+
 app = FastAPI(
     title="Japi AI Tutor API",
     description="Backend API for Japi AI Tutor - A personalized English learning assistant",
@@ -18,7 +37,8 @@ app = FastAPI(
     },
     license_info={
         "name": "MIT"
-    }
+    },
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -29,6 +49,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL
+)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 app.include_router(users_router)
 app.include_router(chat_router)
 
@@ -41,6 +69,16 @@ async def root():
         "version": "1.0.0"
     }
 
+@app.get("/health/jobs")
+async def jobs_health(db: Session = Depends(get_db), admin: User = Depends(get_current_active_admin)):
+    """Background job queue depth and lag (admin only)"""
+    return job_runner.stats(db)
+
+@app.get("/health/models")
+async def models_health(admin: User = Depends(get_current_active_admin)):
+    """Model tier health and the most recent routing decisions (admin only)"""
+    return ai.router.snapshot()
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -1,5 +1,5 @@
-from .models import Message
-from .schemas import MessageRole, MessageBase, MessageCreate, MessageUpdate, MessageResponse, ChatRequest, ChatResponse
+from .models import Message, MessageUsage, MessageEmbedding
+from .schemas import MessageRole, MessageBase, MessageCreate, MessageUpdate, MessageResponse, MessageSearchResult, MessageSearchResponse, MessageUsageCreate, UsageGroupBy, UsageAggregate, DeletionStatus, ChatRequest, ChatResponse
 from .repository import ChatRepository
 from .services import ChatService
 from . import routes
@@ -7,6 +7,8 @@ from . import routes
 __all__ = [
     # Models
     'Message',
+    'MessageUsage',
+    'MessageEmbedding',
     
     # Repository
     'ChatRepository',
@@ -23,6 +25,12 @@ __all__ = [
     'MessageCreate',
     'MessageUpdate',
     'MessageResponse',
+    'MessageSearchResult',
+    'MessageSearchResponse',
+    'MessageUsageCreate',
+    'UsageGroupBy',
+    'UsageAggregate',
+    'DeletionStatus',
     'ChatRequest',
     'ChatResponse',
 ]
@@ -0,0 +1,172 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from app.config.config import settings
+
+# Rough per-message overhead (object, deque slot, datetime) on top of the content itself
+_MESSAGE_OVERHEAD_BYTES = 200
+
+
+class CacheConsistencyError(AssertionError):
+    """Raised in verify mode when the cached window disagrees with the database"""
+
+
+@dataclass(frozen=True)
+class CachedMessage:
+    """Detached, immutable copy of a Message row that is safe to share across sessions"""
+    id: int
+    content: str
+    role: str
+    user_id: int
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, message) -> "CachedMessage":
+        role = getattr(message.role, "value", message.role)
+        return cls(
+            id=message.id,
+            content=message.content,
+            role=role,
+            user_id=message.user_id,
+            created_at=message.created_at
+        )
+
+    @property
+    def size(self) -> int:
+        return sys.getsizeof(self.content) + _MESSAGE_OVERHEAD_BYTES
+
+
+@dataclass
+class _Window:
+    messages: Deque[CachedMessage]
+    # True when the window holds the user's entire history (fewer messages than it can hold)
+    complete: bool
+    last_access: float = field(default_factory=time.monotonic)
+    size: int = 0
+
+
+class ConversationCache:
+    """
+    Per-user ring buffer of the most recent messages, kept in process memory.
+
+    ChatRepository writes through on create_message and invalidates on deletes, so a
+    steady-state turn assembles its context without querying the database. Windows are
+    evicted least-recently-used once the global byte budget is exceeded and dropped
+    after `idle_ttl` seconds without access. The cache assumes this process is the only
+    writer for the users it serves (a single app instance per database).
+    """
+
+    def __init__(
+        self,
+        window_size: int = settings.CONVERSATION_CACHE_WINDOW,
+        max_bytes: int = settings.CONVERSATION_CACHE_MAX_BYTES,
+        idle_ttl: float = settings.CONVERSATION_CACHE_IDLE_TTL_SECONDS
+    ):
+        self.window_size = window_size
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._windows: "OrderedDict[int, _Window]" = OrderedDict()
+        # Bumped on every write/invalidation so a load racing a write can be discarded
+        self._generations: Dict[int, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(self, user_id: int, limit: int) -> Optional[List[CachedMessage]]:
+        """Up to `limit` most recent messages, oldest first; None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(user_id)
+            if window is not None and now - window.last_access > self.idle_ttl:
+                self._drop(user_id)
+                window = None
+            if window is None or (limit > len(window.messages) and not window.complete):
+                self.misses += 1
+                return None
+            window.last_access = now
+            self._windows.move_to_end(user_id)
+            self.hits += 1
+            messages = list(window.messages)
+        return messages[-limit:] if limit > 0 else []
+
+    def load(self, user_id: int, messages: List[CachedMessage], generation: int) -> None:
+        """Install a window read from the database (oldest first) unless a write raced it"""
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            self._drop(user_id)
+            window = _Window(
+                messages=deque(messages[-self.window_size:], maxlen=self.window_size),
+                complete=len(messages) < self.window_size
+            )
+            window.size = sum(m.size for m in window.messages)
+            self._windows[user_id] = window
+            self._size += window.size
+            self._evict()
+
+    def append(self, message: CachedMessage) -> None:
+        """Write-through for a newly committed message"""
+        with self._lock:
+            user_id = message.user_id
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            window = self._windows.get(user_id)
+            if window is None:
+                return
+            if window.messages and window.messages[-1].id >= message.id:
+                return
+            if len(window.messages) == window.messages.maxlen:
+                evicted = window.messages[0]
+                window.size -= evicted.size
+                self._size -= evicted.size
+                window.complete = False
+            window.messages.append(message)
+            window.size += message.size
+            self._size += message.size
+            self._evict()
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._drop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+            self._generations.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._windows),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _drop(self, user_id: int) -> None:
+        window = self._windows.pop(user_id, None)
+        if window is not None:
+            self._size -= window.size
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # The OrderedDict is in access order, so idle and LRU windows are at the front
+        while self._windows:
+            user_id, window = next(iter(self._windows.items()))
+            if self._size <= self.max_bytes and now - window.last_access <= self.idle_ttl:
+                break
+            self._drop(user_id)
+
+
+conversation_cache = ConversationCache()
@@ -0,0 +1,71 @@
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.infrastructure.jobs import job_runner
+from app.modules.users.repository import UserRepository
+from .repository import ChatRepository
+
+DELETE_HISTORY_JOB = "chats.delete_history"
+DELETE_ACCOUNT_JOB = "users.delete_account"
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def delete_history_in_chunks(
+    repo: ChatRepository,
+    user_id: int,
+    up_to_id: Optional[int] = None,
+    chunk_size: int = settings.MESSAGE_DELETE_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None
+) -> int:
+    """
+    Delete a user's messages (those with id <= `up_to_id`, default all) one chunk per
+    transaction, so a large history never holds long locks or loads into memory.
+    Messages written after `up_to_id` are kept. Safe to re-run after an interruption.
+    """
+    if up_to_id is None:
+        up_to_id = repo.latest_message_id(user_id)
+    if up_to_id is None:
+        return 0
+
+    total = repo.count_messages(user_id, up_to_id)
+    deleted = 0
+    while True:
+        count = repo.delete_messages_chunk(user_id, up_to_id, chunk_size)
+        if count == 0:
+            break
+        deleted += count
+        if progress is not None:
+            progress({"user_id": user_id, "deleted": deleted, "total": total})
+
+    # Remaining (newer) messages, if any, are few: recount them rather than adjust
+    repo.stats_repo.rebuild(user_id)
+    return deleted
+
+
+@job_runner.register(DELETE_HISTORY_JOB)
+def delete_history_job(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    repo = ChatRepository(db)
+    user_id = payload["user_id"]
+    deleted = delete_history_in_chunks(
+        repo, user_id, payload.get("up_to_id"), progress=job_runner.report_progress
+    )
+    return {"user_id": user_id, "deleted": deleted, "total": payload.get("total", deleted)}
+
+
+@job_runner.register(DELETE_ACCOUNT_JOB)
+def delete_account_job(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove the history in chunks first; the user row (and the rest, by cascade) goes last"""
+    user_id = payload["user_id"]
+    deleted = delete_history_in_chunks(ChatRepository(db), user_id, progress=job_runner.report_progress)
+    UserRepository(db).delete_user(user_id)
+    return {"user_id": user_id, "deleted": deleted, "user_deleted": True}
+
+
+__all__ = [
+    'DELETE_HISTORY_JOB',
+    'DELETE_ACCOUNT_JOB',
+    'delete_history_in_chunks',
+]
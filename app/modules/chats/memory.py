@@ -0,0 +1,255 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.infrastructure.embeddings import build_embedder, from_bytes, to_bytes
+from app.infrastructure.jobs import job_runner
+from app.infrastructure.prompts import count_tokens
+from . import models
+
+EMBED_MESSAGES_JOB = "chats.embed_messages"
+
+# Longest excerpt of one recalled message placed in the prompt
+_MAX_MEMORY_CHARS = 240
+
+
+class VectorIndex:
+    """
+    One user's message embeddings as a contiguous float32 matrix (rows are unit
+    vectors) with a parallel array of message ids. Capacity grows geometrically so
+    appends are amortised O(1); queries are a single matrix product.
+    """
+
+    def __init__(self, dimensions: int, capacity: int = 64):
+        self.dimensions = dimensions
+        self.size = 0
+        self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._known = set()
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        fresh = [i for i, message_id in enumerate(ids) if message_id not in self._known]
+        if not fresh:
+            return
+        needed = self.size + len(fresh)
+        if needed > len(self._ids):
+            capacity = max(needed, 2 * len(self._ids))
+            self._vectors = np.resize(self._vectors, (capacity, self.dimensions))
+            self._ids = np.resize(self._ids, capacity)
+        self._vectors[self.size:needed] = vectors[fresh]
+        self._ids[self.size:needed] = [ids[i] for i in fresh]
+        self._known.update(ids[i] for i in fresh)
+        self.size = needed
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        exclude: Iterable[int] = ()
+    ) -> List[List[Tuple[int, float]]]:
+        """Top-k (message id, cosine similarity) for each query row, best first"""
+        if self.size == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ self._vectors[:self.size].T  # (queries, size)
+        exclude = list(exclude)
+        if exclude:
+            scores[:, np.isin(self._ids[:self.size], exclude)] = -np.inf
+
+        k = min(k, self.size)
+        # argpartition finds the k best in O(n); only those k are sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([
+                (int(self._ids[i]), float(scores[row, i]))
+                for i in ordered
+                if np.isfinite(scores[row, i])
+            ])
+        return results
+
+
+@dataclass(frozen=True)
+class Memory:
+    message_id: int
+    role: str
+    content: str
+    score: float
+
+
+class MemoryStore:
+    """
+    Semantic memory over each user's past messages.
+
+    Embeddings are computed off the request path (post-turn job) and persisted in
+    ``message_embeddings``; a user's vectors are loaded into a VectorIndex on first use
+    and evicted least-recently-used beyond `max_users`.
+    """
+
+    def __init__(self, embedder=None, max_users: int = settings.MEMORY_MAX_USERS):
+        self._embedder = embedder
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, VectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = build_embedder()
+        return self._embedder
+
+    @embedder.setter
+    def embedder(self, embedder) -> None:
+        with self._lock:
+            self._embedder = embedder
+            self._indexes.clear()
+
+    def _load(self, db: Session, user_id: int) -> VectorIndex:
+        index = VectorIndex(self.embedder.dimensions)
+        rows = (
+            db.query(models.MessageEmbedding.message_id, models.MessageEmbedding.vector)
+            .filter(
+                models.MessageEmbedding.user_id == user_id,
+                models.MessageEmbedding.embedder == self.embedder.name
+            )
+            .yield_per(1000)
+        )
+        batch_ids, batch_vectors = [], []
+        for message_id, vector in rows:
+            batch_ids.append(message_id)
+            batch_vectors.append(from_bytes(vector, self.embedder.dimensions))
+            if len(batch_ids) >= 1000:
+                index.add(batch_ids, np.vstack(batch_vectors))
+                batch_ids, batch_vectors = [], []
+        if batch_ids:
+            index.add(batch_ids, np.vstack(batch_vectors))
+        return index
+
+    def _get(self, db: Session, user_id: int) -> VectorIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self._load(db, user_id)
+        with self._lock:
+            index = self._indexes.setdefault(user_id, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def embed_messages(self, db: Session, messages: List[models.Message]) -> int:
+        """Embed and store messages (one batched embedder call); returns how many were new"""
+        existing = {
+            message_id for (message_id,) in db.query(models.MessageEmbedding.message_id)
+            .filter(models.MessageEmbedding.message_id.in_([m.id for m in messages]))
+        }
+        messages = [m for m in messages if m.id not in existing and m.content.strip()]
+        if not messages:
+            return 0
+
+        vectors = self.embedder.embed([m.content for m in messages])
+        for message, vector in zip(messages, vectors):
+            db.add(models.MessageEmbedding(
+                message_id=message.id,
+                user_id=message.user_id,
+                embedder=self.embedder.name,
+                vector=to_bytes(vector)
+            ))
+        db.commit()
+
+        by_user: Dict[int, List[int]] = {}
+        for row, message in enumerate(messages):
+            by_user.setdefault(message.user_id, []).append(row)
+        with self._lock:
+            for user_id, rows in by_user.items():
+                index = self._indexes.get(user_id)
+                if index is not None:
+                    index.add([messages[r].id for r in rows], vectors[rows])
+        return len(messages)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def recall(
+        self,
+        db: Session,
+        user_id: int,
+        query: str,
+        exclude: Iterable[int] = (),
+        k: int = settings.MEMORY_TOP_K,
+        min_score: float = settings.MEMORY_MIN_SCORE
+    ) -> List[Memory]:
+        """The user's past messages most similar to `query`, best first"""
+        index = self._get(db, user_id)
+        if index.size == 0:
+            return []
+        query_vector = self.embedder.embed([query])
+        with self._lock:
+            hits = index.search(query_vector, k, exclude=exclude)[0]
+        hits = [(message_id, score) for message_id, score in hits if score >= min_score]
+        if not hits:
+            return []
+
+        rows = {
+            message.id: message
+            for message in db.query(models.Message).filter(models.Message.id.in_([m for m, _ in hits]))
+        }
+        return [
+            Memory(
+                message_id=message_id,
+                role=getattr(rows[message_id].role, "value", rows[message_id].role),
+                content=rows[message_id].content,
+                score=score
+            )
+            for message_id, score in hits
+            if message_id in rows
+        ]
+
+
+def format_memories(memories: List[Memory], max_tokens: int = settings.MEMORY_MAX_TOKENS) -> List[str]:
+    """Excerpts of recalled messages, most relevant first, capped at `max_tokens` in total"""
+    lines, used, seen = [], 0, set()
+    for memory in memories:
+        text = " ".join(memory.content.split())
+        if text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        if len(text) > _MAX_MEMORY_CHARS:
+            text = text[:_MAX_MEMORY_CHARS].rsplit(" ", 1)[0] + "..."
+        line = f"{'Student' if memory.role == 'user' else 'Tutor'}: {text}"
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return lines
+
+
+memory_store = MemoryStore()
+
+
+@job_runner.register(EMBED_MESSAGES_JOB)
+def embed_messages_job(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Post-turn job: embed the turn's user and AI messages"""
+    ids = (payload.get("user_message_ids") or [payload.get("user_message_id")]) + [payload.get("ai_message_id")]
+    messages = db.query(models.Message).filter(models.Message.id.in_([i for i in ids if i])).all()
+    return {"embedded": memory_store.embed_messages(db, messages)}
+
+__all__ = [
+    'EMBED_MESSAGES_JOB',
+    'Memory',
+    'MemoryStore',
+    'VectorIndex',
+    'format_memories',
+    'memory_store',
+]
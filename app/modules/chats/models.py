@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, Float, Boolean, String, Text, DateTime, ForeignKey, Enum, Index, LargeBinary
+from sqlalchemy.sql import func, literal_column
 from sqlalchemy.orm import relationship
 
 from app.infrastructure.database import Base
 
+# Text search configuration used by both the GIN index and search queries; the
+# expressions must match exactly for PostgreSQL to use the index.
+FTS_CONFIG = literal_column("'english'::regconfig")
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -16,5 +20,56 @@ class Message(Base):
     # Relationship with User
     user = relationship("User", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_user_id_created_at", "user_id", "created_at"),
+        # Latest message per user (history ETags, deletion cut-off) is an index-only lookup
+        Index("ix_messages_user_id_id", "user_id", "id"),
+        Index(
+            "ix_messages_content_fts",
+            func.to_tsvector(FTS_CONFIG, content),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    def __repr__(self):
+        return f"<Message {self.id} - {self.role} - {self.created_at}>"
+
+class MessageUsage(Base):
+    """LLM usage and latency for one AI message"""
+    __tablename__ = "message_usage"
+
+    message_id = Column(Integer, ForeignKey("messages.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    model = Column(String(100), nullable=True)  # None for the local canned tier
+    tier = Column(String(50), nullable=True)
+    prompt_version = Column(String(50), nullable=True)
+    user_level = Column(String(20), nullable=True)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    cached_tokens = Column(Integer, default=0, nullable=False)
+    cache_hit = Column(Boolean, default=False, nullable=False)
+    retry_count = Column(Integer, default=0, nullable=False)
+    latency_ms = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_message_usage_user_id_created_at", "user_id", "created_at"),
+        Index("ix_message_usage_created_at", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<MessageUsage {self.message_id} - {self.model} - {self.prompt_tokens}+{self.completion_tokens}>"
+
+class MessageEmbedding(Base):
+    """Embedding of one message for semantic memory, as raw float32 bytes"""
+    __tablename__ = "message_embeddings"
+
+    message_id = Column(Integer, ForeignKey("messages.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Embedder name (model and dimensions); vectors from other embedders are ignored
+    embedder = Column(String(100), nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
     def __repr__(self):
-        return f"<Message {self.id} - {self.role} - {self.created_at}>"
\ No newline at end of file
+        return f"<MessageEmbedding {self.message_id} - {self.embedder}>"
@@ -1,23 +1,45 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 
+from app.config.config import settings
 from . import models, schemas
+from .cache import CacheConsistencyError, CachedMessage, conversation_cache
+from .memory import memory_store
+from .search import message_search_index
+from app.modules.users.repository import UserStatsRepository
 
 class ChatRepository:
     def __init__(self, db: Session):
         self.db = db
+        self.stats_repo = UserStatsRepository(db)
 
-    def create_message(self, message: schemas.MessageCreate, user_id: int) -> models.Message:
-        """Create a new message"""
+    def create_message(
+        self,
+        message: schemas.MessageCreate,
+        user_id: int,
+        usage: Optional[schemas.MessageUsageCreate] = None
+    ) -> models.Message:
+        """Create a new message (with its LLM usage, if any) and update the user's stats in the same transaction"""
         db_message = models.Message(
             content=message.content,
             role=message.role,
             user_id=user_id
         )
         self.db.add(db_message)
+        if usage is not None:
+            self.db.flush()
+            self.db.add(models.MessageUsage(
+                message_id=db_message.id,
+                user_id=user_id,
+                **usage.model_dump()
+            ))
+        self.stats_repo.record_message(user_id, message.role, len(message.content))
         self.db.commit()
         self.db.refresh(db_message)
+        conversation_cache.append(CachedMessage.from_model(db_message))
+        message_search_index.add(db_message)
         return db_message
 
     def get_user_messages(
@@ -39,9 +61,50 @@ class ChatRepository:
     def delete_messages(self, user_id: int) -> bool:
         """Delete all messages by user_id"""
         deleted_count = self.db.query(models.Message).filter(models.Message.user_id == user_id).delete()
+        self.stats_repo.reset(user_id)
         self.db.commit()
+        conversation_cache.invalidate(user_id)
+        message_search_index.invalidate(user_id)
+        memory_store.invalidate(user_id)
         return deleted_count > 0
     
+    def latest_message_id(self, user_id: int) -> Optional[int]:
+        return (
+            self.db.query(func.max(models.Message.id))
+            .filter(models.Message.user_id == user_id)
+            .scalar()
+        )
+
+    def count_messages(self, user_id: int, up_to_id: Optional[int] = None) -> int:
+        query = self.db.query(func.count(models.Message.id)).filter(models.Message.user_id == user_id)
+        if up_to_id is not None:
+            query = query.filter(models.Message.id <= up_to_id)
+        return query.scalar()
+
+    def delete_messages_chunk(self, user_id: int, up_to_id: int, chunk_size: int) -> int:
+        """
+        Delete the user's oldest `chunk_size` messages with id <= `up_to_id` in a short
+        transaction of its own; returns how many were deleted (0 when done).
+        """
+        ids = [
+            message_id for (message_id,) in (
+                self.db.query(models.Message.id)
+                .filter(models.Message.user_id == user_id, models.Message.id <= up_to_id)
+                .order_by(models.Message.id.asc())
+                .limit(chunk_size)
+                .all()
+            )
+        ]
+        if not ids:
+            return 0
+        self.db.query(models.Message).filter(models.Message.id.in_(ids)).delete(synchronize_session=False)
+        self.stats_repo.touch(user_id)
+        self.db.commit()
+        conversation_cache.invalidate(user_id)
+        message_search_index.invalidate(user_id)
+        memory_store.invalidate(user_id)
+        return len(ids)
+
     def get_chat_history(self, user_id: int, limit: int = 20) -> List[models.Message]:
         """Get the chat history for a user, most recent first"""
         return (
@@ -50,4 +113,122 @@ class ChatRepository:
             .order_by(models.Message.created_at.desc())
             .limit(limit)
             .all()
-        )
\ No newline at end of file
+        )
+
+    def get_recent_messages(self, user_id: int, limit: int = 10) -> List[CachedMessage]:
+        """
+        The user's most recent messages, oldest first, served from the conversation
+        cache when possible. Misses load a full window from the database.
+        """
+        if not settings.CONVERSATION_CACHE_ENABLED:
+            return self._load_recent_messages(user_id, limit)
+
+        cached = conversation_cache.get(user_id, limit)
+        if cached is not None:
+            if settings.CONVERSATION_CACHE_VERIFY:
+                self._verify_cached_window(user_id, cached)
+            return cached
+
+        generation = conversation_cache.generation(user_id)
+        window = self._load_recent_messages(user_id, max(limit, conversation_cache.window_size))
+        conversation_cache.load(user_id, window, generation)
+        return window[-limit:] if limit > 0 else []
+
+    def _load_recent_messages(self, user_id: int, limit: int) -> List[CachedMessage]:
+        rows = (
+            self.db.query(models.Message)
+            .filter(models.Message.user_id == user_id)
+            .order_by(models.Message.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [CachedMessage.from_model(msg) for msg in reversed(rows)]
+
+    def _verify_cached_window(self, user_id: int, cached: List[CachedMessage]) -> None:
+        expected = self._load_recent_messages(user_id, len(cached))
+        if [(m.id, m.content, m.role) for m in cached] != [(m.id, m.content, m.role) for m in expected]:
+            raise CacheConsistencyError(
+                f"Conversation cache for user {user_id} is stale: "
+                f"cached ids {[m.id for m in cached]}, database ids {[m.id for m in expected]}"
+            )
+
+    def search_messages(
+        self,
+        user_id: int,
+        query: str,
+        skip: int = 0,
+        limit: int = 20
+    ) -> List[Tuple[models.Message, float]]:
+        """Full-text search over a user's messages, best match first"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            ts_query = func.websearch_to_tsquery(models.FTS_CONFIG, query)
+            vector = func.to_tsvector(models.FTS_CONFIG, models.Message.content)
+            rank = func.ts_rank_cd(vector, ts_query)
+            return (
+                self.db.query(models.Message, rank)
+                .filter(models.Message.user_id == user_id)
+                .filter(vector.op("@@")(ts_query))
+                .order_by(rank.desc(), models.Message.id.desc())
+                .offset(skip)
+                .limit(limit)
+                .all()
+            )
+
+        ranked = message_search_index.search(self.db, user_id, query)[skip:skip + limit]
+        if not ranked:
+            return []
+        messages = {
+            msg.id: msg
+            for msg in self.db.query(models.Message)
+            .filter(models.Message.id.in_([message_id for message_id, _ in ranked]))
+            .all()
+        }
+        return [
+            (messages[message_id], score)
+            for message_id, score in ranked
+            if message_id in messages
+        ]
+
+    def get_usage_aggregates(
+        self,
+        start: date,
+        end: date,
+        user_id: Optional[int] = None,
+        by_day: bool = True,
+        by_user: bool = False,
+        group_by: schemas.UsageGroupBy = schemas.UsageGroupBy.NONE
+    ) -> List[schemas.UsageAggregate]:
+        """Sum LLM usage over [start, end] (inclusive dates, UTC), grouped as requested"""
+        usage = models.MessageUsage
+        day = func.date(usage.created_at)
+        columns, labels = [], []
+        if by_day:
+            columns.append(day.label("day"))
+            labels.append("day")
+        if by_user:
+            columns.append(usage.user_id.label("user_id"))
+            labels.append("user_id")
+        if group_by != schemas.UsageGroupBy.NONE:
+            columns.append(getattr(usage, group_by.value).label("group"))
+            labels.append("group")
+
+        query = self.db.query(
+            *columns,
+            func.count(usage.message_id).label("messages"),
+            func.coalesce(func.sum(usage.prompt_tokens), 0).label("prompt_tokens"),
+            func.coalesce(func.sum(usage.completion_tokens), 0).label("completion_tokens"),
+            func.coalesce(func.sum(usage.cached_tokens), 0).label("cached_tokens"),
+            func.coalesce(func.sum(case((usage.cache_hit, 1), else_=0)), 0).label("cache_hits"),
+            func.coalesce(func.sum(usage.retry_count), 0).label("retries"),
+            func.avg(usage.latency_ms).label("avg_latency_ms"),
+            func.max(usage.latency_ms).label("max_latency_ms")
+        ).filter(
+            usage.created_at >= datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc),
+            usage.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        )
+        if user_id is not None:
+            query = query.filter(usage.user_id == user_id)
+        if labels:
+            query = query.group_by(*columns).order_by(*columns)
+
+        return [schemas.UsageAggregate(**row._asdict()) for row in query.all()]
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime, timedelta, timezone
 
 from app.infrastructure.database import get_db
-from app.shared.deps import get_current_active_user
+from app.shared.deps import get_current_active_user, get_current_active_admin
+from app.shared.http_cache import etag_matches, not_modified, set_etag
 from . import schemas, services, repository
+from .websocket import ChatSession
 from app.modules.users.models import User
 
 router = APIRouter(prefix="/chats", tags=["chats"])
@@ -36,20 +39,120 @@ async def send_message(
             detail=str(e)
         )
 
+@router.websocket("/ws")
+async def chat_session(websocket: WebSocket):
+    """
+    Continuous chat over a WebSocket: authenticate once, then exchange messages with
+    streamed AI replies. See ChatSession for the frame protocol.
+    """
+    await ChatSession(websocket).run()
+
 @router.get("/", response_model=List[schemas.MessageResponse])
 async def get_chat_history(
+    response: Response,
     limit: int = 20,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     chat_service: services.ChatService = Depends(get_chat_service)
 ):
-    """Get chat history for the current user"""
+    """
+    Get chat history for the current user. Send the returned ETag back in
+    If-None-Match to get a 304 while nothing has changed.
+    """
+    etag = chat_service.get_chat_history_etag(current_user, limit=limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return chat_service.get_chat_history(current_user, limit=limit)
 
+@router.get("/search", response_model=schemas.MessageSearchResponse)
+async def search_chat_history(
+    q: str = Query(..., min_length=1, max_length=200, description="Words or phrase to search for"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user),
+    chat_service: services.ChatService = Depends(get_chat_service)
+):
+    """Search the current user's chat history, best match first"""
+    return chat_service.search_messages(current_user, q, skip=skip, limit=limit)
+
+def _usage_range(start: Optional[date], end: Optional[date]):
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    return start, end
+
+@router.get("/usage", response_model=List[schemas.UsageAggregate])
+async def get_my_usage(
+    start: Optional[date] = Query(None, description="First day (UTC), defaults to 30 days ago"),
+    end: Optional[date] = Query(None, description="Last day (UTC), defaults to today"),
+    group_by: schemas.UsageGroupBy = schemas.UsageGroupBy.NONE,
+    current_user: User = Depends(get_current_active_user),
+    chat_service: services.ChatService = Depends(get_chat_service)
+):
+    """LLM token usage and latency per day for the current user"""
+    start, end = _usage_range(start, end)
+    try:
+        return chat_service.get_usage(start, end, user_id=current_user.id, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/usage/daily", response_model=List[schemas.UsageAggregate])
+async def get_daily_usage(
+    start: Optional[date] = Query(None, description="First day (UTC), defaults to 30 days ago"),
+    end: Optional[date] = Query(None, description="Last day (UTC), defaults to today"),
+    group_by: schemas.UsageGroupBy = schemas.UsageGroupBy.NONE,
+    admin: User = Depends(get_current_active_admin),
+    chat_service: services.ChatService = Depends(get_chat_service)
+):
+    """LLM token usage and latency per day across all users (admin only)"""
+    start, end = _usage_range(start, end)
+    try:
+        return chat_service.get_usage(start, end, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/usage/users", response_model=List[schemas.UsageAggregate])
+async def get_usage_by_user(
+    start: Optional[date] = Query(None, description="First day (UTC), defaults to 30 days ago"),
+    end: Optional[date] = Query(None, description="Last day (UTC), defaults to today"),
+    group_by: schemas.UsageGroupBy = schemas.UsageGroupBy.NONE,
+    admin: User = Depends(get_current_active_admin),
+    chat_service: services.ChatService = Depends(get_chat_service)
+):
+    """LLM token usage and latency totals per user over a date range (admin only)"""
+    start, end = _usage_range(start, end)
+    try:
+        return chat_service.get_usage(start, end, by_user=True, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 @router.delete("/", status_code=status.HTTP_200_OK)
 async def clear_chat_history(
+    response: Response,
+    background: Optional[bool] = Query(
+        None, description="Delete in the background (default: only for large histories)"
+    ),
+    current_user: User = Depends(get_current_active_user),
+    chat_service: services.ChatService = Depends(get_chat_service)
+):
+    """
+    Clear chat history for the current user. Background deletions answer 202 with a
+    job id; poll GET /chats/deletions/{job_id} for progress.
+    """
+    job_id = chat_service.clear_chat_history(current_user, background=background)
+    if job_id is not None:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "Chat history deletion started", "job_id": job_id}
+    return {"message": "Chat history cleared successfully"}
+
+@router.get("/deletions/{job_id}", response_model=schemas.DeletionStatus)
+async def get_deletion_status(
+    job_id: int,
     current_user: User = Depends(get_current_active_user),
     chat_service: services.ChatService = Depends(get_chat_service)
 ):
-    """Clear chat history for the current user"""
-    chat_service.clear_chat_history(current_user)
-    return {"message": "Chat history cleared successfully"}
\ No newline at end of file
+    """Progress of a background chat history deletion"""
+    deletion = chat_service.get_deletion_status(current_user, job_id)
+    if deletion is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deletion job not found")
+    return deletion
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 from enum import Enum
 
@@ -28,6 +28,54 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+class MessageSearchResult(MessageResponse):
+    rank: float = Field(..., description="Relevance score; higher is a better match")
+
+class MessageSearchResponse(BaseModel):
+    query: str
+    skip: int
+    limit: int
+    results: List[MessageSearchResult]
+
+class DeletionStatus(BaseModel):
+    job_id: int
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    deleted: int = Field(0, description="Messages deleted so far")
+    total: int = Field(0, description="Messages to delete")
+    error: Optional[str] = None
+
+class MessageUsageCreate(BaseModel):
+    model: Optional[str] = None
+    tier: Optional[str] = None
+    prompt_version: Optional[str] = None
+    user_level: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cache_hit: bool = False
+    retry_count: int = 0
+    latency_ms: Optional[float] = None
+
+class UsageGroupBy(str, Enum):
+    NONE = "none"
+    MODEL = "model"
+    TIER = "tier"
+    USER_LEVEL = "user_level"
+    PROMPT_VERSION = "prompt_version"
+
+class UsageAggregate(BaseModel):
+    day: Optional[date] = None
+    user_id: Optional[int] = None
+    group: Optional[str] = Field(None, description="Value of the group_by column, if grouped")
+    messages: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    cache_hits: int
+    retries: int
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+
 class ChatRequest(BaseModel):
     message: str = Field(..., description="The message content from the user")
 
@@ -0,0 +1,149 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+_STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "that", "the", "this", "to",
+    "was", "what", "when", "where", "which", "who", "why", "with", "you",
+})
+
+_SUFFIXES = ("ations", "ation", "ings", "ing", "edly", "ed", "ies", "es", "s")
+
+
+def _stem(word: str) -> str:
+    """Very small suffix stripper so 'explained'/'explains'/'explaining' share a term"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            stem = word[: -len(suffix)]
+            return stem + "y" if suffix == "ies" else stem
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        _stem(token.split("'")[0])
+        for token in _TOKEN_RE.findall(text.lower())
+        if token not in _STOP_WORDS
+    ]
+
+
+class InvertedIndex:
+    """In-memory term -> {message_id: term frequency} index for one user's messages"""
+
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def add(self, message_id: int, content: str) -> None:
+        if message_id in self.doc_lengths:
+            return
+        terms = tokenize(content)
+        self.doc_lengths[message_id] = len(terms)
+        self.total_length += len(terms)
+        for term, freq in Counter(terms).items():
+            self.postings.setdefault(term, {})[message_id] = freq
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Messages containing every query term, ranked by BM25 then recency (higher id)"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return []
+
+        postings = [self.postings.get(term) for term in terms]
+        if any(p is None for p in postings):
+            return []
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        doc_count = len(self.doc_lengths)
+        avg_length = self.total_length / doc_count or 1.0
+        scored = []
+        for message_id in candidates:
+            length_norm = 1 - self.B + self.B * self.doc_lengths[message_id] / avg_length
+            score = 0.0
+            for posting in postings:
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                tf = posting[message_id]
+                score += idf * tf * (self.K1 + 1) / (tf + self.K1 * length_norm)
+            scored.append((message_id, score))
+
+        scored.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return scored
+
+
+class MessageSearchIndex:
+    """
+    Per-user inverted indexes used when the database has no full-text search
+    (SQLite in tests and single-node deployments). Indexes are built lazily from the
+    messages table on a user's first search, kept up to date by ChatRepository writes
+    and evicted least-recently-used beyond `max_users`.
+    """
+
+    def __init__(self, max_users: int = 256):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, InvertedIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, user_id: int) -> InvertedIndex:
+        index = InvertedIndex()
+        rows = (
+            db.query(models.Message.id, models.Message.content)
+            .filter(models.Message.user_id == user_id)
+            .yield_per(1000)
+        )
+        for message_id, content in rows:
+            index.add(message_id, content)
+        return index
+
+    def _get(self, db: Session, user_id: int) -> InvertedIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self._load(db, user_id)
+        with self._lock:
+            index = self._indexes.setdefault(user_id, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def add(self, message: models.Message) -> None:
+        """Index a newly written message if its user's index is loaded"""
+        with self._lock:
+            index = self._indexes.get(message.user_id)
+            if index is not None:
+                index.add(message.id, message.content)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def search(self, db: Session, user_id: int, query: str) -> List[Tuple[int, float]]:
+        index = self._get(db, user_id)
+        with self._lock:
+            return index.search(query)
+
+
+message_search_index = MessageSearchIndex()
@@ -0,0 +1,125 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.config.config import settings
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Batch:
+    contents: List[str] = field(default_factory=list)
+    future: Optional[asyncio.Future] = None
+    closed: bool = False
+
+
+@dataclass
+class _UserTurns:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    open_batch: Optional[_Batch] = None
+    # Requests holding or waiting for this state; it is dropped when this reaches zero
+    users: int = 0
+
+
+class TurnSequencer:
+    """
+    Orders chat turns per user and coalesces rapid-fire messages.
+
+    A message from an idle user runs at once. A message arriving while the user has a
+    turn in progress (or another batch waiting) opens a batch and waits at least
+    `debounce_seconds`; messages from the same user that arrive before that batch
+    starts running join it, up to `max_batch`. The batch then runs as a single turn
+    under the user's lock, and every request in it receives that turn's result. Turns
+    for one user therefore never interleave.
+
+    State lives in this process's event loop, like the conversation cache: with several
+    workers, sticky routing per user is needed for cross-request coalescing.
+    """
+
+    def __init__(
+        self,
+        debounce_seconds: float = settings.TURN_DEBOUNCE_SECONDS,
+        max_batch: int = settings.TURN_MAX_BATCH
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.max_batch = max_batch
+        self._users: Dict[int, _UserTurns] = {}
+
+    def _acquire_state(self, user_id: int) -> _UserTurns:
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserTurns()
+        state.users += 1
+        return state
+
+    def _release_state(self, user_id: int, state: _UserTurns) -> None:
+        state.users -= 1
+        if state.users == 0 and self._users.get(user_id) is state:
+            del self._users[user_id]
+
+    @asynccontextmanager
+    async def exclusive(self, user_id: int) -> AsyncIterator[None]:
+        """Run a turn for `user_id` with no other turn for that user in progress"""
+        state = self._acquire_state(user_id)
+        try:
+            async with state.lock:
+                yield
+        finally:
+            self._release_state(user_id, state)
+
+    async def submit(
+        self,
+        user_id: int,
+        content: str,
+        run_turn: Callable[[List[str]], Awaitable[T]]
+    ) -> T:
+        """
+        Queue `content` for the user's next turn. `run_turn` receives the batch's
+        messages in arrival order; only the request that opened the batch calls it.
+        """
+        state = self._acquire_state(user_id)
+        try:
+            batch = state.open_batch
+            if batch is not None and not batch.closed and len(batch.contents) < self.max_batch:
+                batch.contents.append(content)
+                return await asyncio.shield(batch.future)
+
+            # Only a user who is already mid-burst waits; a lone message is answered at once
+            busy = state.lock.locked() or state.open_batch is not None
+            batch = _Batch(contents=[content], future=asyncio.get_running_loop().create_future())
+            state.open_batch = batch
+            try:
+                if busy and self.debounce_seconds > 0:
+                    await asyncio.sleep(self.debounce_seconds)
+                async with state.lock:
+                    batch.closed = True
+                    if state.open_batch is batch:
+                        state.open_batch = None
+                    result = await run_turn(list(batch.contents))
+            except BaseException as e:
+                batch.closed = True
+                if state.open_batch is batch:
+                    state.open_batch = None
+                if not batch.future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        batch.future.cancel()
+                    else:
+                        batch.future.set_exception(e)
+                        # Waiters re-raise it; don't also report it as never retrieved
+                        batch.future.exception()
+                raise
+            batch.future.set_result(result)
+            return result
+        finally:
+            self._release_state(user_id, state)
+
+    def pending(self) -> int:
+        """Users with a turn waiting or in progress"""
+        return len(self._users)
+
+
+turn_sequencer = TurnSequencer()
+
+__all__ = ['TurnSequencer', 'turn_sequencer']
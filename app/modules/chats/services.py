@@ -1,31 +1,77 @@
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple, Union
+from datetime import date, datetime
+import asyncio
+import json
 import re
 
 from . import schemas, repository
+from .deletion import DELETE_HISTORY_JOB, delete_history_in_chunks
+from .memory import EMBED_MESSAGES_JOB, format_memories, memory_store
+from .sequencer import turn_sequencer
+from app.config.config import settings
 from app.infrastructure.ai_service import ai as ai_service, OnboardingStep
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.model_router import ChatCompletionResult
+from app.infrastructure.jobs import job_runner
+from app.infrastructure.level_classifier import level_classifier
+from app.infrastructure.tracing import traced
 from app.modules.users.models import User
+from app.shared.http_cache import make_etag
+
+# Background jobs enqueued after every persisted turn
+POST_TURN_JOBS: List[str] = []
+
+def register_post_turn_job(name: str) -> None:
+    """Run the job `name` (registered on job_runner) after each chat turn"""
+    if name not in POST_TURN_JOBS:
+        POST_TURN_JOBS.append(name)
+
+if settings.MEMORY_ENABLED:
+    register_post_turn_job(EMBED_MESSAGES_JOB)
+
+def _recall(user_id: int, query: str, exclude_ids: List[int]):
+    # Own session: the thread may outlive the turn that started it
+    db = SessionLocal()
+    try:
+        return memory_store.recall(db, user_id, query, exclude=exclude_ids)
+    finally:
+        db.close()
 
 class ChatService:
     def __init__(self, chat_repo: repository.ChatRepository):
         self.chat_repo = chat_repo
+
+    def _enqueue_post_turn_jobs(
+        self,
+        user_id: int,
+        user_message_id: Optional[int],
+        ai_message_id: int,
+        user_message_ids: Optional[List[int]] = None
+    ) -> None:
+        """Hand post-turn work to the background runner so it stays off the request path"""
+        payload = {
+            "user_id": user_id,
+            "user_message_id": user_message_id,
+            "user_message_ids": user_message_ids or ([user_message_id] if user_message_id else []),
+            "ai_message_id": ai_message_id
+        }
+        for job_name in POST_TURN_JOBS:
+            try:
+                job_runner.enqueue(job_name, payload, db=self.chat_repo.db)
+            except Exception as e:
+                print(f"Failed to enqueue post-turn job {job_name}: {e}")
         
     async def _extract_english_level(self, text: str) -> Optional[str]:
-        """Extract English level from user's message"""
-        text = text.lower()
-        if 'beginner' in text:
-            return 'beginner'
-        elif 'intermediate' in text:
-            return 'intermediate'
-        elif 'advanced' in text:
-            return 'advanced'
-        return None
+        """English level the user states, or one estimated locally from how they write"""
+        return level_classifier.estimate(text).level
 
+    @traced()
     async def _handle_onboarding_flow(
         self,
         current_user: User,
         user_message: str,
-        previous_messages: List[Any]
+        previous_messages: List[Any],
+        user_message_id: Optional[int] = None
     ) -> schemas.ChatResponse:
         """Handle the onboarding conversation flow for new users"""
         conversation_history = []
@@ -49,7 +95,9 @@ class ChatService:
             'content': user_message
         })
         
-        onboarding_response = ai_service.generate_onboarding_response(
+        # The OpenAI client is synchronous: keep the call off the event loop
+        onboarding_response = await asyncio.to_thread(
+            ai_service.generate_onboarding_response,
             user_name=current_user.full_name or current_user.username,
             conversation_history=conversation_history,
             user_goal=current_user.learning_goal,
@@ -84,8 +132,9 @@ class ChatService:
         )
         
         self.chat_repo.db.commit()
+        self._enqueue_post_turn_jobs(current_user.id, user_message_id, db_ai_message.id)
         
-        updated_history = self.chat_repo.get_chat_history(current_user.id, limit=20)
+        updated_history = reversed(self.chat_repo.get_recent_messages(current_user.id, limit=20))
         
         history_responses = [
             schemas.MessageResponse(
@@ -110,44 +159,71 @@ class ChatService:
             is_onboarded=current_user.is_onboarded
         )
 
+    @traced()
     async def send_message(
         self, 
         message_content: str, 
         current_user: User
     ) -> schemas.ChatResponse:
-        user_message = schemas.MessageCreate(
-            content=message_content,
-            role=schemas.MessageRole.USER
+        """
+        Send a message through the user's turn sequencer: messages sent in quick
+        succession are answered together by one turn, and every request gets its reply.
+        """
+        return await turn_sequencer.submit(
+            current_user.id,
+            message_content,
+            lambda contents: self._run_turn(contents, current_user)
         )
-        db_user_message = self.chat_repo.create_message(user_message, current_user.id)
+
+    def _save_user_messages(self, contents: List[str], user_id: int) -> List[int]:
+        """Persist a turn's user messages in arrival order"""
+        return [
+            self.chat_repo.create_message(
+                schemas.MessageCreate(content=content, role=schemas.MessageRole.USER),
+                user_id
+            ).id
+            for content in contents
+        ]
+
+    async def _run_turn(self, contents: List[str], current_user: User) -> schemas.ChatResponse:
+        """One turn answering `contents` (one or more messages) with a single reply"""
+        user_message_ids = self._save_user_messages(contents, current_user.id)
+        message_content = "\n".join(contents)
         
         if not current_user.is_onboarded:
-            db_messages = self.chat_repo.get_chat_history(current_user.id, limit=10)
-            sorted_messages = sorted(db_messages, key=lambda x: getattr(x, 'created_at', datetime.min))
-            return await self._handle_onboarding_flow(current_user, message_content, sorted_messages)
+            recent_messages = self.chat_repo.get_recent_messages(current_user.id, limit=10)
+            return await self._handle_onboarding_flow(
+                current_user,
+                message_content,
+                recent_messages,
+                user_message_id=user_message_ids[-1]
+            )
         
         try:
-            messages = self.chat_repo.get_chat_history(current_user.id, limit=1)
-            
-            conversation_history = [
-                {
-                    "role": "ai" if msg.role == schemas.MessageRole.AI else "user",
-                    "content": msg.content
-                }
-                for msg in messages
-            ]
+            conversation_history, context_ids = self._conversation_context(current_user.id, len(contents))
             
-            ai_response = ai_service.generate_chat_response(
+            memories = await self._recall_memories(current_user.id, message_content, context_ids)
+            # The router calls the synchronous client (with retries and fallbacks): run it in
+            # a thread so the loop keeps accepting messages, which join the user's next turn
+            completion = await asyncio.to_thread(
+                ai_service.complete_chat,
                 conversation_history=conversation_history,
                 user_name=current_user.full_name or current_user.username,
-                user_level=current_user.english_level
+                user_level=current_user.english_level,
+                user_id=current_user.id,
+                memories=memories
             )
             
             ai_message = schemas.MessageCreate(
-                content=ai_response,
+                content=completion.content,
                 role=schemas.MessageRole.AI
             )
-            db_ai_message = self.chat_repo.create_message(ai_message, current_user.id)
+            db_ai_message = self.chat_repo.create_message(
+                ai_message,
+                current_user.id,
+                usage=self._usage_record(completion, current_user)
+            )
+            self._enqueue_post_turn_jobs(current_user.id, user_message_ids[-1], db_ai_message.id, user_message_ids)
             
             return schemas.ChatResponse(
                 message=schemas.MessageResponse(
@@ -162,7 +238,134 @@ class ChatService:
             
         except Exception as e:
             raise Exception(f"Error processing chat message: {str(e)}")
+
+    @traced()
+    async def stream_message(
+        self,
+        message_content: Union[str, List[str]],
+        current_user: User
+    ) -> AsyncIterator[Union[str, schemas.ChatResponse]]:
+        """
+        Like send_message, but yields the AI reply token by token as it is generated and
+        finally the persisted ChatResponse. Several queued messages may be passed to be
+        answered in one turn. Onboarding replies are not streamed.
+        """
+        contents = [message_content] if isinstance(message_content, str) else list(message_content)
+        async with turn_sequencer.exclusive(current_user.id):
+            if not current_user.is_onboarded:
+                yield await self._run_turn(contents, current_user)
+                return
+
+            user_message_ids = self._save_user_messages(contents, current_user.id)
+
+            chunks = []
+            completions: List[ChatCompletionResult] = []
+            conversation_history, context_ids = self._conversation_context(current_user.id, len(contents))
+            async for token in ai_service.stream_chat_response(
+                conversation_history=conversation_history,
+                user_name=current_user.full_name or current_user.username,
+                user_level=current_user.english_level,
+                user_id=current_user.id,
+                on_complete=completions.append,
+                memories=await self._recall_memories(current_user.id, "\n".join(contents), context_ids)
+            ):
+                chunks.append(token)
+                yield token
+
+            ai_message = schemas.MessageCreate(
+                content="".join(chunks),
+                role=schemas.MessageRole.AI
+            )
+            db_ai_message = self.chat_repo.create_message(
+                ai_message,
+                current_user.id,
+                usage=self._usage_record(completions[0], current_user) if completions else None
+            )
+            self._enqueue_post_turn_jobs(current_user.id, user_message_ids[-1], db_ai_message.id, user_message_ids)
+
+        yield schemas.ChatResponse(
+            message=schemas.MessageResponse(
+                id=db_ai_message.id,
+                content=db_ai_message.content,
+                role=db_ai_message.role,
+                user_id=db_ai_message.user_id,
+                created_at=db_ai_message.created_at
+            ),
+            is_onboarding_complete=True
+        )
+
+    def _usage_record(
+        self,
+        completion: ChatCompletionResult,
+        current_user: User
+    ) -> schemas.MessageUsageCreate:
+        """Flatten a completion's provider usage and routing details for storage"""
+        usage = completion.usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        return schemas.MessageUsageCreate(
+            model=completion.model,
+            tier=completion.tier,
+            prompt_version=completion.prompt_version,
+            user_level=getattr(current_user.english_level, "value", current_user.english_level),
+            prompt_tokens=getattr(usage, "prompt_tokens", None) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", None) or 0,
+            cached_tokens=cached_tokens,
+            cache_hit=cached_tokens > 0,
+            retry_count=completion.retries,
+            latency_ms=completion.latency_ms
+        )
+
+    def _conversation_context(self, user_id: int, limit: int = 1) -> Tuple[List[Dict[str, str]], List[int]]:
+        """Recent messages in the role/content shape AIService expects, plus their ids"""
+        recent = self.chat_repo.get_recent_messages(user_id, limit=limit)
+        history = [
+            {
+                "role": "ai" if msg.role == schemas.MessageRole.AI else "user",
+                "content": msg.content
+            }
+            for msg in recent
+        ]
+        return history, [msg.id for msg in recent]
+
+    async def _recall_memories(self, user_id: int, message_content: str, exclude_ids: List[int]) -> List[str]:
+        """
+        A few older messages relevant to this one, within MEMORY_MAX_TOKENS. Runs in a
+        thread with its own session and is skipped past MEMORY_RECALL_BUDGET_SECONDS; an
+        abandoned recall still finishes in the background, warming the user's index.
+        Never fails the turn.
+        """
+        if not settings.MEMORY_ENABLED:
+            return []
+        try:
+            memories = await asyncio.wait_for(
+                asyncio.to_thread(_recall, user_id, message_content, exclude_ids),
+                timeout=settings.MEMORY_RECALL_BUDGET_SECONDS
+            )
+        except asyncio.TimeoutError:
+            print(f"Memory recall for user {user_id} exceeded its budget; answering without it")
+            return []
+        except Exception as e:
+            print(f"Memory recall failed for user {user_id}: {e}")
+            return []
+        return format_memories(memories)
     
+    def get_chat_history_etag(self, current_user: User, limit: int = 20) -> str:
+        """
+        Changes whenever the history window can. The latest id and count alone can repeat
+        (SQLite may hand out a deleted id again), so the stats' history version, bumped
+        in the same transaction as every write and deletion, is included.
+        """
+        stats = self.chat_repo.stats_repo.get_stats(current_user.id)
+        return make_etag(
+            current_user.id,
+            self.chat_repo.latest_message_id(current_user.id),
+            stats.message_count if stats else 0,
+            (stats.history_version or 0) if stats else 0,
+            limit
+        )
+
+    @traced()
     def get_chat_history(
         self, 
         current_user: User,
@@ -180,5 +383,94 @@ class ChatService:
             for msg in messages
         ]
     
-    def clear_chat_history(self, current_user: User) -> None:
-        self.chat_repo.delete_messages(current_user.id)
\ No newline at end of file
+    @traced()
+    def search_messages(
+        self,
+        current_user: User,
+        query: str,
+        skip: int = 0,
+        limit: int = 20
+    ) -> schemas.MessageSearchResponse:
+        matches = self.chat_repo.search_messages(current_user.id, query, skip=skip, limit=limit)
+        return schemas.MessageSearchResponse(
+            query=query,
+            skip=skip,
+            limit=limit,
+            results=[
+                schemas.MessageSearchResult(
+                    id=msg.id,
+                    content=msg.content,
+                    role=msg.role,
+                    user_id=msg.user_id,
+                    created_at=msg.created_at,
+                    rank=float(rank)
+                )
+                for msg, rank in matches
+            ]
+        )
+    
+    @traced()
+    def get_usage(
+        self,
+        start: date,
+        end: date,
+        user_id: Optional[int] = None,
+        by_user: bool = False,
+        group_by: schemas.UsageGroupBy = schemas.UsageGroupBy.NONE
+    ) -> List[schemas.UsageAggregate]:
+        if end < start:
+            raise ValueError("end must not be before start")
+        return self.chat_repo.get_usage_aggregates(
+            start,
+            end,
+            user_id=user_id,
+            by_day=not by_user,
+            by_user=by_user,
+            group_by=group_by
+        )
+    
+    @traced()
+    def clear_chat_history(self, current_user: User, background: Optional[bool] = None) -> Optional[int]:
+        """
+        Delete the user's history. Large histories (or `background=True`) are handed to
+        a chunked background job whose id is returned; otherwise this returns None once done.
+        """
+        latest_id = self.chat_repo.latest_message_id(current_user.id)
+        if latest_id is None:
+            return None
+
+        if background is None:
+            stats = self.chat_repo.stats_repo.get_stats(current_user.id)
+            background = stats is not None and stats.message_count > settings.BACKGROUND_DELETE_THRESHOLD
+        if not background:
+            self.chat_repo.delete_messages(current_user.id)
+            return None
+
+        if not settings.JOBS_ENABLED:
+            # No runner to hand off to: still delete in short transactions
+            delete_history_in_chunks(self.chat_repo, current_user.id, latest_id)
+            return None
+
+        total = self.chat_repo.count_messages(current_user.id, latest_id)
+        return job_runner.enqueue(
+            DELETE_HISTORY_JOB,
+            {"user_id": current_user.id, "up_to_id": latest_id, "total": total},
+            db=self.chat_repo.db
+        )
+
+    def get_deletion_status(self, current_user: User, job_id: int) -> Optional[schemas.DeletionStatus]:
+        """Progress of one of the user's background history deletions"""
+        job = job_runner.get_job(self.chat_repo.db, job_id)
+        if job is None or job.name != DELETE_HISTORY_JOB:
+            return None
+        payload = json.loads(job.payload or "{}")
+        if payload.get("user_id") != current_user.id:
+            return None
+        progress = json.loads(job.result) if job.result else {}
+        return schemas.DeletionStatus(
+            job_id=job.id,
+            status=job.status,
+            deleted=progress.get("deleted", 0),
+            total=payload.get("total", 0),
+            error=job.last_error
+        )
\ No newline at end of file
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.infrastructure.database import SessionLocal
+from app.shared.deps import authenticate_token
+from app.modules.users.models import User
+from . import schemas
+from .repository import ChatRepository
+from .services import ChatService
+
+
+class ChatSession:
+    """
+    One long-lived WebSocket conversation.
+
+    The client authenticates once (``?token=`` or a first ``{"type": "auth", "token": ...}``
+    frame). Each turn then runs on its own DB session, closed as soon as the reply is
+    persisted, so an idle connection never holds a connection or an open transaction.
+
+    Client frames:  ``{"type": "message", "content": "..."}``, ``{"type": "ping"}``
+    Server frames:  ``{"type": "token", "content": "..."}`` while the reply streams,
+                    ``{"type": "message", "data": ChatResponse}`` once it is persisted,
+                    ``{"type": "ping"}``/``{"type": "pong"}`` and ``{"type": "error", "detail": "..."}``
+
+    At most ``WS_MAX_PENDING_MESSAGES`` messages may wait behind the turn in progress;
+    further ones are rejected with an error frame. A client that stops reading for
+    ``WS_SEND_TIMEOUT_SECONDS`` or sends no message for ``WS_IDLE_TIMEOUT_SECONDS`` is
+    disconnected (pings and pongs do not keep a session alive).
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.pending: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_MAX_PENDING_MESSAGES)
+        self.last_activity = time.monotonic()
+        self.busy = False
+        self._send_lock = asyncio.Lock()
+
+    async def run(self) -> None:
+        await self.websocket.accept()
+        db = SessionLocal()
+        try:
+            user = await self._authenticate(db)
+            user_id = user.id if user is not None else None
+        finally:
+            db.close()
+        if user_id is None:
+            await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+            return
+
+        tasks = [
+            asyncio.create_task(self._receive()),
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._process(user_id)),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _authenticate(self, db: Session) -> Optional[User]:
+        token = self.websocket.query_params.get("token")
+        if not token:
+            try:
+                frame = await asyncio.wait_for(self.websocket.receive_json(), timeout=settings.WS_AUTH_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, WebSocketDisconnect, ValueError):
+                return None
+            if not isinstance(frame, dict) or frame.get("type") != "auth":
+                return None
+            token = frame.get("token")
+        user = authenticate_token(token, db) if token else None
+        if user is None or not user.is_active:
+            return None
+        return user
+
+    async def _send(self, payload: Dict[str, Any]) -> None:
+        # A client that does not drain its socket must not stall the session forever
+        async with self._send_lock:
+            await asyncio.wait_for(self.websocket.send_json(payload), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+
+    async def _receive(self) -> None:
+        while True:
+            try:
+                frame = await self.websocket.receive_json()
+            except WebSocketDisconnect:
+                return
+            except ValueError:
+                await self._send({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+
+            frame_type = frame.get("type") if isinstance(frame, dict) else None
+            if frame_type == "ping":
+                await self._send({"type": "pong"})
+            elif frame_type == "pong":
+                continue
+            elif frame_type == "message":
+                self.last_activity = time.monotonic()
+                content = frame.get("content")
+                if not isinstance(content, str) or not content.strip():
+                    await self._send({"type": "error", "detail": "Message content must be a non-empty string"})
+                    continue
+                try:
+                    self.pending.put_nowait(content)
+                except asyncio.QueueFull:
+                    await self._send({"type": "error", "detail": "Too many messages in flight; wait for the reply"})
+            else:
+                await self._send({"type": "error", "detail": f"Unknown frame type: {frame_type}"})
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_SECONDS)
+            idle = time.monotonic() - self.last_activity
+            if not self.busy and self.pending.empty() and idle > settings.WS_IDLE_TIMEOUT_SECONDS:
+                await self.websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="Idle timeout")
+                return
+            await self._send({"type": "ping"})
+
+    async def _process(self, user_id: int) -> None:
+        while True:
+            contents = [await self.pending.get()]
+            # Messages that queued up while the last reply streamed are answered together
+            while not self.pending.empty() and len(contents) < settings.TURN_MAX_BATCH:
+                contents.append(self.pending.get_nowait())
+            self.busy = True
+            # Keep loaded state across the turn's commits; the session ends with the turn
+            db = SessionLocal(expire_on_commit=False)
+            try:
+                # Reloaded per turn so profile changes and deactivation are seen
+                user = db.get(User, user_id)
+                if user is None or not user.is_active:
+                    await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Account is not active")
+                    return
+                chat_service = ChatService(ChatRepository(db))
+                async for item in chat_service.stream_message(contents, user):
+                    if isinstance(item, schemas.ChatResponse):
+                        await self._send({"type": "message", "data": item.model_dump(mode="json")})
+                    else:
+                        await self._send({"type": "token", "content": item})
+            except asyncio.TimeoutError:
+                # Slow consumer: end the session rather than buffer without bound
+                return
+            except Exception as e:
+                db.rollback()
+                await self._send({"type": "error", "detail": f"Error processing chat message: {e}"})
+            finally:
+                db.close()
+                self.busy = False
+                self.last_activity = time.monotonic()
@@ -1,6 +1,6 @@
-from .models import User, UserRole
-from .schemas import UserBase, UserCreate, UserLogin, UserResponse, Token
-from .repository import UserRepository
+from .models import User, UserRole, UserStats, RefreshToken
+from .schemas import UserBase, UserSignup, UserCreate, UserLogin, UserResponse, UserStatsResponse, Token, RefreshRequest
+from .repository import UserRepository, UserStatsRepository, RefreshTokenRepository
 from .services import UserService
 from app.shared.deps import (
     get_current_user,
@@ -12,12 +12,19 @@ from . import routes
 __all__ = [
     'User',
     'UserRole',
+    'UserStats',
+    'RefreshToken',
     'UserBase',
+    'UserSignup',
     'UserCreate',
     'UserLogin',
     'UserResponse',
+    'UserStatsResponse',
     'Token',
+    'RefreshRequest',
     'UserRepository',
+    'UserStatsRepository',
+    'RefreshTokenRepository',
     'UserService',
     'get_current_user',
     'get_current_active_user',
@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .services import get_password_hash
+
+ProgressCallback = Callable[[int, int], None]
+
+# Roles an import may assign; admins are never created from a file
+IMPORTABLE_ROLES = frozenset({schemas.UserRole.STUDENT, schemas.UserRole.TUTOR})
+
+# Columns written by the import; everything else comes from server defaults
+_COPY_COLUMNS = ("email", "username", "full_name", "hashed_password", "role", "is_onboarded", "is_active")
+
+
+class UnparsableRow:
+    """Stands in for an input line that could not be read, so it is reported as that row's error"""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Any]:
+    """Yield raw user dicts from a CSV (with header) or JSONL stream (UnparsableRow for bad lines)"""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {key.strip(): (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+    elif fmt == "jsonl":
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield UnparsableRow(f"Invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}' (expected csv or jsonl)")
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+class BulkUserImporter:
+    """
+    Imports many users at once: rows are validated, de-duplicated within the file and
+    against the database with one query, hashed across a process pool and inserted in
+    batches (COPY on PostgreSQL, multi-row INSERT elsewhere).
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = 1000,
+        workers: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        allowed_roles: Iterable[schemas.UserRole] = IMPORTABLE_ROLES
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+        self.allowed_roles = frozenset(allowed_roles)
+
+    def run(self, rows: Iterable[Dict[str, Any]]) -> schemas.BulkImportReport:
+        report = schemas.BulkImportReport()
+        valid = self._validate(rows, report)
+        valid = self._drop_existing(valid, report)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for start in range(0, len(valid), self.batch_size):
+                batch = valid[start:start + self.batch_size]
+                hashes = list(pool.map(
+                    get_password_hash,
+                    [user.password for _, user in batch],
+                    chunksize=max(1, len(batch) // (self.workers * 4))
+                ))
+                report.created += self._insert([
+                    (row_number, {
+                        **user.model_dump(exclude={"password"}),
+                        "hashed_password": hashed,
+                        "is_onboarded": False,
+                        "is_active": True
+                    })
+                    for (row_number, user), hashed in zip(batch, hashes)
+                ], report)
+                if self.progress:
+                    self.progress(start + len(batch), len(valid))
+
+        return report
+
+    def _validate(
+        self,
+        rows: Iterable[Any],
+        report: schemas.BulkImportReport
+    ) -> List[Tuple[int, schemas.UserCreate]]:
+        valid = []
+        seen_emails, seen_usernames = set(), set()
+        for row_number, row in enumerate(rows, start=1):
+            report.total += 1
+            if not isinstance(row, dict):
+                error = row.error if isinstance(row, UnparsableRow) else f"Expected an object, got {type(row).__name__}"
+                report.errors.append(schemas.BulkImportRowError(row=row_number, error=error))
+                continue
+            try:
+                user = schemas.UserCreate.model_validate({k: v for k, v in row.items() if v not in ("", None)})
+            except ValidationError as e:
+                errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                report.errors.append(schemas.BulkImportRowError(row=row_number, email=row.get("email"), error=errors))
+                continue
+            if user.role not in self.allowed_roles:
+                report.errors.append(schemas.BulkImportRowError(
+                    row=row_number, email=user.email, error=f"role: '{user.role.value}' cannot be assigned by an import"
+                ))
+                continue
+
+            email = user.email.lower()
+            if email in seen_emails or user.username in seen_usernames:
+                report.errors.append(schemas.BulkImportRowError(
+                    row=row_number, email=user.email, error="Duplicate email or username in import file"
+                ))
+                continue
+            seen_emails.add(email)
+            seen_usernames.add(user.username)
+            valid.append((row_number, user))
+        return valid
+
+    def _drop_existing(
+        self,
+        valid: List[Tuple[int, schemas.UserCreate]],
+        report: schemas.BulkImportReport
+    ) -> List[Tuple[int, schemas.UserCreate]]:
+        if not valid:
+            return valid
+        # Emails are compared case-insensitively (stored as given at signup)
+        existing = self.db.query(models.User.email, models.User.username).filter(
+            or_(
+                func.lower(models.User.email).in_([user.email.lower() for _, user in valid]),
+                models.User.username.in_([user.username for _, user in valid])
+            )
+        ).all()
+        existing_emails = {email.lower() for email, _ in existing}
+        existing_usernames = {username for _, username in existing}
+
+        remaining = []
+        for row_number, user in valid:
+            if user.email.lower() in existing_emails or user.username in existing_usernames:
+                report.skipped_existing += 1
+                report.errors.append(schemas.BulkImportRowError(
+                    row=row_number, email=user.email, error="Email or username already registered"
+                ))
+            else:
+                remaining.append((row_number, user))
+        return remaining
+
+    def _insert(self, rows: List[Tuple[int, Dict[str, Any]]], report: schemas.BulkImportReport) -> int:
+        """Insert a batch; if it fails, retry it row by row so only the bad rows are rejected"""
+        records = [record for _, record in rows]
+        try:
+            if self.db.get_bind().dialect.name == "postgresql":
+                self._copy(records)
+            else:
+                self.db.execute(insert(models.User), records)
+            self.db.commit()
+            return len(records)
+        except Exception:
+            self.db.rollback()
+
+        created = 0
+        for row_number, record in rows:
+            try:
+                self.db.execute(insert(models.User), [record])
+                self.db.commit()
+                created += 1
+            except Exception as e:
+                self.db.rollback()
+                report.errors.append(schemas.BulkImportRowError(
+                    # DBAPI error without SQLAlchemy's statement/parameters dump
+                    row=row_number, email=record["email"], error=f"Insert failed: {getattr(e, 'orig', e)}"
+                ))
+        return created
+
+    def _copy(self, records: List[Dict[str, Any]]) -> None:
+        """Stream a batch through COPY ... FROM STDIN on the session's own connection"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            # SQLAlchemy stores Enum columns by member name
+            record = {**record, "role": schemas.UserRole(record["role"]).name}
+            writer.writerow(["" if record[col] is None else record[col] for col in _COPY_COLUMNS])
+        buffer.seek(0)
+
+        raw_connection = self.db.connection().connection
+        with raw_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {models.User.__tablename__} ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
@@ -0,0 +1,172 @@
+"""
+Maintenance commands for the users module.
+
+    python -m app.modules.users.commands rebuild-stats [--user-id ID]
+    python -m app.modules.users.commands import-users PATH [--format csv|jsonl] [--batch-size N] [--workers N]
+    python -m app.modules.users.commands purge-refresh-tokens
+    python -m app.modules.users.commands score-levels [--user-id ID] [--messages N] [--apply] [--overwrite]
+"""
+import argparse
+import time
+from collections import Counter
+
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.init_db import init_db
+from app.infrastructure.level_classifier import level_classifier
+from . import repository
+from .bulk_import import BulkUserImporter, detect_format, read_rows
+from .schemas import EnglishLevel
+
+# Make sure every model (including chats.Message) is registered before queries run
+import app.modules.chats  # noqa: F401
+
+
+def rebuild_stats(user_id=None) -> None:
+    """Recompute user_stats rows from the messages table"""
+    db = SessionLocal()
+    try:
+        written = repository.UserStatsRepository(db).rebuild(user_id=user_id)
+        print(f"Rebuilt stats for {written} user(s)")
+    finally:
+        db.close()
+
+
+def import_users(path: str, fmt=None, batch_size: int = 1000, workers=None) -> None:
+    """Bulk-create users from a CSV or JSONL file"""
+    started = time.monotonic()
+
+    def progress(done: int, total: int) -> None:
+        print(f"  inserted {done}/{total} ({time.monotonic() - started:.1f}s)")
+
+    db = SessionLocal()
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            rows = read_rows(stream, fmt or detect_format(path))
+            report = BulkUserImporter(db, batch_size=batch_size, workers=workers, progress=progress).run(rows)
+    finally:
+        db.close()
+
+    print(
+        f"Imported {report.created}/{report.total} users in {time.monotonic() - started:.1f}s "
+        f"({report.skipped_existing} already registered, {len(report.errors)} rejected)"
+    )
+    for error in report.errors:
+        print(f"  row {error.row} ({error.email or '-'}): {error.error}")
+
+
+def purge_refresh_tokens() -> None:
+    """Delete expired refresh tokens"""
+    db = SessionLocal()
+    try:
+        deleted = repository.RefreshTokenRepository(db).purge_expired()
+        print(f"Deleted {deleted} expired refresh token(s)")
+    finally:
+        db.close()
+
+
+def score_levels(
+    user_id=None,
+    messages: int = 20,
+    batch_size: int = 500,
+    apply: bool = False,
+    overwrite: bool = False
+) -> None:
+    """
+    Estimate each user's English level from their recent messages, without the LLM.
+    Reports agreement with the recorded level; --apply fills in missing levels
+    (--overwrite replaces recorded ones too).
+    """
+    db = SessionLocal()
+    users_repo = repository.UserRepository(db)
+    predicted, agreed, compared, updated, skipped = Counter(), 0, 0, 0, 0
+    try:
+        after_id = 0
+        while True:
+            if user_id is not None:
+                user = users_repo.get_user(user_id)
+                users = [user] if user and user.id > after_id else []
+            else:
+                users = users_repo.get_users_after(after_id, batch_size)
+            if not users:
+                break
+            after_id = users[-1].id
+
+            samples = users_repo.get_writing_samples([u.id for u in users], messages)
+            scored = [u for u in users if u.id in samples]
+            skipped += len(users) - len(scored)
+            estimates = level_classifier.estimate_batch(["\n".join(samples[u.id]) for u in scored])
+            for user, estimate in zip(scored, estimates):
+                if estimate.level is None:
+                    skipped += 1
+                    continue
+                predicted[estimate.level] += 1
+                recorded = getattr(user.english_level, "value", user.english_level)
+                if recorded:
+                    compared += 1
+                    agreed += recorded == estimate.level
+                if user_id is not None:
+                    print(
+                        f"User {user.id}: {estimate.level} (score {estimate.score:.2f}, "
+                        f"confidence {estimate.confidence:.2f}, recorded {recorded or '-'})"
+                    )
+                if apply and (overwrite or not recorded) and recorded != estimate.level:
+                    user.english_level = EnglishLevel(estimate.level)
+                    updated += 1
+            if apply:
+                db.commit()
+    finally:
+        db.close()
+
+    print(
+        f"Scored {sum(predicted.values())} user(s): "
+        + ", ".join(f"{level} {predicted[level]}" for level in ("beginner", "intermediate", "advanced"))
+        + f"; {skipped} without enough writing"
+    )
+    if compared:
+        print(f"Agrees with the recorded level for {agreed}/{compared} ({100 * agreed / compared:.0f}%)")
+    if apply:
+        print(f"Updated {updated} user(s)")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.modules.users.commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subcommands.add_parser("rebuild-stats", help="Backfill or rebuild per-user learning stats")
+    rebuild.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+
+    importer = subcommands.add_parser("import-users", help="Bulk-create users from a CSV or JSONL file")
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Defaults to the file extension")
+    importer.add_argument("--batch-size", type=int, default=1000)
+    importer.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: CPU count)")
+
+    subcommands.add_parser("purge-refresh-tokens", help="Delete expired refresh tokens")
+
+    scorer = subcommands.add_parser("score-levels", help="Estimate English levels from users' messages")
+    scorer.add_argument("--user-id", type=int, default=None, help="Only score this user (prints the estimate)")
+    scorer.add_argument("--messages", type=int, default=20, help="Recent messages per user to score")
+    scorer.add_argument("--batch-size", type=int, default=500)
+    scorer.add_argument("--apply", action="store_true", help="Save estimates for users without a level")
+    scorer.add_argument("--overwrite", action="store_true", help="With --apply, also replace recorded levels")
+
+    args = parser.parse_args(argv)
+    init_db()
+    if args.command == "rebuild-stats":
+        rebuild_stats(user_id=args.user_id)
+    elif args.command == "import-users":
+        import_users(args.path, fmt=args.format, batch_size=args.batch_size, workers=args.workers)
+    elif args.command == "purge-refresh-tokens":
+        purge_refresh_tokens()
+    elif args.command == "score-levels":
+        score_levels(
+            user_id=args.user_id,
+            messages=args.messages,
+            batch_size=args.batch_size,
+            apply=args.apply,
+            overwrite=args.overwrite
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, DateTime, Enum as SQLEnum, ForeignKey, Text
 from sqlalchemy.sql import func, expression
 from sqlalchemy.orm import relationship
 
@@ -21,7 +21,48 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
-    messages = relationship("Message", back_populates="user", cascade="all, delete-orphan")
+    # Messages are removed by the database (ON DELETE CASCADE), never loaded just to be deleted
+    messages = relationship("Message", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
-        return f"<User {self.username}>"
\ No newline at end of file
+        return f"<User {self.username}>"
+
+class UserStats(Base):
+    """Per-user learning stats, maintained incrementally as messages are written"""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    message_count = Column(Integer, default=0, nullable=False)
+    user_message_count = Column(Integer, default=0, nullable=False)
+    ai_message_count = Column(Integer, default=0, nullable=False)
+    user_message_chars = Column(BigInteger, default=0, nullable=False)
+    active_days = Column(Integer, default=0, nullable=False)
+    last_active_date = Column(Date, nullable=True)
+    first_activity_at = Column(DateTime(timezone=True), nullable=True)
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Bumped by every write to or deletion from the history; unlike message ids it never repeats
+    history_version = Column(BigInteger, default=0, nullable=True)
+
+    def __repr__(self):
+        return f"<UserStats {self.user_id} - {self.message_count} messages>"
+
+class RefreshToken(Base):
+    """
+    One issued refresh token, stored as an HMAC of the token so a database leak does
+    not leak usable tokens. Tokens rotated from the same login share a family_id; a
+    revoked token that is presented again revokes its whole family.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    family_id = Column(String(32), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    replaced_by_id = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<RefreshToken {self.id} - user {self.user_id} - family {self.family_id}>"
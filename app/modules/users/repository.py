@@ -1,8 +1,22 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timezone
+import hashlib
+import hmac
+import secrets
+from sqlalchemy import case, func, or_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
+from app.config.config import settings
 from . import models, schemas
 
+# Matches chats.schemas.MessageRole.USER (not imported to avoid a circular import)
+_USER_ROLE = "user"
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
 class UserRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -26,6 +40,11 @@ class UserRepository:
         self.db.refresh(db_user)
         return db_user
     
+    def save_user(self, db_user: models.User) -> models.User:
+        """Commit changes made to an already-loaded user without fetching it again"""
+        self.db.commit()
+        return db_user
+
     def update_user(self, user_id: int, user_update: dict) -> Optional[models.User]:
         db_user = self.get_user(user_id)
         if not db_user:
@@ -38,6 +57,43 @@ class UserRepository:
         self.db.refresh(db_user)
         return db_user
     
+    def get_users_after(self, after_id: int, limit: int) -> List[models.User]:
+        """Keyset page of users ordered by id, for batch jobs over the whole table"""
+        return (
+            self.db.query(models.User)
+            .filter(models.User.id > after_id)
+            .order_by(models.User.id)
+            .limit(limit)
+            .all()
+        )
+
+    def get_writing_samples(self, user_ids: List[int], per_user: int) -> Dict[int, List[str]]:
+        """Each user's latest `per_user` messages (user role only), newest first, in one query"""
+        # Imported here: the chats module depends on this one
+        from app.modules.chats.models import Message
+
+        ranked = (
+            self.db.query(
+                Message.user_id.label("user_id"),
+                Message.content.label("content"),
+                func.row_number().over(
+                    partition_by=Message.user_id,
+                    order_by=Message.id.desc()
+                ).label("rank")
+            )
+            .filter(Message.user_id.in_(user_ids), Message.role == _USER_ROLE)
+            .subquery()
+        )
+        samples: Dict[int, List[str]] = {}
+        rows = (
+            self.db.query(ranked.c.user_id, ranked.c.content)
+            .filter(ranked.c.rank <= per_user)
+            .order_by(ranked.c.user_id, ranked.c.rank)
+        )
+        for uid, content in rows:
+            samples.setdefault(uid, []).append(content)
+        return samples
+
     def delete_user(self, user_id: int) -> bool:
         db_user = self.get_user(user_id)
         if not db_user:
@@ -45,4 +101,221 @@ class UserRepository:
             
         self.db.delete(db_user)
         self.db.commit()
-        return True
\ No newline at end of file
+        return True
+
+
+class UserStatsRepository:
+    """
+    Keeps one `user_stats` row per user in step with the messages table so dashboard
+    reads are a primary-key lookup. Writers call these methods inside their own
+    transaction and commit themselves.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_stats(self, user_id: int) -> Optional[models.UserStats]:
+        return self.db.get(models.UserStats, user_id)
+
+    def record_message(self, user_id: int, role: str, length: int, at: Optional[datetime] = None) -> None:
+        """Account for one new message with a single atomic upsert (safe for a user's first messages racing)"""
+        at = at or datetime.now(timezone.utc)
+        today = at.date()
+        is_user = 1 if role == _USER_ROLE else 0
+        stats = models.UserStats
+        increments = dict(
+            message_count=stats.message_count + 1,
+            user_message_count=stats.user_message_count + is_user,
+            ai_message_count=stats.ai_message_count + (1 - is_user),
+            user_message_chars=stats.user_message_chars + (length if is_user else 0),
+            active_days=stats.active_days + case(
+                (or_(stats.last_active_date.is_(None), stats.last_active_date != today), 1),
+                else_=0
+            ),
+            last_active_date=today,
+            first_activity_at=func.coalesce(stats.first_activity_at, at),
+            last_activity_at=at,
+            updated_at=func.now(),
+            history_version=func.coalesce(stats.history_version, 0) + 1
+        )
+        first = dict(
+            user_id=user_id,
+            message_count=1,
+            user_message_count=is_user,
+            ai_message_count=1 - is_user,
+            user_message_chars=length if is_user else 0,
+            active_days=1,
+            last_active_date=today,
+            first_activity_at=at,
+            last_activity_at=at,
+            history_version=1
+        )
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect in _UPSERT_INSERTS:
+            self.db.execute(
+                _UPSERT_INSERTS[dialect](stats)
+                .values(**first)
+                .on_conflict_do_update(index_elements=[stats.user_id], set_=increments)
+            )
+            return
+
+        result = self.db.execute(
+            update(stats)
+            .where(stats.user_id == user_id)
+            .values(**increments)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            self.db.add(models.UserStats(**first))
+
+    def reset(self, user_id: int) -> None:
+        """Zero the stats after a user's whole history has been deleted"""
+        self.db.execute(
+            update(models.UserStats)
+            .where(models.UserStats.user_id == user_id)
+            .values(
+                message_count=0,
+                user_message_count=0,
+                ai_message_count=0,
+                user_message_chars=0,
+                active_days=0,
+                last_active_date=None,
+                first_activity_at=None,
+                last_activity_at=None,
+                history_version=func.coalesce(models.UserStats.history_version, 0) + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def touch(self, user_id: int) -> None:
+        """Record a change to the history that the counters don't reflect yet (a deleted chunk)"""
+        self.db.execute(
+            update(models.UserStats)
+            .where(models.UserStats.user_id == user_id)
+            .values(history_version=func.coalesce(models.UserStats.history_version, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def rebuild(self, user_id: Optional[int] = None) -> int:
+        """Recompute stats from the messages table for one user or everyone; returns rows written"""
+        # Imported here: the chats module depends on this one
+        from app.modules.chats.models import Message
+
+        is_user = case((Message.role == _USER_ROLE, 1), else_=0)
+        query = (
+            self.db.query(
+                Message.user_id,
+                func.count(Message.id),
+                func.sum(is_user),
+                func.sum(is_user * func.length(Message.content)),
+                func.count(func.distinct(func.date(Message.created_at))),
+                func.min(Message.created_at),
+                func.max(Message.created_at)
+            )
+            .group_by(Message.user_id)
+        )
+        user_query = self.db.query(models.User.id)
+        if user_id is not None:
+            query = query.filter(Message.user_id == user_id)
+            user_query = user_query.filter(models.User.id == user_id)
+
+        aggregates = {row[0]: row[1:] for row in query.all()}
+        written = 0
+        for (uid,) in user_query.all():
+            total, user_count, chars, days, first_at, last_at = aggregates.get(
+                uid, (0, 0, 0, 0, None, None)
+            )
+            stats = self.get_stats(uid) or models.UserStats(user_id=uid)
+            stats.message_count = total
+            stats.user_message_count = int(user_count or 0)
+            stats.ai_message_count = total - int(user_count or 0)
+            stats.user_message_chars = int(chars or 0)
+            stats.active_days = days
+            first_at, last_at = _as_datetime(first_at), _as_datetime(last_at)
+            stats.first_activity_at = first_at
+            stats.last_activity_at = last_at
+            stats.last_active_date = last_at.date() if last_at else None
+            stats.history_version = (stats.history_version or 0) + 1
+            self.db.add(stats)
+            written += 1
+        self.db.commit()
+        return written
+
+
+class RefreshTokenRepository:
+    """
+    Refresh token store. Tokens are random strings; only their HMAC-SHA256 under
+    SECRET_KEY is stored, so a lookup is one HMAC plus one unique-index probe.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hmac.new(settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, user_id: int, expires_at: datetime, family_id: Optional[str] = None) -> Tuple[str, models.RefreshToken]:
+        """Add a new token (a new family unless `family_id` is given); the caller commits"""
+        token = secrets.token_urlsafe(32)
+        db_token = models.RefreshToken(
+            user_id=user_id,
+            token_hash=self.hash_token(token),
+            family_id=family_id or secrets.token_hex(16),
+            expires_at=expires_at
+        )
+        self.db.add(db_token)
+        self.db.flush()
+        return token, db_token
+
+    def get_with_user(self, token: str) -> Optional[Tuple[models.RefreshToken, models.User]]:
+        return (
+            self.db.query(models.RefreshToken, models.User)
+            .join(models.User, models.User.id == models.RefreshToken.user_id)
+            .filter(models.RefreshToken.token_hash == self.hash_token(token))
+            .first()
+        )
+
+    def revoke(self, token_id: int, replaced_by_id: Optional[int] = None) -> bool:
+        """Revoke one token unless it already was; False means someone else got there first"""
+        result = self.db.execute(
+            update(models.RefreshToken)
+            .where(models.RefreshToken.id == token_id, models.RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc), replaced_by_id=replaced_by_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def revoke_family(self, family_id: str) -> int:
+        result = self.db.execute(
+            update(models.RefreshToken)
+            .where(models.RefreshToken.family_id == family_id, models.RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def revoke_user(self, user_id: int) -> int:
+        result = self.db.execute(
+            update(models.RefreshToken)
+            .where(models.RefreshToken.user_id == user_id, models.RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def purge_expired(self, before: Optional[datetime] = None) -> int:
+        """Delete tokens past their expiry; returns rows deleted"""
+        before = before or datetime.now(timezone.utc)
+        deleted = (
+            self.db.query(models.RefreshToken)
+            .filter(models.RefreshToken.expires_at < before)
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return deleted
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, str):  # SQLite returns MIN/MAX over DateTime columns as text
+        return datetime.fromisoformat(value)
+    return value
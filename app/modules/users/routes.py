@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.infrastructure.database import get_db
-from app.shared.deps import get_current_active_user
+from app.shared.deps import get_current_active_user, get_current_active_admin
+from app.shared.http_cache import etag_matches, make_etag, not_modified, set_etag
 from . import schemas, services, repository, models
+from .bulk_import import BulkUserImporter, detect_format, read_rows
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -15,7 +21,7 @@ def get_user_service(user_repo: repository.UserRepository = Depends(get_user_rep
 
 @router.post("/signup", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
-    user: schemas.UserCreate,
+    user: schemas.UserSignup,
     user_service: services.UserService = Depends(get_user_service)
 ):
     """Create a new user account"""
@@ -45,9 +51,81 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_token(
+    data: schemas.RefreshRequest,
+    user_service: services.UserService = Depends(get_user_service)
+):
+    """Exchange a refresh token for a new access token and refresh token"""
+    try:
+        return user_service.refresh(data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.post("/logout")
+async def logout(
+    data: schemas.RefreshRequest,
+    user_service: services.UserService = Depends(get_user_service)
+):
+    """Revoke the refresh token (and every token rotated from the same login)"""
+    user_service.logout(data.refresh_token)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=schemas.UserResponse)
 async def read_users_me(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Get current user details"""
-    return current_user
\ No newline at end of file
+    """Get current user details (304 when If-None-Match matches the current ETag)"""
+    # Hash the serialized body itself: not every profile write bumps updated_at, and it
+    # has one-second resolution on some backends
+    body = schemas.UserResponse.model_validate(current_user)
+    etag = make_etag(body.model_dump_json())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return body
+
+@router.delete("/me", status_code=status.HTTP_202_ACCEPTED)
+async def delete_users_me(
+    current_user: models.User = Depends(get_current_active_user),
+    user_service: services.UserService = Depends(get_user_service)
+):
+    """
+    Delete the current user's account and chat history. The account is deactivated
+    immediately; its data is removed in the background.
+    """
+    job_id = user_service.delete_account(current_user)
+    return {"message": "Account deletion started", "job_id": job_id}
+
+@router.get("/me/stats", response_model=schemas.UserStatsResponse)
+async def read_users_me_stats(
+    current_user: models.User = Depends(get_current_active_user),
+    user_service: services.UserService = Depends(get_user_service)
+):
+    """Get learning stats for the current user"""
+    return user_service.get_stats(current_user)
+
+@router.post("/import", response_model=schemas.BulkImportReport)
+async def import_users(
+    file: UploadFile = File(..., description="CSV (with header) or JSONL file of users"),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Defaults to the file extension"),
+    db: Session = Depends(get_db),
+    admin: models.User = Depends(get_current_active_admin)
+):
+    """Bulk-create users from a CSV or JSONL upload (admin only)"""
+    fmt = format or detect_format(file.filename or "")
+    content = (await file.read()).decode("utf-8-sig")
+    try:
+        rows = list(read_rows(io.StringIO(content), fmt))
+    except (ValueError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not parse import file: {e}"
+        )
+    return await run_in_threadpool(BulkUserImporter(db).run, rows)
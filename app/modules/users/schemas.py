@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -16,6 +16,11 @@ class EnglishLevel(str, Enum):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = Field(None, description="Access token lifetime in seconds")
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1)
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -26,12 +31,12 @@ class UserBase(BaseModel):
     learning_goal: Optional[str] = None
     is_onboarded: bool = False
 
-class UserCreate(BaseModel):
+class UserSignup(BaseModel):
+    """Self-registration; the role is not the caller's to choose (always student)"""
     email: EmailStr
     username: str = Field(..., min_length=3, max_length=50)
     full_name: Optional[str] = None
     password: str = Field(..., min_length=6)
-    role: UserRole = UserRole.STUDENT
     
     @field_validator('password')
     def password_strength(cls, v):
@@ -39,6 +44,10 @@ class UserCreate(BaseModel):
             raise ValueError('Password must be at least 6 characters')
         return v
 
+class UserCreate(UserSignup):
+    """A user created by an admin (bulk import), who may assign a role"""
+    role: UserRole = UserRole.STUDENT
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -54,4 +63,27 @@ class UserResponse(UserBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UserStatsResponse(BaseModel):
+    message_count: int = 0
+    user_message_count: int = 0
+    ai_message_count: int = 0
+    average_message_length: float = Field(0.0, description="Average length of the user's own messages, in characters")
+    active_days: int = 0
+    first_activity_at: Optional[datetime] = None
+    last_activity_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BulkImportRowError(BaseModel):
+    row: int = Field(..., description="1-based row number in the import file")
+    email: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    total: int = 0
+    created: int = 0
+    skipped_existing: int = 0
+    errors: List[BulkImportRowError] = Field(default_factory=list)
@@ -1,5 +1,5 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 import jwt
 from passlib.context import CryptContext
 
@@ -26,19 +26,45 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     )
     return encoded_jwt
 
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
 class UserService:
     def __init__(self, user_repo: repository.UserRepository):
         self.user_repo = user_repo
+        self.stats_repo = repository.UserStatsRepository(user_repo.db)
+        self.token_repo = repository.RefreshTokenRepository(user_repo.db)
+
+    def _issue_tokens(self, user: models.User, family_id: Optional[str] = None) -> Tuple[schemas.Token, models.RefreshToken]:
+        """Access token plus a refresh token (continuing `family_id` when rotating); the caller commits"""
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = create_access_token(
+            data={"sub": user.email}, expires_delta=access_token_expires
+        )
+        refresh_token, db_token = self.token_repo.issue(
+            user.id,
+            datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+            family_id=family_id
+        )
+        token = schemas.Token(
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_in=int(access_token_expires.total_seconds())
+        )
+        return token, db_token
 
-    def create_user(self, user: schemas.UserCreate) -> schemas.UserResponse:
+    def create_user(self, user: schemas.UserSignup) -> schemas.UserResponse:
         db_user = self.user_repo.get_user_by_email(user.email)
         if db_user:
             raise ValueError("Email already registered")
         
         hashed_password = get_password_hash(user.password)
-        user_data = user.model_dump(exclude={"password"})
+        user_data = user.model_dump(exclude={"password", "role"})
         return self.user_repo.create_user({
             **user_data,
+            # Never taken from the request: signup must not grant privileges
+            "role": schemas.UserRole.STUDENT,
             "hashed_password": hashed_password,
             "is_onboarded": False,
             "is_active": True
@@ -52,11 +78,49 @@ class UserService:
         if not user.is_active:
             raise ValueError("Inactive user")
         
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
-        )
-        return schemas.Token(access_token=access_token)
+        token, _ = self._issue_tokens(user)
+        self.user_repo.db.commit()
+        return token
+
+    def refresh(self, refresh_token: str) -> schemas.Token:
+        """
+        Exchange a refresh token for a new access/refresh pair (no password check, so
+        no bcrypt). The presented token is revoked; presenting a revoked token again
+        means it leaked, so its whole family is revoked.
+        """
+        db = self.user_repo.db
+        found = self.token_repo.get_with_user(refresh_token)
+        if found is None:
+            raise ValueError("Invalid refresh token")
+        db_token, user = found
+
+        if db_token.revoked_at is not None:
+            self.token_repo.revoke_family(db_token.family_id)
+            db.commit()
+            print(f"Refresh token reuse detected for user {user.id}; revoked family {db_token.family_id}")
+            raise ValueError("Refresh token has been revoked")
+        if _as_utc(db_token.expires_at) <= datetime.now(timezone.utc):
+            raise ValueError("Refresh token expired")
+        if not user.is_active:
+            raise ValueError("Inactive user")
+
+        token, new_token = self._issue_tokens(user, family_id=db_token.family_id)
+        if not self.token_repo.revoke(db_token.id, replaced_by_id=new_token.id):
+            # A concurrent refresh used the same token first: treat it as reuse
+            db.rollback()
+            self.token_repo.revoke_family(db_token.family_id)
+            db.commit()
+            raise ValueError("Refresh token has been revoked")
+        db.commit()
+        return token
+
+    def logout(self, refresh_token: str) -> None:
+        """Revoke the session (token family) the refresh token belongs to"""
+        found = self.token_repo.get_with_user(refresh_token)
+        if found is None:
+            return
+        self.token_repo.revoke_family(found[0].family_id)
+        self.user_repo.db.commit()
 
     def get_user_by_email(self, email: str) -> Optional[schemas.UserResponse]:
         user = self.user_repo.get_user_by_email(email)
@@ -70,6 +134,40 @@ class UserService:
             return None
         return schemas.UserResponse.model_validate(user.__dict__)
 
+    def get_stats(self, user: models.User) -> schemas.UserStatsResponse:
+        stats = self.stats_repo.get_stats(user.id)
+        if not stats:
+            return schemas.UserStatsResponse()
+        return schemas.UserStatsResponse(
+            message_count=stats.message_count,
+            user_message_count=stats.user_message_count,
+            ai_message_count=stats.ai_message_count,
+            average_message_length=(
+                stats.user_message_chars / stats.user_message_count
+                if stats.user_message_count else 0.0
+            ),
+            active_days=stats.active_days,
+            first_activity_at=stats.first_activity_at,
+            last_activity_at=stats.last_activity_at
+        )
+
+    def delete_account(self, user: models.User) -> Optional[int]:
+        """
+        Deactivate the user at once, then delete their history in chunks and the account
+        itself in a background job (inline when jobs are disabled). Returns the job id.
+        """
+        # Imported here: the chats module depends on this one
+        from app.infrastructure.jobs import job_runner
+        from app.modules.chats.deletion import DELETE_ACCOUNT_JOB, delete_account_job
+
+        user.is_active = False
+        self.token_repo.revoke_user(user.id)
+        self.user_repo.save_user(user)
+        if not settings.JOBS_ENABLED:
+            delete_account_job(self.user_repo.db, {"user_id": user.id})
+            return None
+        return job_runner.enqueue(DELETE_ACCOUNT_JOB, {"user_id": user.id}, db=self.user_repo.db)
+
     def complete_onboarding(
         self, 
         user: models.User, 
@@ -81,4 +179,4 @@ class UserService:
         user.is_onboarded = True
         
         # Update the user with the new onboarding data
-        return self.user_repo.update_user(user)
\ No newline at end of file
+        return self.user_repo.save_user(user)
\ No newline at end of file
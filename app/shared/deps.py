@@ -1,4 +1,4 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -8,7 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.infrastructure.database import get_db
 from app.config.config import settings
-from app.modules.users import models, repository
+from app.modules.users import models, repository, schemas
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/users/login")
@@ -51,20 +51,24 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    user = authenticate_token(token, db)
+    if user is None:
+        raise credentials_exception
+    
+    return user
+
+def authenticate_token(token: str, db: Session) -> Optional[models.User]:
+    """Resolve a JWT access token to its user, or None if it is invalid"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            return None
     except JWTError:
-        raise credentials_exception
+        return None
     
     user_repo = repository.UserRepository(db)
-    user = user_repo.get_user_by_email(email=email)
-    if user is None:
-        raise credentials_exception
-    
-    return user
+    return user_repo.get_user_by_email(email=email)
 
 async def get_current_active_user(
     current_user: Annotated[models.User, Depends(get_current_user)]
@@ -73,3 +77,14 @@ async def get_current_active_user(
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_current_active_admin(
+    current_user: Annotated[models.User, Depends(get_current_active_user)]
+) -> models.User:
+    """Get the current user, requiring the admin role"""
+    if current_user.role != schemas.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges"
+        )
+    return current_user
@@ -0,0 +1,79 @@
+"""Offline stand-in for the OpenAI client used by AIService."""
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+REPLY = "Great job! A small correction: \"I have been to London\" sounds more natural. Where else have you travelled?"
+
+
+def _usage(messages: List[Dict[str, str]]) -> SimpleNamespace:
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=len(REPLY) // 4,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+    )
+
+
+class _Completions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any):
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=REPLY))],
+            usage=_usage(messages)
+        )
+
+
+class _AsyncStream:
+    def __init__(self, model: str, messages: List[Dict[str, str]], latency: float):
+        self.model = model
+        self.usage = _usage(messages)
+        self.latency = latency
+        self.words = REPLY.split(" ")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.words:
+            if self.latency:
+                await asyncio.sleep(self.latency / 10)
+            word = self.words.pop(0)
+            delta = SimpleNamespace(content=word + (" " if self.words else ""))
+            return SimpleNamespace(model=self.model, usage=None, choices=[SimpleNamespace(delta=delta)])
+        if self.usage is not None:
+            usage, self.usage = self.usage, None
+            return SimpleNamespace(model=self.model, usage=usage, choices=[])
+        raise StopAsyncIteration
+
+
+class _AsyncCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any):
+        return _AsyncStream(model, messages, self.latency)
+
+
+class FakeOpenAI:
+    """Mimics the parts of OpenAI/AsyncOpenAI that AIService touches"""
+
+    def __init__(self, latency_ms: float = 0.0, asynchronous: bool = False):
+        latency = latency_ms / 1000
+        completions = _AsyncCompletions(latency) if asynchronous else _Completions(latency)
+        self.chat = SimpleNamespace(completions=completions)
+
+    def with_options(self, **kwargs: Any) -> "FakeOpenAI":
+        return self
+
+
+def install(ai_service, latency_ms: float = 0.0) -> None:
+    """Point an AIService instance at the fake clients"""
+    ai_service.client = FakeOpenAI(latency_ms)
+    ai_service.async_client = FakeOpenAI(latency_ms, asynchronous=True)
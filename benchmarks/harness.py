@@ -0,0 +1,128 @@
+"""Minimal timing harness: run callables repeatedly and summarise per-call latency."""
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[], Any]
+    # Cap iterations for expensive cases (bcrypt, full turns)
+    max_iterations: Optional[int] = None
+    setup: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    mean_us: float
+    median_us: float
+    p95_us: float
+    min_us: float
+    ops_per_sec: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "iterations": self.iterations,
+            "mean_us": round(self.mean_us, 3),
+            "median_us": round(self.median_us, 3),
+            "p95_us": round(self.p95_us, 3),
+            "min_us": round(self.min_us, 3),
+            "ops_per_sec": round(self.ops_per_sec, 1),
+        }
+
+
+@dataclass
+class Runner:
+    min_time: float = 0.5
+    warmup: int = 3
+    results: List[Result] = field(default_factory=list)
+
+    def run(self, bench: Benchmark) -> Result:
+        if bench.setup:
+            bench.setup()
+        for _ in range(self.warmup):
+            bench.func()
+
+        samples: List[float] = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            deadline = time.perf_counter() + self.min_time
+            while True:
+                start = time.perf_counter()
+                bench.func()
+                samples.append(time.perf_counter() - start)
+                if bench.max_iterations and len(samples) >= bench.max_iterations:
+                    break
+                if time.perf_counter() >= deadline and len(samples) >= 5:
+                    break
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        samples.sort()
+        mean = statistics.fmean(samples)
+        result = Result(
+            name=bench.name,
+            iterations=len(samples),
+            mean_us=mean * 1e6,
+            median_us=statistics.median(samples) * 1e6,
+            p95_us=samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+            min_us=samples[0] * 1e6,
+            ops_per_sec=1 / mean if mean else float("inf"),
+        )
+        self.results.append(result)
+        return result
+
+
+def environment(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": revision,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        **(extra or {}),
+    }
+
+
+def write_report(path: str, results: List[Result], meta: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": {r.name: r.to_dict() for r in results}}, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: List[Result], baseline_path: str, threshold: float) -> List[str]:
+    """Names of benchmarks whose median got slower than the baseline by more than `threshold`"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>12} {'current':>12} {'change':>9}")
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            print(f"{result.name:<45} {'-':>12} {result.median_us:>10.1f}us {'new':>9}")
+            continue
+        change = result.median_us / previous["median_us"] - 1 if previous["median_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(result.name)
+            flag = "  REGRESSION"
+        print(f"{result.name:<45} {previous['median_us']:>10.1f}us {result.median_us:>10.1f}us {change:>+8.1%}{flag}")
+    return regressions
@@ -0,0 +1,290 @@
+"""
+Microbenchmarks for the request hot path, run fully offline against SQLite (or any
+DATABASE_URL you pass) and a fake LLM.
+
+    python -m benchmarks.run                                   # write benchmark-results.json
+    python -m benchmarks.run --output baseline.json            # record a baseline
+    python -m benchmarks.run --compare baseline.json           # flag regressions (exit code 1)
+    python -m benchmarks.run --filter repository --min-time 1
+
+To compare database backends side by side, see benchmarks/backends.py.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None,
+                        help="Database to benchmark against (default: a throwaway SQLite file)")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, metavar="BASELINE", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative median slowdown that counts as a regression (default: 0.15)")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend per benchmark")
+    parser.add_argument("--history", type=int, default=2000, help="Messages seeded for the benchmark user")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM latency")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel users in the workload.* benchmarks")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> str:
+    """Settings are read at import time, so this must run before importing the app"""
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='japi-bench-'), 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-offline")
+    os.environ["JOBS_ENABLED"] = "false"
+    os.environ["MODEL_ROUTING_LOG_PATH"] = ""
+    os.environ["MEMORY_EMBEDDER"] = "hashing"
+    # Off for the plain turn benchmarks; the *_debounced ones switch the shipped window on
+    os.environ["TURN_DEBOUNCE_SECONDS"] = "0"
+    return database_url
+
+
+def build_benchmarks(args: argparse.Namespace):
+    from jose import jwt
+
+    from app.config.config import Settings
+    from app.infrastructure.ai_service import ai
+    from app.infrastructure.database import SessionLocal
+    from app.infrastructure.init_db import init_db
+    from app.infrastructure.level_classifier import level_classifier
+    from app.modules.chats import schemas as chat_schemas
+    from app.modules.chats.cache import conversation_cache
+    from app.modules.chats.memory import VectorIndex, memory_store
+    from app.modules.chats.repository import ChatRepository
+    from app.modules.chats.sequencer import turn_sequencer
+    from app.modules.chats.services import ChatService
+    from app.modules.users.models import User
+    from app.modules.users.repository import UserRepository, UserStatsRepository
+    from app.modules.users.services import UserService
+    from app.shared import deps
+    from benchmarks import fake_llm
+    from benchmarks.harness import Benchmark
+
+    fake_llm.install(ai, latency_ms=args.llm_latency_ms)
+    init_db()
+
+    db = SessionLocal()
+    users = UserRepository(db)
+    password_hash = deps.get_password_hash("benchmark-password")
+
+    def make_user(email: str, onboarded: bool) -> User:
+        user = users.get_user_by_email(email)
+        if user is None:
+            user = users.create_user({
+                "email": email,
+                "username": email.split("@")[0],
+                "hashed_password": password_hash,
+                "is_onboarded": onboarded,
+                "english_level": "intermediate" if onboarded else None,
+                "learning_goal": "Speak confidently at work" if onboarded else None,
+            })
+        return user
+
+    user = make_user("bench@example.com", onboarded=True)
+    repo = ChatRepository(db)
+    if repo.stats_repo.get_stats(user.id) is None or repo.stats_repo.get_stats(user.id).message_count < args.history:
+        topics = ["past perfect", "phrasal verbs", "travel plans", "job interview", "articles", "conditionals"]
+        for i in range(args.history):
+            role = chat_schemas.MessageRole.USER if i % 2 == 0 else chat_schemas.MessageRole.AI
+            repo.create_message(
+                chat_schemas.MessageCreate(content=f"Message {i} about {topics[i % len(topics)]} and grammar practice.", role=role),
+                user.id
+            )
+
+    onboarding_history = [
+        {"role": "user", "content": "hello"},
+        {"role": "ai", "content": "Hi Sam! Welcome to Japi. What's your English learning goal?"},
+        {"role": "user", "content": "I want to improve my speaking for work"},
+        {"role": "ai", "content": "That's a great goal, Sam! What is your current English level? (Beginner/Intermediate/Advanced)"},
+        {"role": "user", "content": "intermediate I think"},
+    ]
+
+    token = deps.create_access_token({"sub": user.email}, expires_delta=timedelta(minutes=30))
+    latest = repo.get_chat_history(user.id, limit=1)[0]
+    chat_service = ChatService(repo)
+    turn_user = make_user("bench-turns@example.com", onboarded=True)
+    onboarding_user = make_user("bench-onboarding@example.com", onboarded=False)
+
+    messages = repo.get_user_messages(user.id, limit=args.history)
+    memory_store.embed_messages(db, messages)
+    memory_index = VectorIndex(memory_store.embedder.dimensions)
+    memory_index.add([m.id for m in messages], memory_store.embedder.embed([m.content for m in messages]))
+    memory_query = memory_store.embedder.embed(["Can you explain the past perfect again?"])
+
+    level_samples = ["\n".join(m.content for m in messages[i:i + 20]) for i in range(0, len(messages), 20)]
+
+    def response_model():
+        return chat_schemas.MessageResponse(
+            id=latest.id,
+            content=latest.content,
+            role=latest.role,
+            user_id=latest.user_id,
+            created_at=latest.created_at
+        )
+
+    def cold_recent_messages():
+        conversation_cache.invalidate(user.id)
+        repo.get_recent_messages(user.id, limit=10)
+
+    def full_turn():
+        asyncio.run(chat_service.send_message("Yesterday I have went to the cinema with my friends.", turn_user))
+
+    def debounced(func):
+        """Run `func` with the default TURN_DEBOUNCE_SECONDS window in effect"""
+        def run():
+            turn_sequencer.debounce_seconds = Settings.model_fields["TURN_DEBOUNCE_SECONDS"].default
+            try:
+                func()
+            finally:
+                turn_sequencer.debounce_seconds = 0
+        return run
+
+    def burst_turn():
+        # Three rapid-fire messages: the first is answered at once, the others together
+        async def burst():
+            await asyncio.gather(*(
+                chat_service.send_message(content, turn_user)
+                for content in ["Yesterday I have went to the cinema.", "With my friends.", "Is it correct?"]
+            ))
+        asyncio.run(burst())
+
+    def onboarding_turn():
+        onboarding_user.is_onboarded = False
+        onboarding_user.learning_goal = None
+        onboarding_user.english_level = None
+        repo.delete_messages(onboarding_user.id)
+        asyncio.run(chat_service.send_message("hello", onboarding_user))
+
+    # Chat workload: what one turn does to the database, for several users at once, each
+    # on its own session like concurrent requests
+    workload_users = [make_user(f"bench-workload-{i}@example.com", onboarded=True) for i in range(args.concurrency)]
+    workload_pool = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    def persist_turn(user_id: int) -> None:
+        session = SessionLocal()
+        try:
+            turn_repo = ChatRepository(session)
+            turn_repo.get_chat_history(user_id, limit=10)
+            turn_repo.create_message(
+                chat_schemas.MessageCreate(content="I goed to the park yesterday.", role=chat_schemas.MessageRole.USER),
+                user_id
+            )
+            turn_repo.create_message(
+                chat_schemas.MessageCreate(content="Nice! We say 'I went to the park'.", role=chat_schemas.MessageRole.AI),
+                user_id
+            )
+            turn_repo.stats_repo.get_stats(user_id)
+        finally:
+            session.close()
+
+    def concurrent_turns():
+        for future in [workload_pool.submit(persist_turn, u.id) for u in workload_users]:
+            future.result()
+
+    stats_repo = UserStatsRepository(db)
+    user_service = UserService(users)
+    refresh_state = {"token": user_service.login(user.email, "benchmark-password").refresh_token}
+
+    def refresh_tokens():
+        refresh_state["token"] = user_service.refresh(refresh_state["token"]).refresh_token
+
+    benchmarks = [
+        # Onboarding and prompts
+        Benchmark("ai.detect_onboarding_step", lambda: ai._detect_onboarding_step(onboarding_history)),
+        Benchmark("ai.generate_onboarding_response", lambda: ai.generate_onboarding_response("Sam", onboarding_history)),
+        Benchmark("ai.get_system_message", lambda: ai._get_system_message("intermediate", user_id=user.id)),
+        Benchmark("ai.complete_chat.fake_llm", lambda: ai.complete_chat(onboarding_history, "Sam", "intermediate", user.id)),
+
+        # Level classifier
+        Benchmark("level.estimate_answer", lambda: level_classifier.estimate(
+            "I can talk about daily things but I still make mistakes with grammar, especially when I speak fast."
+        )),
+        Benchmark("level.estimate_batch", lambda: level_classifier.estimate_batch(level_samples)),
+
+        # Auth
+        Benchmark("auth.jwt_encode", lambda: deps.create_access_token({"sub": user.email}, expires_delta=timedelta(minutes=30))),
+        Benchmark("auth.jwt_decode", lambda: jwt.decode(token, deps.SECRET_KEY, algorithms=[deps.ALGORITHM])),
+        Benchmark("auth.authenticate_token", lambda: deps.authenticate_token(token, db)),
+        Benchmark("auth.password_hash", lambda: deps.get_password_hash("benchmark-password"), max_iterations=10),
+        Benchmark("auth.password_verify", lambda: deps.verify_password("benchmark-password", password_hash), max_iterations=10),
+        Benchmark("auth.refresh_token_rotate", refresh_tokens),
+
+        # Schemas
+        Benchmark("schemas.message_response_construct", response_model),
+        Benchmark("schemas.message_response_serialize", lambda: response_model().model_dump_json()),
+        Benchmark("schemas.chat_response_serialize",
+                  lambda: chat_schemas.ChatResponse(message=response_model(), is_onboarding_complete=True).model_dump_json()),
+
+        # Repository
+        Benchmark("repository.create_message", lambda: repo.create_message(
+            chat_schemas.MessageCreate(content="Benchmark message", role=chat_schemas.MessageRole.USER), turn_user.id
+        )),
+        Benchmark("repository.get_chat_history_20", lambda: repo.get_chat_history(user.id, limit=20)),
+        Benchmark("repository.get_user_messages_100", lambda: repo.get_user_messages(user.id, limit=100)),
+        Benchmark("repository.get_recent_messages_cached", lambda: repo.get_recent_messages(user.id, limit=10)),
+        Benchmark("repository.get_recent_messages_cold", cold_recent_messages),
+        Benchmark("repository.search_messages", lambda: repo.search_messages(user.id, "past perfect", limit=20)),
+        Benchmark("repository.user_stats", lambda: stats_repo.get_stats(user.id)),
+        Benchmark("repository.get_user_by_email", lambda: users.get_user_by_email(user.email)),
+
+        # Semantic memory
+        Benchmark("memory.embed_query_hashing", lambda: memory_store.embedder.embed(["Can you explain the past perfect again?"])),
+        Benchmark("memory.vector_index_top3", lambda: memory_index.search(memory_query, 3)),
+        Benchmark("memory.recall", lambda: memory_store.recall(db, user.id, "Can you explain the past perfect again?")),
+
+        # Chat workload against the database
+        Benchmark("workload.persist_turn", lambda: persist_turn(turn_user.id)),
+        Benchmark(f"workload.concurrent_turns_{args.concurrency}", concurrent_turns, max_iterations=500),
+
+        # Whole turns through ChatService
+        Benchmark("service.send_message_turn", full_turn, max_iterations=200),
+        Benchmark("service.send_message_turn_debounced", debounced(full_turn), max_iterations=200),
+        Benchmark("service.burst_of_3_debounced", debounced(burst_turn), max_iterations=10),
+        Benchmark("service.onboarding_turn", onboarding_turn, max_iterations=200),
+    ]
+    if args.filter:
+        benchmarks = [b for b in benchmarks if args.filter in b.name]
+    return benchmarks, db
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_url = configure_environment(args)
+
+    from benchmarks.harness import Runner, compare, environment, write_report
+
+    benchmarks, db = build_benchmarks(args)
+    runner = Runner(min_time=args.min_time)
+    try:
+        for bench in benchmarks:
+            result = runner.run(bench)
+            print(f"{result.name:<45} median {result.median_us:>10.1f}us  p95 {result.p95_us:>10.1f}us  ({result.iterations} runs)")
+    finally:
+        db.close()
+
+    backend = database_url.split(":", 1)[0]
+    write_report(args.output, runner.results, environment({"database": backend, "llm_latency_ms": args.llm_latency_ms}))
+    print(f"\nWrote {len(runner.results)} results to {args.output}")
+
+    if args.compare:
+        regressions = compare(runner.results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Shared fixtures. Settings are read at import time, so the environment is set up here,
+before anything from the app is imported: a throwaway SQLite database, no background
+job workers and no network calls.
+"""
+import os
+import tempfile
+
+_tmpdir = tempfile.mkdtemp(prefix="japi-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ.setdefault("OPENAI_API_KEY", "test-offline")
+os.environ["JOBS_ENABLED"] = "false"
+os.environ["MODEL_ROUTING_LOG_PATH"] = ""
+os.environ["MEMORY_EMBEDDER"] = "hashing"
+os.environ["TURN_DEBOUNCE_SECONDS"] = "0"
+os.environ["TRACING_ENABLED"] = "false"
+
+import uuid
+
+import pytest
+
+from app.infrastructure.database import SessionLocal
+from app.infrastructure.init_db import init_db
+import app.modules.chats  # noqa: F401 - registers every model
+import app.modules.users  # noqa: F401
+
+init_db()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user with a unique email; password hashing is skipped"""
+    from app.modules.users.models import User
+
+    def factory(**fields) -> User:
+        suffix = uuid.uuid4().hex[:10]
+        user = User(
+            email=fields.pop("email", f"user-{suffix}@example.com"),
+            username=fields.pop("username", f"user-{suffix}"),
+            hashed_password=fields.pop("hashed_password", "not-a-real-hash"),
+            **fields
+        )
+        db.add(user)
+        db.commit()
+        return user
+
+    return factory
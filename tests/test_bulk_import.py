@@ -0,0 +1,53 @@
+import io
+import json
+import uuid
+
+from app.modules.users import models
+from app.modules.users.bulk_import import BulkUserImporter, read_rows
+
+
+def _row(**fields) -> dict:
+    suffix = uuid.uuid4().hex[:10]
+    return {"email": f"import-{suffix}@example.com", "username": f"import-{suffix}", "password": "secret123", **fields}
+
+
+def test_existing_email_is_matched_case_insensitively(db, make_user):
+    existing = make_user(email=f"Mixed-{uuid.uuid4().hex[:8]}@Example.com")
+    report = BulkUserImporter(db, workers=1).run([_row(email=existing.email.upper())])
+
+    assert report.created == 0
+    assert report.skipped_existing == 1
+
+
+def test_jsonl_lines_that_are_not_objects_are_row_errors(db):
+    good = _row()
+    stream = io.StringIO('[1, 2]\n"just a string"\n{not json\n' + json.dumps(good) + "\n")
+    report = BulkUserImporter(db, workers=1).run(read_rows(stream, "jsonl"))
+
+    assert report.total == 4
+    assert report.created == 1
+    assert [error.row for error in report.errors] == [1, 2, 3]
+    assert "Expected an object" in report.errors[0].error
+    assert "Invalid JSON" in report.errors[2].error
+
+
+def test_failed_batch_falls_back_to_row_by_row(db, make_user, monkeypatch):
+    # A user registered between the duplicate check and the insert fails the whole batch
+    taken = make_user()
+    monkeypatch.setattr(BulkUserImporter, "_drop_existing", lambda self, valid, report: valid)
+    rows = [_row(), _row(email=taken.email), _row()]
+    report = BulkUserImporter(db, workers=1).run(rows)
+
+    assert report.created == 2
+    assert [(error.row, error.email) for error in report.errors] == [(2, taken.email)]
+    assert report.errors[0].error.startswith("Insert failed")
+    emails = {row["email"] for row in rows[::2]}
+    assert db.query(models.User).filter(models.User.email.in_(emails)).count() == 2
+
+
+def test_admin_role_is_not_importable(db):
+    report = BulkUserImporter(db, workers=1).run([_row(role="admin"), _row(role="tutor")])
+
+    assert report.created == 1
+    assert [error.row for error in report.errors] == [1]
+    assert "cannot be assigned" in report.errors[0].error
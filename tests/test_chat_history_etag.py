@@ -0,0 +1,30 @@
+from app.modules.chats import schemas
+from app.modules.chats.repository import ChatRepository
+from app.modules.chats.services import ChatService
+
+
+def say(repo: ChatRepository, user_id: int, content: str) -> int:
+    return repo.create_message(schemas.MessageCreate(content=content, role=schemas.MessageRole.USER), user_id).id
+
+
+def test_etag_changes_when_a_deleted_id_is_handed_out_again(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    service = ChatService(repo)
+    first = say(repo, user.id, "hello")
+    before = service.get_chat_history_etag(user)
+
+    repo.delete_messages(user.id)
+    # SQLite reuses the highest rowid once it is deleted: same latest id, same count
+    assert say(repo, user.id, "a different hello") == first
+    assert service.get_chat_history_etag(user) != before
+
+
+def test_etag_changes_with_each_deleted_chunk(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    service = ChatService(repo)
+    ids = [say(repo, user.id, f"message {n}") for n in range(4)]
+    before = service.get_chat_history_etag(user)
+
+    repo.delete_messages_chunk(user.id, ids[-1], chunk_size=2)
+    db.expire_all()
+    assert service.get_chat_history_etag(user) != before
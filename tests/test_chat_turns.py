@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+
+from app.infrastructure.model_router import ChatCompletionResult
+from app.modules.chats import services
+from app.modules.chats.repository import ChatRepository
+from app.modules.chats.services import ChatService
+
+
+class BlockingLLM:
+    """Stands in for the synchronous OpenAI client: blocks its thread for `seconds`"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.in_call = threading.Event()
+        self.calls = []
+
+    def complete_chat(self, conversation_history, user_name, user_level=None, user_id=None, memories=None):
+        self.calls.append([msg["content"] for msg in conversation_history])
+        self.in_call.set()
+        time.sleep(self.seconds)
+        self.in_call.clear()
+        return ChatCompletionResult(content=f"reply {len(self.calls)}", tier="primary", model="fake", latency_ms=1.0, retries=0)
+
+
+def test_messages_sent_during_a_blocking_completion_are_accepted_and_coalesced(db, make_user, monkeypatch):
+    llm = BlockingLLM(seconds=0.3)
+    monkeypatch.setattr(services.ai_service, "complete_chat", llm.complete_chat)
+    # Nothing left pending for the job tests to claim
+    monkeypatch.setattr(services, "POST_TURN_JOBS", [])
+    user = make_user(is_onboarded=True)
+    service = ChatService(ChatRepository(db))
+
+    async def burst():
+        first = asyncio.create_task(service.send_message("I goed to school", user))
+        await asyncio.sleep(0.1)
+        # The loop is free while the first completion runs in its thread
+        accepted_mid_turn = llm.in_call.is_set()
+        rest = [asyncio.create_task(service.send_message(content, user)) for content in ["yesterday", "is it correct?"]]
+        return accepted_mid_turn, await asyncio.gather(first, *rest)
+
+    accepted_mid_turn, (first, second, third) = asyncio.run(burst())
+    assert accepted_mid_turn
+    assert first.message.content == "reply 1"
+    assert second.message.id == third.message.id
+    assert second.message.content == "reply 2"
+    assert llm.calls == [["I goed to school"], ["yesterday", "is it correct?"]]
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from app.modules.chats import repository, schemas
+from app.modules.chats.cache import CacheConsistencyError, CachedMessage, ConversationCache
+from app.modules.chats.repository import ChatRepository
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A fresh cache for ChatRepository, with every hit checked against the database"""
+    monkeypatch.setattr(repository.settings, "CONVERSATION_CACHE_ENABLED", True)
+    monkeypatch.setattr(repository.settings, "CONVERSATION_CACHE_VERIFY", True)
+
+    def install(**options) -> ConversationCache:
+        cache = ConversationCache(**{"window_size": 5, **options})
+        monkeypatch.setattr(repository, "conversation_cache", cache)
+        return cache
+
+    return install
+
+
+def say(repo: ChatRepository, user_id: int, content: str) -> int:
+    return repo.create_message(schemas.MessageCreate(content=content, role=schemas.MessageRole.USER), user_id).id
+
+
+def recent(repo: ChatRepository, user_id: int, limit: int = 5):
+    """get_recent_messages (verified on every hit) as (id, content) pairs"""
+    return [(m.id, m.content) for m in repo.get_recent_messages(user_id, limit)]
+
+
+def test_create_message_writes_through(db, make_user, cache):
+    cache = cache()
+    repo, user = ChatRepository(db), make_user()
+    first = say(repo, user.id, "hello")
+    assert recent(repo, user.id) == [(first, "hello")]
+
+    second = say(repo, user.id, "how are you?")
+    assert recent(repo, user.id) == [(first, "hello"), (second, "how are you?")]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_window_slides_past_its_size(db, make_user, cache):
+    cache(window_size=3)
+    repo, user = ChatRepository(db), make_user()
+    ids = [say(repo, user.id, "one")]
+    recent(repo, user.id, 3)
+    ids += [say(repo, user.id, text) for text in ["two", "three", "four"]]
+    assert [message_id for message_id, _ in recent(repo, user.id, 3)] == ids[-3:]
+    # Older messages are no longer all in the window: asking for more is a miss, not a short answer
+    assert [message_id for message_id, _ in recent(repo, user.id, 4)] == ids
+
+
+def test_delete_messages_invalidates(db, make_user, cache):
+    cache = cache()
+    repo, user = ChatRepository(db), make_user()
+    say(repo, user.id, "hello")
+    recent(repo, user.id)
+
+    repo.delete_messages(user.id)
+    assert cache.stats()["users"] == 0
+    assert recent(repo, user.id) == []
+    after = say(repo, user.id, "starting over")
+    assert recent(repo, user.id) == [(after, "starting over")]
+
+
+def test_chunked_deletion_invalidates(db, make_user, cache):
+    cache = cache()
+    repo, user = ChatRepository(db), make_user()
+    ids = [say(repo, user.id, f"message {n}") for n in range(4)]
+    recent(repo, user.id)
+
+    assert repo.delete_messages_chunk(user.id, ids[-1], chunk_size=2) == 2
+    assert cache.stats()["users"] == 0
+    assert recent(repo, user.id) == [(ids[2], "message 2"), (ids[3], "message 3")]
+
+
+def test_least_recently_used_window_is_evicted(db, make_user, cache):
+    one_window = CachedMessage(id=0, content="hi", role="user", user_id=0, created_at=None).size
+    cache = cache(max_bytes=2 * one_window)
+    repo = ChatRepository(db)
+    users = [make_user() for _ in range(3)]
+    for user in users:
+        say(repo, user.id, "hi")
+
+    recent(repo, users[0].id)
+    recent(repo, users[1].id)
+    recent(repo, users[0].id)
+    recent(repo, users[2].id)
+    assert cache.stats()["users"] == 2
+    assert cache.get(users[1].id, 1) is None
+    assert cache.get(users[0].id, 1) is not None and cache.get(users[2].id, 1) is not None
+
+
+def test_byte_cap_evicts_on_write_through(db, make_user, cache):
+    cache = cache(max_bytes=2000)
+    repo, small, big = ChatRepository(db), make_user(), make_user()
+    say(repo, small.id, "hi")
+    say(repo, big.id, "hi")
+    recent(repo, small.id)
+    recent(repo, big.id)
+
+    long_id = say(repo, big.id, "x" * 3000)
+    assert cache.stats()["users"] == 0
+    assert cache.stats()["bytes"] == 0
+    assert recent(repo, big.id)[-1] == (long_id, "x" * 3000)
+    assert len(recent(repo, small.id)) == 1
+
+
+def test_idle_window_expires(db, make_user, cache):
+    cache = cache(idle_ttl=0.05)
+    repo, user = ChatRepository(db), make_user()
+    first = say(repo, user.id, "hello")
+    recent(repo, user.id)
+    time.sleep(0.1)
+
+    assert cache.get(user.id, 1) is None
+    assert recent(repo, user.id) == [(first, "hello")]
+
+
+def test_fill_that_raced_a_write_is_discarded(db, make_user, cache):
+    cache = cache()
+    repo, user = ChatRepository(db), make_user()
+    say(repo, user.id, "hello")
+
+    # A miss reads the window, then a write lands before the window is installed
+    generation = cache.generation(user.id)
+    stale = repo._load_recent_messages(user.id, cache.window_size)
+    newer = say(repo, user.id, "are you there?")
+    cache.load(user.id, stale, generation)
+
+    assert cache.get(user.id, 1) is None
+    assert recent(repo, user.id)[-1] == (newer, "are you there?")
+
+
+def test_verify_mode_catches_a_stale_window(db, make_user, cache):
+    cache = cache()
+    repo, user = ChatRepository(db), make_user()
+    say(repo, user.id, "hello")
+    recent(repo, user.id)
+    # A write the cache never heard about
+    db.get(repository.models.Message, cache.get(user.id, 1)[0].id).content = "edited"
+    db.commit()
+
+    with pytest.raises(CacheConsistencyError):
+        recent(repo, user.id)
@@ -0,0 +1,121 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.infrastructure.jobs import Job, JobStatus, job_runner
+from app.main import app
+from app.modules.chats import models, schemas, services
+from app.modules.chats.cache import conversation_cache
+from app.modules.chats.deletion import DELETE_ACCOUNT_JOB, DELETE_HISTORY_JOB, delete_history_in_chunks
+from app.modules.chats.memory import memory_store
+from app.modules.chats.repository import ChatRepository
+from app.modules.chats.services import ChatService
+from app.modules.users.models import User, UserStats
+from app.shared.deps import create_access_token
+
+
+def say(repo: ChatRepository, user_id: int, content: str) -> int:
+    return repo.create_message(schemas.MessageCreate(content=content, role=schemas.MessageRole.USER), user_id).id
+
+
+def message_ids(db, user_id: int):
+    db.expire_all()
+    return [message_id for (message_id,) in db.query(models.Message.id).filter(models.Message.user_id == user_id)]
+
+
+def run_job(db, job_id: int) -> Job:
+    """Run one job on the shared runner as if one of its workers had claimed it"""
+    job = db.get(Job, job_id)
+    job.status, job.attempts, job.worker_id = JobStatus.RUNNING, job.attempts + 1, job_runner.worker_id
+    db.commit()
+    asyncio.run(job_runner._run(job_id))
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def test_progress_is_reported_per_chunk_and_newer_messages_are_kept(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    ids = [say(repo, user.id, f"message {n}") for n in range(5)]
+    newer = say(repo, user.id, "sent while deleting")
+    progress = []
+
+    deleted = delete_history_in_chunks(repo, user.id, up_to_id=ids[-1], chunk_size=2, progress=progress.append)
+    assert deleted == 5
+    assert [(p["deleted"], p["total"]) for p in progress] == [(2, 5), (4, 5), (5, 5)]
+    assert message_ids(db, user.id) == [newer]
+    assert db.get(UserStats, user.id).message_count == 1
+
+
+def test_deletion_clears_stats_cache_search_and_memory(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    for text in ["I love hiking", "hiking in the alps", "my hiking boots"]:
+        say(repo, user.id, text)
+    memory_store.embed_messages(db, db.query(models.Message).filter(models.Message.user_id == user.id).all())
+    # Load everything that is kept per user in memory
+    repo.get_recent_messages(user.id)
+    assert len(repo.search_messages(user.id, "hiking")) == 3
+    assert memory_store.recall(db, user.id, "hiking", min_score=-1.0)
+
+    delete_history_in_chunks(repo, user.id, chunk_size=2)
+
+    assert message_ids(db, user.id) == []
+    assert db.get(UserStats, user.id).message_count == 0
+    assert conversation_cache.get(user.id, 1) is None
+    assert repo.get_recent_messages(user.id) == []
+    assert repo.search_messages(user.id, "hiking") == []
+    assert db.query(models.MessageEmbedding).filter(models.MessageEmbedding.user_id == user.id).count() == 0
+    assert memory_store.recall(db, user.id, "hiking", min_score=-1.0) == []
+
+
+def test_history_above_the_threshold_is_deleted_by_a_job(db, make_user, monkeypatch):
+    monkeypatch.setattr(services.settings, "JOBS_ENABLED", True)
+    monkeypatch.setattr(services.settings, "BACKGROUND_DELETE_THRESHOLD", 3)
+    repo, user = ChatRepository(db), make_user()
+    for n in range(5):
+        say(repo, user.id, f"message {n}")
+    service = ChatService(repo)
+
+    job_id = service.clear_chat_history(user)
+    assert job_id is not None
+    assert db.get(Job, job_id).name == DELETE_HISTORY_JOB
+    assert len(message_ids(db, user.id)) == 5
+
+    assert run_job(db, job_id).status == JobStatus.SUCCEEDED
+    assert message_ids(db, user.id) == []
+    status = service.get_deletion_status(user, job_id)
+    assert (status.status, status.deleted, status.total) == (JobStatus.SUCCEEDED, 5, 5)
+
+
+def test_history_below_the_threshold_is_deleted_at_once(db, make_user, monkeypatch):
+    monkeypatch.setattr(services.settings, "JOBS_ENABLED", True)
+    monkeypatch.setattr(services.settings, "BACKGROUND_DELETE_THRESHOLD", 3)
+    repo, user = ChatRepository(db), make_user()
+    for n in range(3):
+        say(repo, user.id, f"message {n}")
+
+    assert ChatService(repo).clear_chat_history(user) is None
+    assert message_ids(db, user.id) == []
+
+
+def test_account_deletion_deactivates_at_once_and_the_job_removes_the_rows(db, make_user, monkeypatch):
+    monkeypatch.setattr(services.settings, "JOBS_ENABLED", True)
+    repo, user = ChatRepository(db), make_user()
+    user_id = user.id
+    for n in range(3):
+        say(repo, user_id, f"message {n}")
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+
+    response = client.delete("/users/me", headers=headers)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    db.expire_all()
+    assert db.get(User, user_id).is_active is False
+    assert client.get("/users/me", headers=headers).status_code == 400
+    assert len(message_ids(db, user_id)) == 3
+
+    job = run_job(db, job_id)
+    assert job.name == DELETE_ACCOUNT_JOB and job.status == JobStatus.SUCCEEDED
+    assert db.get(User, user_id) is None
+    assert message_ids(db, user_id) == []
+    assert db.get(UserStats, user_id) is None
@@ -0,0 +1,14 @@
+from app.infrastructure import embeddings
+from app.infrastructure.embeddings import HashingEmbedder, OpenAIEmbedder, build_embedder
+
+
+def test_openai_is_used_when_configured(monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "MEMORY_EMBEDDER", "openai")
+    monkeypatch.setattr(embeddings.settings, "OPENAI_API_KEY", "sk-test")
+    assert isinstance(build_embedder(), OpenAIEmbedder)
+
+
+def test_openai_falls_back_to_hashing_without_an_api_key(monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "MEMORY_EMBEDDER", "openai")
+    monkeypatch.setattr(embeddings.settings, "OPENAI_API_KEY", None)
+    assert isinstance(build_embedder(), HashingEmbedder)
@@ -0,0 +1,22 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.modules.users.schemas import UserRole
+from app.shared.deps import create_access_token
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def _headers(user) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+
+
+@pytest.mark.parametrize("path", ["/health/jobs", "/health/models"])
+def test_health_details_are_admin_only(client, make_user, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=_headers(make_user())).status_code == 403
+    assert client.get(path, headers=_headers(make_user(role=UserRole.ADMIN))).status_code == 200
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import timedelta
+
+from app.infrastructure.jobs import Job, JobRunner, JobStatus, _utcnow
+
+
+def make_runner(**kwargs) -> JobRunner:
+    runner = JobRunner(concurrency=1, lease_seconds=kwargs.pop("lease_seconds", 30), **kwargs)
+    runner.register("tests.noop")(lambda db, payload: {"ok": True})
+    return runner
+
+
+def test_running_job_with_live_lease_is_not_claimed(db):
+    owner, other = make_runner(), make_runner()
+    job_id = owner.enqueue("tests.noop", {})
+    assert owner._claim_next() == job_id
+
+    assert other._claim_next() is None
+    assert db.get(Job, job_id).worker_id == owner.worker_id
+
+
+def test_expired_lease_is_claimed_by_another_worker(db):
+    owner, other = make_runner(), make_runner()
+    job_id = owner.enqueue("tests.noop", {})
+    assert owner._claim_next() == job_id
+    db.get(Job, job_id).locked_until = _utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert other._claim_next() == job_id
+    db.expire_all()
+    job = db.get(Job, job_id)
+    assert job.worker_id == other.worker_id
+    assert job.attempts == 2
+    # The worker that lost its lease can no longer record an outcome
+    assert not owner._update_own(job_id, status=JobStatus.SUCCEEDED)
+
+
+def test_run_records_success_and_clears_lease(db):
+    runner = make_runner()
+    job_id = runner.enqueue("tests.noop", {})
+    assert runner._claim_next() == job_id
+    asyncio.run(runner._run(job_id))
+
+    db.expire_all()
+    job = db.get(Job, job_id)
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.worker_id is None and job.locked_until is None
+    assert job.result == '{"ok": true}'
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(db):
+    owner, other = make_runner(), make_runner()
+    job_id = owner.enqueue("tests.noop", {}, max_attempts=1)
+    assert owner._claim_next() == job_id
+    db.get(Job, job_id).locked_until = _utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert other._claim_next() is None
+    db.expire_all()
+    job = db.get(Job, job_id)
+    assert job.status == JobStatus.FAILED
+    assert job.attempts == 1
+    assert job.worker_id is None and job.finished_at is not None
+    assert "last attempt" in job.last_error
@@ -0,0 +1,43 @@
+import pytest
+
+from app.infrastructure.level_classifier import level_classifier
+
+
+@pytest.mark.parametrize("answer, level", [
+    ("intermediate", "intermediate"),
+    ("B2", "intermediate"),
+    ("I'm a beginner but I want to become fluent", "beginner"),
+    ("I want to be fluent, now I am a beginner", "beginner"),
+    ("Intermediate. I want to be advanced", "intermediate"),
+    ("I would like to reach C1, I am B1", "intermediate"),
+    ("I'm not a beginner, I'm intermediate", "intermediate"),
+    ("I have been learning for years and I am fairly fluent", "advanced"),
+    ("not bad", "intermediate"),
+    ("my english is ok", "intermediate"),
+    ("i am not very good", "beginner"),
+])
+def test_stated_levels(answer, level):
+    estimate = level_classifier.estimate(answer)
+    assert (estimate.level, estimate.source) == (level, "stated")
+
+
+@pytest.mark.parametrize("answer", [
+    "I am not fluent at all",
+    "I don't think I'm advanced",
+    "my level is not high level, i am learn english since two month",
+    "native speakers are hard",
+])
+def test_negated_hoped_for_and_descriptive_levels_are_not_claims(answer):
+    estimate = level_classifier.estimate(answer)
+    assert estimate.source != "stated"
+    assert estimate.level != "advanced"
+
+
+@pytest.mark.parametrize("answer", ["ok", "Ok", "okay", "yes", "sure thanks"])
+def test_acknowledgements_name_no_level(answer):
+    assert level_classifier.estimate(answer).level is None
+
+
+def test_level_is_estimated_from_writing_without_a_claim():
+    estimate = level_classifier.estimate("my level is not high level, i am learn english since two month")
+    assert (estimate.level, estimate.source) == ("beginner", "text")
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from app.modules.chats import services
+from app.modules.chats.memory import Memory
+from app.modules.chats.repository import ChatRepository
+from app.modules.chats.services import ChatService
+
+
+def test_recall_within_budget_is_used(db, monkeypatch):
+    monkeypatch.setattr(services.settings, "MEMORY_ENABLED", True)
+    monkeypatch.setattr(
+        services.memory_store, "recall",
+        lambda db, user_id, query, exclude=(): [Memory(message_id=1, role="user", content="I love hiking", score=0.9)]
+    )
+    memories = asyncio.run(ChatService(ChatRepository(db))._recall_memories(1, "hiking", []))
+    assert memories == ["Student: I love hiking"]
+
+
+def test_recall_over_budget_is_skipped_without_blocking_the_loop(db, monkeypatch):
+    monkeypatch.setattr(services.settings, "MEMORY_ENABLED", True)
+    monkeypatch.setattr(services.settings, "MEMORY_RECALL_BUDGET_SECONDS", 0.05)
+
+    def slow_recall(db, user_id, query, exclude=()):
+        time.sleep(0.5)
+        return [Memory(message_id=1, role="user", content="too late", score=0.9)]
+
+    monkeypatch.setattr(services.memory_store, "recall", slow_recall)
+
+    async def turn():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        memories = await ChatService(ChatRepository(db))._recall_memories(1, "hiking", [])
+        task.cancel()
+        return memories, time.monotonic() - started, ticks
+
+    memories, elapsed, ticks = asyncio.run(turn())
+    assert memories == []
+    assert elapsed < 0.3
+    assert ticks > 0
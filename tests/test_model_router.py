@@ -0,0 +1,42 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.infrastructure.model_router import ModelRouter, ModelTier
+
+
+def response(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], model=None, usage=None)
+
+
+def make_router() -> ModelRouter:
+    tiers = [ModelTier(name="primary", model="big"), ModelTier(name="fast", model="small"), ModelTier(name="canned")]
+    return ModelRouter(tiers, latency_budget=5.0, log_path=None)
+
+
+def test_latency_covers_every_attempt():
+    def call(tier, timeout):
+        time.sleep(0.05)
+        if tier.name == "primary":
+            raise RuntimeError("overloaded")
+        return response("hi")
+
+    result = make_router().complete(call)
+    assert result.tier == "fast"
+    attempts = result.decision.attempts
+    assert [a.outcome for a in attempts] == ["error", "ok"]
+    assert all(a.latency_ms >= 50 for a in attempts)
+    assert result.latency_ms >= sum(a.latency_ms for a in attempts)
+
+
+def test_canned_fallback_reports_the_time_spent_failing():
+    def call(tier, timeout):
+        time.sleep(0.05)
+        raise RuntimeError("down")
+
+    result = make_router().complete(call)
+    assert result.tier == "canned"
+    assert result.decision.attempts[-1].latency_ms == 0.0
+    assert result.latency_ms == pytest.approx(sum(a.latency_ms for a in result.decision.attempts), abs=20)
+    assert result.latency_ms >= 100
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from app.infrastructure.model_router import ChatCompletionResult
+from app.infrastructure.query_stats import assert_max_queries
+from app.main import app
+from app.modules.chats import schemas, services
+from app.modules.chats.repository import ChatRepository
+from app.shared.deps import create_access_token
+
+
+def auth(user):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+
+
+def fake_completion(conversation_history, user_name, user_level=None, user_id=None, memories=None):
+    return ChatCompletionResult(content="Nice! Tell me more.", tier="primary", model="fake", latency_ms=1.0, retries=0)
+
+
+def test_send_message(make_user, monkeypatch):
+    monkeypatch.setattr(services.ai_service, "complete_chat", fake_completion)
+    monkeypatch.setattr(services, "POST_TURN_JOBS", [])
+    # Recall runs on its own session in a thread and may be abandoned mid-query
+    monkeypatch.setattr(services.settings, "MEMORY_ENABLED", False)
+    client, user = TestClient(app), make_user(is_onboarded=True)
+    client.post("/chats/", json={"content": "warm-up"}, headers=auth(user))
+
+    # Auth, two messages (with stats and usage) and the user reloaded after commit;
+    # the context comes from the conversation cache
+    with assert_max_queries(10):
+        assert client.post("/chats/", json={"content": "I goed to school"}, headers=auth(user)).status_code == 200
+
+
+def test_chat_history(db, make_user):
+    client, user = TestClient(app), make_user()
+    for n in range(5):
+        ChatRepository(db).create_message(schemas.MessageCreate(content=f"message {n}", role=schemas.MessageRole.USER), user.id)
+    # Auth, the ETag inputs (stats, latest id) and the page itself
+    with assert_max_queries(5):
+        assert client.get("/chats/", headers=auth(user)).status_code == 200
+
+
+def test_users_me(make_user):
+    client, user = TestClient(app), make_user()
+    with assert_max_queries(2):
+        assert client.get("/users/me", headers=auth(user)).status_code == 200
@@ -0,0 +1,33 @@
+from sqlalchemy import text
+
+from app.infrastructure import query_stats
+from app.infrastructure.query_stats import track_queries
+
+
+def test_call_site_is_captured_once_per_statement(db, monkeypatch):
+    calls = []
+    real_call_site = query_stats._call_site
+    monkeypatch.setattr(query_stats, "_call_site", lambda: calls.append(1) or real_call_site())
+    monkeypatch.setattr(query_stats.settings, "SLOW_QUERY_MS", 10_000)
+
+    with track_queries(report=False) as stats:
+        for _ in range(5):
+            db.execute(text("SELECT 1")).all()
+        db.execute(text("SELECT 2")).all()
+
+    assert stats.count == 6
+    assert stats.statements["SELECT 1"] == 5
+    assert len(calls) == 2
+
+
+def test_slow_statements_always_get_a_call_site(db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(query_stats, "_call_site", lambda: calls.append(1) or "here")
+    monkeypatch.setattr(query_stats.settings, "SLOW_QUERY_MS", 0)
+
+    with track_queries(report=False) as stats:
+        for _ in range(3):
+            db.execute(text("SELECT 1")).all()
+
+    assert len(calls) == 3
+    assert [site for _, _, site in stats.slow] == ["here"] * 3
@@ -0,0 +1,114 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.infrastructure.database import SessionLocal
+from app.modules.users import models
+from app.modules.users.repository import UserRepository
+from app.modules.users.services import UserService
+
+
+def service(db) -> UserService:
+    return UserService(UserRepository(db))
+
+
+@pytest.fixture
+def login(db, make_user):
+    """Issue a refresh token for a fresh user the way login does, without bcrypt"""
+    def factory() -> str:
+        token, _ = service(db)._issue_tokens(make_user())
+        db.commit()
+        return token.refresh_token
+    return factory
+
+
+def family_revoked(db, refresh_token: str) -> bool:
+    db.expire_all()
+    db_token, _ = service(db).token_repo.get_with_user(refresh_token)
+    return all(
+        token.revoked_at is not None
+        for token in db.query(models.RefreshToken).filter_by(family_id=db_token.family_id)
+    )
+
+
+def test_rotation_issues_a_new_token_and_revokes_the_old_one(db, login):
+    old = login()
+    new = service(db).refresh(old).refresh_token
+
+    assert new != old
+    assert service(db).refresh(new).refresh_token
+    assert not family_revoked(db, new)
+
+
+def test_replaying_a_rotated_token_revokes_its_family(db, login):
+    old = login()
+    new = service(db).refresh(old).refresh_token
+
+    with pytest.raises(ValueError, match="revoked"):
+        service(db).refresh(old)
+    assert family_revoked(db, new)
+    # The legitimate holder's current token is gone too
+    with pytest.raises(ValueError, match="revoked"):
+        service(db).refresh(new)
+
+
+def test_concurrent_refreshes_of_one_token_let_only_one_through(login):
+    token = login()
+    barrier = threading.Barrier(4)
+    outcomes = []
+
+    def refresh():
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            outcomes.append(service(db).refresh(token).refresh_token)
+        except ValueError as e:
+            outcomes.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    issued = [outcome for outcome in outcomes if isinstance(outcome, str)]
+    assert len(issued) == 1
+    assert len(outcomes) == 4
+    # Losing a race looks like reuse, so the family ends up revoked
+    db = SessionLocal()
+    try:
+        assert family_revoked(db, token)
+    finally:
+        db.close()
+
+
+def test_expired_token_is_rejected(db, login):
+    token = login()
+    db_token, _ = service(db).token_repo.get_with_user(token)
+    db_token.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+
+    with pytest.raises(ValueError, match="expired"):
+        service(db).refresh(token)
+
+
+def test_logout_revokes_the_session(db, login):
+    token = login()
+    rotated = service(db).refresh(token).refresh_token
+    other_session = login()
+
+    service(db).logout(rotated)
+    assert family_revoked(db, rotated)
+    with pytest.raises(ValueError, match="revoked"):
+        service(db).refresh(rotated)
+    # Other logins are unaffected; unknown tokens are ignored
+    assert service(db).refresh(other_session).refresh_token
+    service(db).logout("not-a-token")
+
+
+def test_unknown_token_is_rejected(db):
+    with pytest.raises(ValueError, match="Invalid"):
+        service(db).refresh("not-a-token")
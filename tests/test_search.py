@@ -0,0 +1,90 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.modules.chats import schemas
+from app.modules.chats.repository import ChatRepository
+from app.modules.chats.search import tokenize
+from app.shared.deps import create_access_token
+
+
+def say(repo: ChatRepository, user_id: int, content: str) -> int:
+    return repo.create_message(schemas.MessageCreate(content=content, role=schemas.MessageRole.USER), user_id).id
+
+
+def search(repo: ChatRepository, user_id: int, query: str, **page):
+    return [msg.id for msg, _ in repo.search_messages(user_id, query, **page)]
+
+
+def test_tokenize_drops_stop_words_and_shares_stems():
+    assert tokenize("The teacher explained it") == tokenize("teacher explains") == ["teacher", "explain"]
+
+
+def test_every_term_must_match_and_better_matches_rank_first(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    long_one = say(repo, user.id, "My trip to the mountains was long and I met a guide on the trip")
+    close = say(repo, user.id, "Trip to Paris, a short trip")
+    once = say(repo, user.id, "A trip with friends")
+    say(repo, user.id, "Paris is lovely in spring")
+
+    # More occurrences rank higher; a long message is penalised for its length
+    assert search(repo, user.id, "trips") == [close, once, long_one]
+    assert search(repo, user.id, "trip paris") == [close]
+    assert search(repo, user.id, "trip london") == []
+    assert search(repo, user.id, "the and") == []
+
+
+def test_equal_scores_are_ordered_newest_first(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    ids = [say(repo, user.id, "homework again") for _ in range(3)]
+    assert search(repo, user.id, "homework") == ids[::-1]
+
+
+def test_pages_are_consecutive_slices_of_the_ranking(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    for n in range(7):
+        say(repo, user.id, "grammar " * (n + 1) + "question")
+
+    ranking = search(repo, user.id, "grammar")
+    assert len(ranking) == 7
+    pages = [search(repo, user.id, "grammar", skip=skip, limit=3) for skip in (0, 3, 6)]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == ranking
+    assert search(repo, user.id, "grammar", skip=7, limit=3) == []
+
+
+def test_users_only_see_their_own_messages(db, make_user):
+    repo, alice, bob = ChatRepository(db), make_user(), make_user()
+    mine = say(repo, alice.id, "my secret vocabulary list")
+    say(repo, bob.id, "bob's secret vocabulary list")
+
+    assert search(repo, alice.id, "secret vocabulary") == [mine]
+    client = TestClient(app)
+    token = create_access_token({"sub": alice.email})
+    response = client.get("/chats/search", params={"q": "secret"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json()["results"]] == [mine]
+
+
+def test_index_follows_writes_and_deletes(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    first = say(repo, user.id, "pronunciation practice")
+    assert search(repo, user.id, "practice") == [first]
+
+    # Written after the index was loaded
+    second = say(repo, user.id, "more practice today")
+    assert set(search(repo, user.id, "practice")) == {first, second}
+
+    repo.delete_messages(user.id)
+    assert search(repo, user.id, "practice") == []
+
+    third = say(repo, user.id, "practice after starting over")
+    assert search(repo, user.id, "practice") == [third]
+
+
+def test_index_follows_chunked_deletion(db, make_user):
+    repo, user = ChatRepository(db), make_user()
+    ids = [say(repo, user.id, f"lesson {n} notes") for n in range(4)]
+    assert set(search(repo, user.id, "notes")) == set(ids)
+
+    repo.delete_messages_chunk(user.id, ids[-1], chunk_size=2)
+    assert set(search(repo, user.id, "notes")) == set(ids[2:])
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from app.modules.chats.sequencer import TurnSequencer
+
+
+def test_idle_user_is_answered_without_waiting_for_the_window():
+    sequencer = TurnSequencer(debounce_seconds=1.0, max_batch=5)
+
+    async def run_turn(contents):
+        return contents
+
+    started = time.monotonic()
+    assert asyncio.run(sequencer.submit(1, "hello", run_turn)) == ["hello"]
+    assert time.monotonic() - started < 0.5
+
+
+def test_messages_sent_during_a_turn_are_answered_together():
+    sequencer = TurnSequencer(debounce_seconds=0.05, max_batch=5)
+    turns = []
+
+    async def run_turn(contents):
+        turns.append(contents)
+        await asyncio.sleep(0.1)
+        return len(turns)
+
+    async def burst():
+        first = asyncio.create_task(sequencer.submit(1, "I goed to school", run_turn))
+        await asyncio.sleep(0.01)
+        rest = [asyncio.create_task(sequencer.submit(1, content, run_turn)) for content in ["yesterday", "is it correct?"]]
+        return await asyncio.gather(first, *rest)
+
+    assert asyncio.run(burst()) == [1, 2, 2]
+    assert turns == [["I goed to school"], ["yesterday", "is it correct?"]]
+    assert sequencer.pending() == 0
@@ -0,0 +1,22 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_signup_ignores_a_requested_role_and_cannot_reach_admin_endpoints():
+    client = TestClient(app)
+    email = f"signup-{uuid.uuid4().hex[:10]}@example.com"
+    created = client.post("/users/signup", json={
+        "email": email, "username": email.split("@")[0], "password": "secret123", "role": "admin"
+    })
+    assert created.status_code == 201
+    assert created.json()["role"] == "student"
+
+    token = client.post("/users/login", json={"email": email, "password": "secret123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    files = {"file": ("users.csv", "email,username,password\n", "text/csv")}
+    assert client.post("/users/import", files=files, headers=headers).status_code == 403
+    for path in ["/chats/usage/users", "/health/jobs", "/health/models"]:
+        assert client.get(path, headers=headers).status_code == 403
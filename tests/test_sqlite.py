@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.orm import Session
+
+from app.infrastructure import sqlite
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # Short busy timeout so a writer that cannot get the lock fails fast
+    monkeypatch.setattr(sqlite.settings, "SQLITE_BUSY_TIMEOUT_MS", 50)
+    path = os.path.join(tempfile.mkdtemp(prefix="japi-sqlite-"), "test.db")
+    engine = create_engine(f"sqlite:///{path}", **sqlite.engine_options())
+    sqlite.configure_engine(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    yield engine
+    engine.dispose()
+
+
+def can_write(engine) -> bool:
+    """Whether another connection can take the write lock right now"""
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO items (name) VALUES ('other')")
+        return True
+    except exc.OperationalError as e:
+        assert isinstance(e.orig, sqlite3.OperationalError) and "locked" in str(e.orig)
+        return False
+
+
+def test_first_write_takes_the_lock_and_commit_releases_it(engine):
+    with Session(engine) as session:
+        session.execute(text("SELECT count(*) FROM items")).scalar()
+        # Reads do not hold the write lock
+        assert can_write(engine)
+        session.execute(text("INSERT INTO items (name) VALUES ('mine')"))
+        assert not can_write(engine)
+        session.commit()
+        assert can_write(engine)
+
+
+def test_rollback_releases_the_lock(engine):
+    with Session(engine) as session:
+        session.execute(text("UPDATE items SET name = 'x'"))
+        assert not can_write(engine)
+        session.rollback()
+        assert can_write(engine)
+
+
+def test_closing_a_session_without_commit_releases_the_lock(engine):
+    session = Session(engine)
+    session.execute(text("DELETE FROM items"))
+    assert not can_write(engine)
+    session.close()
+    assert can_write(engine)
+
+
+def test_invalidated_connection_releases_the_lock(engine):
+    conn = engine.connect()
+    conn.exec_driver_sql("INSERT INTO items (name) VALUES ('mine')")
+    assert not can_write(engine)
+    conn.invalidate()
+    assert can_write(engine)
+    conn.close()
+
+
+@pytest.mark.parametrize("statement", [
+    "WITH v AS (SELECT 'cte' AS name) INSERT INTO items (name) SELECT name FROM v",
+    "SAVEPOINT sp",
+])
+def test_cte_writes_and_savepoints_begin_a_write_transaction(engine, statement):
+    with engine.connect() as conn:
+        conn.exec_driver_sql(statement)
+        assert conn.connection.dbapi_connection.in_transaction
+        assert not can_write(engine)
+        conn.rollback()
+    assert can_write(engine)
+
+
+def test_is_write():
+    assert sqlite.is_write("  insert into items values (1)")
+    assert sqlite.is_write("WITH RECURSIVE n(x) AS (SELECT 1) DELETE FROM items WHERE id IN (SELECT x FROM n)")
+    assert not sqlite.is_write("WITH n AS (SELECT 1 AS x) SELECT x FROM n")
+    assert not sqlite.is_write("SELECT * FROM items")
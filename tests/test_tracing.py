@@ -0,0 +1,55 @@
+import asyncio
+
+from app.infrastructure import tracing
+from app.infrastructure.tracing import Tracer, parse_traceparent, traced
+
+SAMPLED_PARENT = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+
+class Collector:
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+
+def make_tracer(monkeypatch, **kwargs) -> Collector:
+    collector = Collector()
+    monkeypatch.setattr(tracing, "tracer", Tracer(enabled=True, processor=collector, **kwargs))
+    return collector
+
+
+def test_incoming_sampled_flag_is_ignored_unless_trusted(monkeypatch):
+    parent = parse_traceparent(SAMPLED_PARENT)
+    collector = make_tracer(monkeypatch, sample_rate=0.0)
+    with tracing.tracer.start_span("request", parent=parent, root=True) as span:
+        assert span is None
+    assert collector.spans == []
+
+    make_tracer(monkeypatch, sample_rate=0.0, trust_parent=True)
+    with tracing.tracer.start_span("request", parent=parent, root=True) as span:
+        assert span.trace_id == "a" * 32 and span.parent_id == "b" * 16
+
+
+def test_async_generator_span_is_not_current_across_yields(monkeypatch):
+    collector = make_tracer(monkeypatch, sample_rate=1.0)
+
+    @traced("stream")
+    async def stream():
+        yield 1
+        yield 2
+
+    async def consume():
+        with tracing.tracer.start_span("request", root=True) as root:
+            async for _ in stream():
+                # The consumer still sees its own span as the current one
+                assert tracing._current.get().span_id == root.span_id
+            generator = stream()
+            await generator.__anext__()
+            await generator.aclose()
+
+    asyncio.run(consume())
+    names = [span.name for span in collector.spans]
+    assert names == ["stream", "stream", "request"]
+    assert all(span.end_ns is not None for span in collector.spans)
@@ -0,0 +1,97 @@
+import itertools
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.modules.chats import models, schemas
+from app.modules.chats.repository import ChatRepository
+from app.modules.users.schemas import UserRole
+from app.shared.deps import create_access_token
+
+# The database is shared across tests: each fixture call writes into its own two days
+_ranges = itertools.count()
+
+
+@pytest.fixture
+def usage_rows(db, make_user):
+    """Two users, two days, two models; returns the users and the two days"""
+    day_1 = date(2000, 1, 1) + timedelta(days=10 * next(_ranges))
+    day_2 = day_1 + timedelta(days=1)
+    repo = ChatRepository(db)
+    alice, bob = make_user(), make_user()
+    rows = [
+        (alice, day_1, "gpt-4o-mini", 100, 20, 10, 2, 500.0),
+        (alice, day_1, "gpt-4.1-nano", 50, 10, 0, 0, 100.0),
+        (alice, day_2, "gpt-4o-mini", 200, 40, 0, 1, 300.0),
+        (bob, day_2, "gpt-4o-mini", 10, 5, 5, 0, 200.0),
+    ]
+    for user, day, model, prompt, completion, cached, retries, latency in rows:
+        message = repo.create_message(
+            schemas.MessageCreate(content="reply", role=schemas.MessageRole.AI),
+            user.id,
+            usage=schemas.MessageUsageCreate(
+                model=model, prompt_tokens=prompt, completion_tokens=completion, cached_tokens=cached,
+                cache_hit=cached > 0, retry_count=retries, latency_ms=latency
+            )
+        )
+        db.get(models.MessageUsage, message.id).created_at = datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc)
+    db.commit()
+    return alice, bob, day_1, day_2
+
+
+def test_per_user_totals(db, usage_rows):
+    alice, bob, day_1, day_2 = usage_rows
+    totals = {
+        row.user_id: row for row in ChatRepository(db).get_usage_aggregates(day_1, day_2, by_day=False, by_user=True)
+    }
+    assert set(totals) == {alice.id, bob.id}
+    assert (totals[alice.id].messages, totals[alice.id].prompt_tokens, totals[alice.id].completion_tokens) == (3, 350, 70)
+    assert (totals[alice.id].cached_tokens, totals[alice.id].cache_hits, totals[alice.id].retries) == (10, 1, 3)
+    assert totals[alice.id].avg_latency_ms == pytest.approx(300.0)
+    assert totals[alice.id].max_latency_ms == 500.0
+    assert (totals[bob.id].messages, totals[bob.id].prompt_tokens) == (1, 10)
+
+
+def test_per_day_totals_for_one_user(db, usage_rows):
+    alice, _, day_1, day_2 = usage_rows
+    days = ChatRepository(db).get_usage_aggregates(day_1, day_2, user_id=alice.id)
+    assert [(row.day, row.messages, row.prompt_tokens) for row in days] == [(day_1, 2, 150), (day_2, 1, 200)]
+
+
+def test_per_day_and_model_totals(db, usage_rows):
+    _, _, day_1, day_2 = usage_rows
+    rows = ChatRepository(db).get_usage_aggregates(day_1, day_2, group_by=schemas.UsageGroupBy.MODEL)
+    assert [(row.day, row.group, row.messages, row.prompt_tokens) for row in rows] == [
+        (day_1, "gpt-4.1-nano", 1, 50),
+        (day_1, "gpt-4o-mini", 1, 100),
+        (day_2, "gpt-4o-mini", 2, 210),
+    ]
+
+
+def test_no_rows(db, usage_rows):
+    repo = ChatRepository(db)
+    _, _, day_1, _ = usage_rows
+    empty_day = day_1 - timedelta(days=1)
+    assert repo.get_usage_aggregates(empty_day, empty_day) == []
+    assert repo.get_usage_aggregates(empty_day, empty_day, by_day=False, by_user=True) == []
+    # Ungrouped, an empty range is one all-zero row
+    (total,) = repo.get_usage_aggregates(empty_day, empty_day, by_day=False)
+    assert (total.messages, total.prompt_tokens, total.avg_latency_ms) == (0, 0, None)
+
+
+def test_usage_endpoints(make_user, usage_rows):
+    client = TestClient(app)
+    alice, _, day_1, day_2 = usage_rows
+    admin = make_user(role=UserRole.ADMIN)
+
+    def get(path, user):
+        token = create_access_token({"sub": user.email})
+        return client.get(path, params={"start": day_1.isoformat(), "end": day_2.isoformat()},
+                          headers={"Authorization": f"Bearer {token}"})
+
+    assert get("/chats/usage/daily", alice).status_code == 403
+    assert get("/chats/usage/users", alice).status_code == 403
+    assert [row["messages"] for row in get("/chats/usage/daily", admin).json()] == [2, 2]
+    assert [row["messages"] for row in get("/chats/usage", alice).json()] == [2, 1]
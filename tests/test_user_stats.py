@@ -0,0 +1,47 @@
+import threading
+
+from app.infrastructure.database import SessionLocal
+from app.modules.users.repository import UserStatsRepository
+
+
+def test_record_message_creates_then_increments(db, make_user):
+    user = make_user()
+    repo = UserStatsRepository(db)
+    repo.record_message(user.id, "user", 10)
+    repo.record_message(user.id, "ai", 30)
+    db.commit()
+
+    stats = repo.get_stats(user.id)
+    assert (stats.message_count, stats.user_message_count, stats.ai_message_count) == (2, 1, 1)
+    assert stats.user_message_chars == 10
+    assert stats.active_days == 1
+
+
+def test_concurrent_first_messages_do_not_conflict(make_user):
+    user = make_user()
+    errors = []
+    barrier = threading.Barrier(4)
+
+    def write():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            UserStatsRepository(session).record_message(user.id, "user", 5)
+            session.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    session = SessionLocal()
+    try:
+        assert UserStatsRepository(session).get_stats(user.id).message_count == 4
+    finally:
+        session.close()
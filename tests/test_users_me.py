@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.shared.deps import create_access_token
+
+
+def test_etag_changes_with_any_profile_field(db, make_user):
+    user = make_user(full_name="Before")
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+
+    first = client.get("/users/me", headers=headers)
+    etag = first.headers["ETag"]
+    assert client.get("/users/me", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # A write that leaves updated_at (and the fields the old ETag used) unchanged
+    user.full_name = "After"
+    user.learning_goal = "Travel"
+    db.commit()
+    second = client.get("/users/me", headers={**headers, "If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.json()["full_name"] == "After"
+    assert second.headers["ETag"] != etag
@@ -0,0 +1,33 @@
+import asyncio
+
+from fastapi import WebSocketDisconnect
+
+from app.modules.chats.websocket import ChatSession
+
+
+class FakeWebSocket:
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.sent = []
+
+    async def receive_json(self):
+        if not self.frames:
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+    async def send_json(self, payload):
+        self.sent.append(payload)
+
+
+def test_only_message_frames_count_as_activity():
+    session = ChatSession(FakeWebSocket([{"type": "ping"}, {"type": "pong"}, {"type": "bogus"}]))
+    session.last_activity = 0.0
+    asyncio.run(session._receive())
+    assert session.last_activity == 0.0
+    assert session.websocket.sent[0] == {"type": "pong"}
+
+    session = ChatSession(FakeWebSocket([{"type": "message", "content": "hi"}]))
+    session.last_activity = 0.0
+    asyncio.run(session._receive())
+    assert session.last_activity > 0.0
+    assert session.pending.get_nowait() == "hi"